@@ -43,13 +43,26 @@ STARLING_INTERNAL_ENCRYPTION_PASSWORD = b"Starling_AUTOLOG_47912"
 
 ADDRESS = constant_id("ADDRESS")
 ALERTS_IN_PROGRESS = constant_id("ALERTS_IN_PROGRESS")
+ASYNC_ENGINE = constant_id("ASYNC_ENGINE")
+API_COMMAND_ALERT_POLL_DEVICE = constant_id("API_COMMAND_ALERT_POLL_DEVICE")
 API_COMMAND_POLL_DEVICE  = constant_id("API_COMMAND_POLL_DEVICE")
 API_COMMAND_START_DEVICE  = constant_id("API_COMMAND_START_DEVICE")
+API_COMMAND_CONFIRM_DEVICE = constant_id("API_COMMAND_CONFIRM_DEVICE")
 API_COMMAND_STATUS = constant_id("API_COMMAND_STATUS")
 API_VERSION = constant_id("API_VERSION")
 BOOST_HOT_WATER = constant_id("BOOST_HOT_WATER")
 CO_DEV_ID = constant_id("CO_DEV_ID")
+COMMAND_ARGUMENTS = constant_id("COMMAND_ARGUMENTS")
+COMMAND_HANDLER = constant_id("COMMAND_HANDLER")
+COMMAND_NAME = constant_id("COMMAND_NAME")
+COMMAND_NEST_DEVICES = constant_id("COMMAND_NEST_DEVICES")
+COMMAND_PASS_COMMAND = constant_id("COMMAND_PASS_COMMAND")
+COMMAND_USER_ACTION = constant_id("COMMAND_USER_ACTION")
+COMMAND_WRITE_PROPERTIES = constant_id("COMMAND_WRITE_PROPERTIES")
+DEBUG_OVERRIDES = constant_id("DEBUG_OVERRIDES")
 DEVICES = constant_id("DEVICES")
+DISCOVERY_CACHE = constant_id("DISCOVERY_CACHE")
+DISCOVERY_CACHED = constant_id("DISCOVERY_CACHED")
 EVENT = constant_id("STARLING_EVENT")
 FAN_DEV_ID = constant_id("FAN_DEV_ID")
 FILTERABLE_DEVICES = constant_id("FILTERABLE_DEVICES")
@@ -65,14 +78,35 @@ HOT_WATER_MODE_BOOST = "Boost"
 HOT_WATER_MODE_OFF = "Off"
 HOT_WATER_MODE_ON = "On"
 HOT_WATER_MODE_ON_REPEATING = "Repeat"
-HOT_WATER_TIMERS = constant_id("HOT_WATER_TIMERS")
 HUBS = constant_id("HUBS")
+HUB_CIRCUIT_BREAKER_THRESHOLD = constant_id("HUB_CIRCUIT_BREAKER_THRESHOLD")
+HUB_CONCURRENT_REQUESTS = constant_id("HUB_CONCURRENT_REQUESTS")
+HUB_CONNECTION_POOL_SIZE = constant_id("HUB_CONNECTION_POOL_SIZE")
+HUB_ENDPOINT = constant_id("HUB_ENDPOINT")
+HUB_HOSTNAME = constant_id("HUB_HOSTNAME")
+HUB_IO_ENGINE = constant_id("HUB_IO_ENGINE")
+HUB_IP_ADDRESS = constant_id("HUB_IP_ADDRESS")
+HUB_PORT = constant_id("HUB_PORT")
 HUB_QUEUE = constant_id("STARLING_HUB_QUEUE")
+HUB_SSL_TLS = constant_id("HUB_SSL_TLS")
+HUB_TIMEOUTS = constant_id("HUB_TIMEOUTS")
 HUMIDIFIER_DEV_ID = constant_id("HUMIDIFIER_DEV_ID")
 HUMIDITY_DEV_ID = constant_id("HUMIDITY_DEV_ID")
+DEVICE_INDEX = constant_id("DEVICE_INDEX")
+INDEX_DEVICE_TYPE_ID = constant_id("INDEX_DEVICE_TYPE_ID")
+INDEX_ENABLED = constant_id("INDEX_ENABLED")
+INDEX_GROUPED = constant_id("INDEX_GROUPED")
+INDEX_HUB_ID = constant_id("INDEX_HUB_ID")
+INDEX_NAME = constant_id("INDEX_NAME")
+INDEX_NEST_ID = constant_id("INDEX_NEST_ID")
 INDIGO_DEVICE_TO_HUB = constant_id("INDIGO_DEVICE_TO_HUB")
 INDIGO_DEVICE_TYPE_ID = constant_id("INDIGO_DEVICE_TYPE_ID")
 INDIGO_DEV_ID = constant_id("INDIGO_DEV_ID")
+JOB_DEV_ID = constant_id("JOB_DEV_ID")
+JOB_DUE = constant_id("JOB_DUE")
+JOB_HUB_ID = constant_id("JOB_HUB_ID")
+JOB_SCHEDULER = constant_id("JOB_SCHEDULER")
+JOB_TYPE = constant_id("JOB_TYPE")
 LIST_NEST_DEVICES = constant_id("LIST_NEST_DEVICES")
 LIST_NEST_DEVICES_SELECTED = constant_id("LIST_NEST_DEVICES_SELECTED")
 LIST_STARLING_HUBS = constant_id("LIST_STARLING_HUBS")
@@ -88,7 +122,15 @@ PLUGIN_ID = constant_id("PLUGIN_ID")
 PLUGIN_INFO = constant_id("PLUGIN_INFO")
 PLUGIN_PREFS_FOLDER = constant_id("PLUGIN_PREFS_FOLDER")
 PLUGIN_VERSION = constant_id("PLUGIN_VERSION")
+POLLING_INTERVALS = constant_id("POLLING_INTERVALS")
 POLLING_SECONDS = constant_id("POLLING_SECONDS")
+POLL_BACKOFF_ENABLED = constant_id("POLL_BACKOFF_ENABLED")
+POLL_BASE_INTERVAL = constant_id("POLL_BASE_INTERVAL")
+POLL_DEVICE_TYPE_ID = constant_id("POLL_DEVICE_TYPE_ID")
+POLL_HUB_ID = constant_id("POLL_HUB_ID")
+POLL_INTERVAL = constant_id("POLL_INTERVAL")
+POLL_NEXT_DUE = constant_id("POLL_NEXT_DUE")
+POLL_SCHEDULER = constant_id("POLL_SCHEDULER")
 POST_CONTROL_API_DEVICES_ID = constant_id("POST_CONTROL_API_DEVICES_ID")
 QUEUES = constant_id("QUEUES")
 REQUESTS_PREFIX = constant_id("REQUESTS_PREFIX")
@@ -103,6 +145,7 @@ SET_HVAC_MODE = constant_id("SET_HVAC_MODE")
 SET_TARGET_COOLING_THRESHOLD_TEMPERATURE = constant_id("SET_TARGET_COOLING_THRESHOLD_TEMPERATURE")
 SET_TARGET_HEATING_THRESHOLD_TEMPERATURE = constant_id("SET_TARGET_HEATING_THRESHOLD_TEMPERATURE")
 SET_TARGET_TEMPERATURE = constant_id("SET_TARGET_TEMPERATURE")
+SHADOW_STATES = constant_id("SHADOW_STATES")
 STARLING_API_VERSION = constant_id("STARLING_API_VERSION")
 STARLING_APP_NAME = constant_id("STARLING_APP_NAME")
 
@@ -113,12 +156,22 @@ STARLING_HUBS = constant_id("STARLING_HUBS")
 STOP_THREAD = constant_id("STOP_THREAD")
 THREAD = constant_id("STARLING_THREAD")
 THREAD_STARTED = constant_id("STARLING_THREAD_STARTED")
+TRIGGERS_INDEX_KEYS = constant_id("TRIGGERS_INDEX_KEYS")
 TRIGGERS_NEST_PROTECT = constant_id("TRIGGERS_NEST_PROTECT")
 TRIGGERS_NEST_PROTECTS_ALL = constant_id("TRIGGERS_NEST_PROTECTS_ALL")
 
 NEST_PRIMARY_INDIGO_DEVICE_TYPES_AND_NEST_PROPERTIES = dict()
 NEST_PRIMARY_INDIGO_DEVICE_TYPES_AND_NEST_PROPERTIES["nestProtect"] = ["onoff"]
 
+# Secondary device type id -> primary device type id; secondary devices are grouped with (and share the Nest id of) a primary device
+SECONDARY_DEVICE_TYPES = dict()
+SECONDARY_DEVICE_TYPES["nestThermostatHumidifier"] = "nestThermostat"
+SECONDARY_DEVICE_TYPES["nestThermostatFan"] = "nestThermostat"
+SECONDARY_DEVICE_TYPES["nestThermostatHotWater"] = "nestThermostat"
+SECONDARY_DEVICE_TYPES["nestProtectCo"] = "nestProtect"
+SECONDARY_DEVICE_TYPES["nestProtectMotion"] = "nestProtect"
+SECONDARY_DEVICE_TYPES["nestWeatherHumidity"] = "nestWeather"
+
 LOG_LEVEL_NOT_SET = 0
 LOG_LEVEL_DEBUGGING = 10
 LOG_LEVEL_STARLING_API = 15
@@ -138,7 +191,78 @@ LOG_LEVEL_TRANSLATION[LOG_LEVEL_CRITICAL] = "Critical"
 
 # QUEUE Priorities
 QUEUE_PRIORITY_STOP_THREAD    = 0
+QUEUE_PRIORITY_ALERT_POLLING  = 50  # Nest Protect polls whilst a smoke / CO alert is in progress
 QUEUE_PRIORITY_COMMAND_HIGH   = 100
 QUEUE_PRIORITY_COMMAND_MEDIUM = 200
 QUEUE_PRIORITY_POLLING        = 300
 QUEUE_PRIORITY_LOW            = 400
+
+# Starling Hub HTTP connection pooling
+HUB_CONNECTION_POOL_SIZE_DEFAULT = 4
+
+# Starling Hub local DNS resolution cache
+STARLING_DIRECT_DOMAIN = "local.starling.direct"
+HUB_DNS_CACHE_TTL_SECONDS = 300
+
+# Starling Hub I/O engine
+HUB_IO_ENGINE_THREAD = "thread"  # One blocking Hub Handler thread per Starling Hub
+HUB_IO_ENGINE_ASYNCIO = "asyncio"  # All Starling Hubs serviced by a single asyncio event loop
+HUB_CONCURRENT_REQUESTS_DEFAULT = 1
+HUB_ASYNC_ENGINE_MAX_WORKERS = 16  # Upper limit on blocking Starling Hub requests in progress across all Starling Hubs
+HUB_ASYNC_ENGINE_QUEUE_POLL_SECONDS = 0.1
+
+# Command registry: how a queue item's Nest device list is passed to the command handler
+COMMAND_NEST_DEVICES_NONE = "none"
+COMMAND_NEST_DEVICES_FIRST = "first"  # Single Nest device commands e.g. set_hvac_mode(nest_device_id, ...)
+COMMAND_NEST_DEVICES_LIST = "list"
+
+# Per-device adaptive polling
+POLL_SCHEDULER_TICK_SECONDS = 1  # How often run_concurrent_thread checks for devices that are due to be polled
+POLL_BACKOFF_FACTOR = 1.5  # Interval multiplier applied after each poll with unchanged Nest properties
+POLL_BACKOFF_MAXIMUM_MULTIPLIER = 6  # Backed-off interval never exceeds this multiple of the device's base interval
+POLL_BACKOFF_EXCLUDED_DEVICE_TYPES = ("nestProtect",)  # Alerts must always be detected at the base interval
+
+# Alert fast path: whilst any Nest Protect on a Starling Hub has an alert in progress, all of that Starling Hub's
+#   Nest Protects are polled on their own queue lane (API_COMMAND_ALERT_POLL_DEVICE) at this much shorter interval
+ALERT_POLLING_SECONDS = 1
+ALERT_POLLING_DEVICE_TYPES = ("nestProtect",)
+
+# Starling Hub request timeouts (seconds)
+HUB_CONNECT_TIMEOUT_DEFAULT = 2.0  # A powered off / unreachable Starling Hub should fail fast
+HUB_READ_TIMEOUT_DEFAULT = 5.0  # Starling Hub replies may involve a Nest cloud round trip
+
+# Starling Hub circuit breaker
+CIRCUIT_BREAKER_THRESHOLD_DEFAULT = 3  # Consecutive connection failures before the circuit opens
+CIRCUIT_BREAKER_PROBE_INITIAL_SECONDS = 5
+CIRCUIT_BREAKER_PROBE_BACKOFF_FACTOR = 2
+CIRCUIT_BREAKER_PROBE_MAXIMUM_SECONDS = 300
+
+# Starling Hub queue scheduling
+HUB_QUEUE_CAPACITY = 256
+HUB_QUEUE_AGING_SECONDS = 5  # A waiting priority level is lifted by one step for every this many seconds waited
+HUB_QUEUE_AGING_STEP = 100  # One priority level e.g. QUEUE_PRIORITY_POLLING -> QUEUE_PRIORITY_COMMAND_MEDIUM
+HUB_QUEUE_COALESCED_COMMANDS = (SET_TARGET_TEMPERATURE, SET_TARGET_COOLING_THRESHOLD_TEMPERATURE, SET_TARGET_HEATING_THRESHOLD_TEMPERATURE, SET_HUMIDIFIER_LEVEL,
+                                API_COMMAND_CONFIRM_DEVICE)
+HUB_QUEUE_UNDROPPABLE_COMMANDS = (STOP_THREAD, API_COMMAND_ALERT_POLL_DEVICE, API_COMMAND_POLL_DEVICE, API_COMMAND_START_DEVICE)
+
+# Optimistic state application after a successful write
+OPTIMISTIC_CONFIRM_DELAY_SECONDS = 3  # Delay before the written Nest device is re-fetched to confirm (or roll back) its states
+
+# Indigo variables cached by Debug_Overrides for overriding Nest properties whilst testing
+DEBUG_OVERRIDE_VARIABLE_PREFIXES = ("_starling_debug", "starling_")
+
+# Job Scheduler (deferred work); job types are saved to disk so are plain strings rather than constant ids
+JOB_TYPE_HOT_WATER_REPEAT = "hot_water_repeat"
+JOB_TYPE_HOT_WATER_BOOST_EXPIRY = "hot_water_boost_expiry"
+JOB_TYPE_CONFIRM_DEVICE = "confirm_device"
+JOB_TYPES_PERSISTENT = (JOB_TYPE_HOT_WATER_REPEAT, JOB_TYPE_HOT_WATER_BOOST_EXPIRY)  # A restart re-fetches all devices anyway
+JOB_TYPES_UI = {JOB_TYPE_HOT_WATER_REPEAT: "Hot Water Repeat", JOB_TYPE_HOT_WATER_BOOST_EXPIRY: "Hot Water Boost Expiry", JOB_TYPE_CONFIRM_DEVICE: "Confirm Device States"}
+JOB_SCHEDULER_FILE_NAME = "scheduled_jobs.json"
+JOB_SCHEDULER_START_DELAY_SECONDS = 10
+JOB_SCHEDULER_IDLE_SECONDS = 60
+HOT_WATER_REPEAT_SECONDS = 25 * 60  # The minimum Nest hot water boost is 30 minutes
+HOT_WATER_BOOST_SECONDS = 30 * 60
+
+# Discovery cache of the Nest devices on each Starling Hub
+DISCOVERY_CACHE_FILE_NAME = "discovery_cache.json"
+DISCOVERY_CACHE_VERSION = 1  # Increment if the cache file layout changes
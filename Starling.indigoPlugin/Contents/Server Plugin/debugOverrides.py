@@ -0,0 +1,102 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Starling - Debug Overrides © Autolog 2022-2025
+#
+
+try:
+    # noinspection PyUnresolvedReferences
+    import indigo
+except ImportError:
+    pass
+
+import sys
+import threading
+import traceback
+
+from constants import *  # Also imports logging
+
+
+# noinspection PyPep8Naming
+class Debug_Overrides(object):
+
+    # Local copies of the Indigo variables used to override Nest properties for testing ("_starling_debug", ...).
+    #   Loaded once when the plugin starts and then refreshed from the plugin's variable_created / variable_updated /
+    #   variable_deleted callbacks, so the Hub Handlers' device handlers don't read indigo.variables on every poll.
+    #   'active' is checked first by the handlers: when debugging is off, no variables are looked at.
+
+    def __init__(self, plugin_globals):
+        try:
+            self.globals = plugin_globals
+
+            self.debugOverridesLogger = logging.getLogger("Plugin.DEBUG_OVERRIDES")
+
+            self.variables_lock = threading.Lock()
+            self.variables = dict()  # Indigo variable name -> Indigo variable object (local copy)
+            self.active = False  # True whilst the "_starling_debug" variable exists and is true
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def exception_handler(self, exception_error_message, log_failing_statement):
+        filename, line_number, method, statement = traceback.extract_tb(sys.exc_info()[2])[-1]  # noqa [Ignore duplicate code warning]
+        module = filename.split('/')
+        log_message = u"'{0}' in module '{1}', method '{2}'".format(exception_error_message, module[-1], method)
+        if log_failing_statement:
+            log_message = log_message + u"\n   Failing statement [line {0}]: '{1}'".format(line_number, statement)
+        else:
+            log_message = log_message + u" at line {0}".format(line_number)
+        self.debugOverridesLogger.error(log_message)
+
+    def load(self):
+        try:
+            # Invoked from startup, after subscribing to Indigo variable changes
+            with self.variables_lock:
+                self.variables = {var.name: var for var in indigo.variables if var.name.startswith(DEBUG_OVERRIDE_VARIABLE_PREFIXES)}
+            self.refresh_active()
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def update(self, orig_var, new_var):
+        try:
+            # A variable has been created (orig_var is None), updated or renamed
+            if orig_var is not None and orig_var.name != new_var.name:
+                with self.variables_lock:
+                    self.variables.pop(orig_var.name, None)
+            if new_var.name.startswith(DEBUG_OVERRIDE_VARIABLE_PREFIXES):
+                with self.variables_lock:
+                    self.variables[new_var.name] = new_var
+            elif orig_var is None or not orig_var.name.startswith(DEBUG_OVERRIDE_VARIABLE_PREFIXES):
+                return
+            self.refresh_active()
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def remove(self, var):
+        try:
+            with self.variables_lock:
+                if self.variables.pop(var.name, None) is None:
+                    return
+            self.refresh_active()
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def refresh_active(self):
+        try:
+            with self.variables_lock:
+                debug_var = self.variables.get("_starling_debug", None)
+                active = debug_var is not None and debug_var.getValue(bool)
+            if active != self.active:
+                self.active = active
+                self.debugOverridesLogger.info(f"Starling debug overrides {'enabled' if active else 'disabled'}")
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def variable(self, name):
+        # Return the local copy of an Indigo variable; raises KeyError if it doesn't exist (as for indigo.variables)
+        with self.variables_lock:
+            return self.variables[name]
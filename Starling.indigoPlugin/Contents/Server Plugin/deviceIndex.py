@@ -0,0 +1,178 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Starling - Device Index © Autolog 2022-2025
+#
+
+try:
+    # noinspection PyUnresolvedReferences
+    import indigo
+except ImportError:
+    pass
+
+import sys
+import threading
+import traceback
+
+from constants import *  # Also imports logging
+
+
+# noinspection PyPep8Naming
+class Device_Index(object):
+
+    # Index of the plugin's Indigo devices by device type id, Starling Hub id and Nest id (the device address).
+    #   Built in a single pass over indigo.devices when the plugin starts and kept current from device_start_comm,
+    #   device_updated and device_deleted, so that startup and the config UI lists don't need to scan all the devices.
+    #   Only the indexed values are held (not Indigo device objects, which are local copies that go stale).
+    #   Secondary devices (Fan, Hot Water, CO, ...) are created with their primary device's Nest id as their address, so
+    #   they are also indexed by primary Nest id -> secondary device type id; this replaces walking the Indigo device
+    #   group (indigo.device.getGroupList) to find a primary's secondary devices or a secondary's primary device.
+    #   Whether a secondary device is still grouped is read from its Indigo device group once, when it is indexed.
+
+    def __init__(self, plugin_globals):
+        try:
+            self.globals = plugin_globals
+
+            self.deviceIndexLogger = logging.getLogger("Plugin.DEVICE_INDEX")
+
+            self.index_lock = threading.Lock()
+            self.devices = dict()  # Indigo device id -> device entry dict
+            self.devices_by_type = dict()  # Indigo device type id -> set of Indigo device ids
+            self.secondary_devices = dict()  # Primary's Nest id -> secondary device type id -> Indigo device id
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def exception_handler(self, exception_error_message, log_failing_statement):
+        filename, line_number, method, statement = traceback.extract_tb(sys.exc_info()[2])[-1]  # noqa [Ignore duplicate code warning]
+        module = filename.split('/')
+        log_message = u"'{0}' in module '{1}', method '{2}'".format(exception_error_message, module[-1], method)
+        if log_failing_statement:
+            log_message = log_message + u"\n   Failing statement [line {0}]: '{1}'".format(line_number, statement)
+        else:
+            log_message = log_message + u" at line {0}".format(line_number)
+        self.deviceIndexLogger.error(log_message)
+
+    def build(self):
+        try:
+            with self.index_lock:
+                self.devices = dict()
+                self.devices_by_type = dict()
+                self.secondary_devices = dict()
+            for dev in indigo.devices.iter("self"):
+                self.update(dev)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def update(self, dev):
+        try:
+            # Add or refresh a device's entry from an Indigo device object
+            device_entry = dict()
+            device_entry[INDEX_DEVICE_TYPE_ID] = dev.deviceTypeId
+            device_entry[INDEX_HUB_ID] = int(dev.pluginProps.get("starling_hub_indigo_id", 0))
+            device_entry[INDEX_NEST_ID] = dev.address
+            device_entry[INDEX_NAME] = dev.name
+            device_entry[INDEX_ENABLED] = dev.enabled
+            # A secondary device is grouped with its primary device while it is a member of an Indigo device group
+            device_entry[INDEX_GROUPED] = False
+            if dev.deviceTypeId in SECONDARY_DEVICE_TYPES:
+                device_entry[INDEX_GROUPED] = len(indigo.device.getGroupList(dev.id)) > 1
+            with self.index_lock:
+                previous_entry = self.devices.get(dev.id, None)
+                if previous_entry is not None:
+                    if previous_entry[INDEX_DEVICE_TYPE_ID] != dev.deviceTypeId:
+                        self.devices_by_type[previous_entry[INDEX_DEVICE_TYPE_ID]].discard(dev.id)
+                    self.remove_secondary(dev.id, previous_entry)
+                self.devices[dev.id] = device_entry
+                self.devices_by_type.setdefault(dev.deviceTypeId, set()).add(dev.id)
+                if device_entry[INDEX_GROUPED]:
+                    self.secondary_devices.setdefault(dev.address, dict())[dev.deviceTypeId] = dev.id
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def remove(self, dev_id):
+        try:
+            with self.index_lock:
+                device_entry = self.devices.pop(dev_id, None)
+                if device_entry is not None:
+                    self.devices_by_type[device_entry[INDEX_DEVICE_TYPE_ID]].discard(dev_id)
+                    self.remove_secondary(dev_id, device_entry)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def remove_secondary(self, dev_id, device_entry):
+        # Must be called with the index lock held
+        if not device_entry[INDEX_GROUPED]:
+            return
+        secondary_devices = self.secondary_devices.get(device_entry[INDEX_NEST_ID], None)
+        if secondary_devices is not None and secondary_devices.get(device_entry[INDEX_DEVICE_TYPE_ID], 0) == dev_id:
+            del secondary_devices[device_entry[INDEX_DEVICE_TYPE_ID]]
+            if len(secondary_devices) == 0:
+                del self.secondary_devices[device_entry[INDEX_NEST_ID]]
+
+    def device_ids(self, device_type_id, hub_id=None, enabled_only=False):
+        try:
+            # Indigo device ids of a device type, optionally only those of a Starling Hub and / or that are enabled
+            with self.index_lock:
+                return [dev_id for dev_id in self.devices_by_type.get(device_type_id, set())
+                        if (hub_id is None or self.devices[dev_id][INDEX_HUB_ID] == hub_id)
+                        and (not enabled_only or self.devices[dev_id][INDEX_ENABLED])]
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+            return list()
+
+    def device_entry(self, dev_id):
+        try:
+            with self.index_lock:
+                device_entry = self.devices.get(dev_id, None)
+                return None if device_entry is None else dict(device_entry)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def secondary_device_ids(self, primary_dev_id):
+        try:
+            # Secondary device type id -> Indigo device id of the secondary devices grouped with a primary device
+            with self.index_lock:
+                primary_entry = self.devices.get(primary_dev_id, None)
+                if primary_entry is None:
+                    return dict()
+                return {secondary_dev_type_id: secondary_dev_id
+                        for secondary_dev_type_id, secondary_dev_id in self.secondary_devices.get(primary_entry[INDEX_NEST_ID], dict()).items()
+                        if SECONDARY_DEVICE_TYPES[secondary_dev_type_id] == primary_entry[INDEX_DEVICE_TYPE_ID]}
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+            return dict()
+
+    def primary_device_id(self, secondary_dev_id):
+        try:
+            # Indigo device id of the primary device a secondary device is grouped with, or 0 if it isn't grouped
+            with self.index_lock:
+                secondary_entry = self.devices.get(secondary_dev_id, None)
+                if secondary_entry is None or not secondary_entry[INDEX_GROUPED]:
+                    return 0
+                primary_dev_type_id = SECONDARY_DEVICE_TYPES[secondary_entry[INDEX_DEVICE_TYPE_ID]]
+                for primary_dev_id in self.devices_by_type.get(primary_dev_type_id, set()):
+                    if self.devices[primary_dev_id][INDEX_NEST_ID] == secondary_entry[INDEX_NEST_ID]:
+                        return primary_dev_id
+                return 0
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+            return 0
+
+    def device_ids_by_nest_id(self, device_type_id, hub_id=None):
+        try:
+            # Nest id -> Indigo device id for the devices of a device type
+            with self.index_lock:
+                return {self.devices[dev_id][INDEX_NEST_ID]: dev_id for dev_id in self.devices_by_type.get(device_type_id, set())
+                        if hub_id is None or self.devices[dev_id][INDEX_HUB_ID] == hub_id}
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+            return dict()
@@ -0,0 +1,129 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Starling - Discovery Cache © Autolog 2022-2025
+#
+
+try:
+    # noinspection PyUnresolvedReferences
+    import indigo
+except ImportError:
+    pass
+
+import json
+import os
+import sys
+import threading
+import traceback
+
+from constants import *  # Also imports logging
+
+
+# noinspection PyPep8Naming
+class Discovery_Cache(object):
+
+    # On-disk cache of the Nest devices discovered on each Starling Hub, kept in the plugin's preferences folder.
+    #   When a Starling Hub device is started, its cached Nest devices are loaded into the HUBS global straight away, so
+    #   the device config UI (list_nest_devices) can offer them before the Hub Handler has fetched 'status' and 'devices'.
+    #   The Hub Handler then reconciles the cache against the live 'devices' reply (see handle_status_command).
+
+    def __init__(self, plugin_globals):
+        try:
+            self.globals = plugin_globals
+
+            self.discoveryCacheLogger = logging.getLogger("Plugin.DISCOVERY_CACHE")
+
+            self.cache_lock = threading.Lock()
+            self.cache = dict()  # Starling Hub device id (str) -> Nest id -> {"type": Indigo device type id, "name": ..., "where": ...}
+            self.cache_file_path = None
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def exception_handler(self, exception_error_message, log_failing_statement):
+        filename, line_number, method, statement = traceback.extract_tb(sys.exc_info()[2])[-1]  # noqa [Ignore duplicate code warning]
+        module = filename.split('/')
+        log_message = u"'{0}' in module '{1}', method '{2}'".format(exception_error_message, module[-1], method)
+        if log_failing_statement:
+            log_message = log_message + u"\n   Failing statement [line {0}]: '{1}'".format(line_number, statement)
+        else:
+            log_message = log_message + u" at line {0}".format(line_number)
+        self.discoveryCacheLogger.error(log_message)
+
+    def load(self, plugin_prefs_folder):
+        try:
+            self.cache_file_path = os.path.join(plugin_prefs_folder, DISCOVERY_CACHE_FILE_NAME)
+            if not os.path.isfile(self.cache_file_path):
+                return
+            with open(self.cache_file_path, "r") as cache_file:
+                cache = json.load(cache_file)
+            if cache.get("version", 0) != DISCOVERY_CACHE_VERSION:
+                return  # Written by an incompatible plugin version: rebuilt from the live Starling Hubs
+            with self.cache_lock:
+                self.cache = cache.get("hubs", dict())
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def seed_hub(self, starling_hub_dev_id):
+        try:
+            # Add the cached Nest devices of a Starling Hub that are not yet known to the HUBS global; invoked when the
+            #   Starling Hub device is started. Nest devices with an Indigo device are set up by their own device start.
+            with self.cache_lock:
+                cached_nest_devices = dict(self.cache.get(str(starling_hub_dev_id), dict()))
+            nest_devices_by_nest_id = self.globals[HUBS][starling_hub_dev_id][NEST_DEVICES_BY_NEST_ID]
+            for nest_id, cached_nest_device in cached_nest_devices.items():
+                if nest_id in nest_devices_by_nest_id:
+                    continue
+                nest_devices_by_nest_id[nest_id] = dict()
+                nest_devices_by_nest_id[nest_id][INDIGO_DEV_ID] = 0  # No Indigo device created for this Nest device
+                nest_devices_by_nest_id[nest_id][INDIGO_DEVICE_TYPE_ID] = cached_nest_device["type"]
+                nest_devices_by_nest_id[nest_id][NEST_NAME] = cached_nest_device["name"]
+                nest_devices_by_nest_id[nest_id][NEST_WHERE] = cached_nest_device["where"]
+                nest_devices_by_nest_id[nest_id][DISCOVERY_CACHED] = True
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def reconcile_hub(self, starling_hub_dev_id, live_nest_devices):
+        try:
+            # Invoked by the Hub Handler with the Nest devices from a live 'devices' reply (Nest id -> cache entry):
+            #   cached Nest devices no longer on the Starling Hub are removed and the cache file is rewritten if anything changed
+            nest_devices_by_nest_id = self.globals[HUBS][starling_hub_dev_id][NEST_DEVICES_BY_NEST_ID]
+            for nest_id in [nest_id for nest_id, nest_device in nest_devices_by_nest_id.items()
+                            if nest_id not in live_nest_devices and nest_device.get(DISCOVERY_CACHED, False) and nest_device[INDIGO_DEV_ID] == 0]:
+                del nest_devices_by_nest_id[nest_id]
+
+            with self.cache_lock:
+                if self.cache.get(str(starling_hub_dev_id), None) == live_nest_devices:
+                    return
+                self.cache[str(starling_hub_dev_id)] = live_nest_devices
+            self.save()
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def forget_hub(self, starling_hub_dev_id):
+        try:
+            # The Starling Hub device has been deleted
+            with self.cache_lock:
+                if self.cache.pop(str(starling_hub_dev_id), None) is None:
+                    return
+            self.save()
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def save(self):
+        try:
+            if self.cache_file_path is None:
+                return
+            with self.cache_lock:
+                cache_json = json.dumps({"version": DISCOVERY_CACHE_VERSION, "hubs": self.cache}, separators=(",", ":"))
+                cache_file_path_temporary = f"{self.cache_file_path}.tmp"
+                with open(cache_file_path_temporary, "w") as cache_file:
+                    cache_file.write(cache_json)
+                os.replace(cache_file_path_temporary, self.cache_file_path)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
@@ -0,0 +1,218 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Starling - Hub Async Engine © Autolog 2022-2025
+#
+
+try:
+    # noinspection PyUnresolvedReferences
+    import indigo
+except ImportError:
+    pass
+
+import asyncio
+import concurrent.futures
+import queue
+import sys
+import threading
+import time
+import traceback
+
+from constants import *  # Also imports logging
+from hubHandler import COMMAND_REGISTRY
+
+
+# noinspection PyPep8Naming
+class Thread_Hub_Async_Engine(threading.Thread):
+
+    # This class runs a single asyncio event loop that services the queues of all Starling Hubs.
+    #   Each Starling Hub gets a consumer coroutine that takes items from the Hub's Hub_Queue in the same priority
+    #   order as Thread_Hub_Handler.run. A device poll fetches the Nest devices concurrently (limited per Hub by the
+    #   Hub's 'Concurrent Requests' setting) and then applies the replies in order through the Hub Handler's existing
+    #   handle_devices_command_* handlers. There is no async HTTP library available to Indigo plugins, so the blocking
+    #   requests calls are run in a bounded thread pool executor.
+
+    def __init__(self, plugin_globals, event):
+        try:
+
+            threading.Thread.__init__(self)
+
+            self.globals = plugin_globals
+
+            self.asyncEngineLogger = logging.getLogger("Plugin.HUB_ASYNC_ENGINE")
+
+            self.threadStop = event
+
+            self.loop = None
+            self.loop_ready = threading.Event()  # Set once the event loop is running and can accept Starling Hubs
+            self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=HUB_ASYNC_ENGINE_MAX_WORKERS, thread_name_prefix="Starling_Hub_IO")
+
+            self.hub_tasks = dict()  # Starling Hub device id -> consumer task
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def exception_handler(self, exception_error_message, log_failing_statement):
+        filename, line_number, method, statement = traceback.extract_tb(sys.exc_info()[2])[-1]  # noqa [Ignore duplicate code warning]
+        module = filename.split('/')
+        log_message = u"'{0}' in module '{1}', method '{2}'".format(exception_error_message, module[-1], method)
+        if log_failing_statement:
+            log_message = log_message + u"\n   Failing statement [line {0}]: '{1}'".format(line_number, statement)
+        else:
+            log_message = log_message + u" at line {0}".format(line_number)
+        self.asyncEngineLogger.error(log_message)
+
+    def run(self):
+        try:
+            self.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.loop)
+            self.loop.call_soon(self.loop_ready.set)
+            self.loop.run_forever()
+
+            self.asyncEngineLogger.debug("Hub Async Engine close-down commencing.")
+
+            # Allow the Starling Hub consumers to finish cleanly before the loop is closed
+            pending_tasks = [task for task in asyncio.all_tasks(self.loop) if not task.done()]
+            for task in pending_tasks:
+                task.cancel()
+            if len(pending_tasks) > 0:
+                self.loop.run_until_complete(asyncio.gather(*pending_tasks, return_exceptions=True))
+            self.loop.close()
+            self.executor.shutdown(wait=False)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def register_hub(self, hub_handler):
+        try:
+            # Start servicing a Starling Hub's queue; invoked from the plugin thread
+            self.loop_ready.wait(5.0)
+            self.loop.call_soon_threadsafe(self._create_hub_task, hub_handler)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def unregister_hub(self, starling_hub_device_id):
+        try:
+            # Stop servicing a Starling Hub's queue; invoked from the plugin thread
+            if self.loop is not None and self.loop.is_running():
+                self.loop.call_soon_threadsafe(self._cancel_hub_task, starling_hub_device_id)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def stop(self):
+        try:
+            self.threadStop.set()
+            if self.loop is not None and self.loop.is_running():
+                self.loop.call_soon_threadsafe(self.loop.stop)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def _create_hub_task(self, hub_handler):
+        starling_hub_device_id = hub_handler.starling_hub_device_id
+        self._cancel_hub_task(starling_hub_device_id)
+        self.hub_tasks[starling_hub_device_id] = self.loop.create_task(self.hub_consumer(hub_handler))
+
+    def _cancel_hub_task(self, starling_hub_device_id):
+        hub_task = self.hub_tasks.pop(starling_hub_device_id, None)
+        if hub_task is not None and not hub_task.done():
+            hub_task.cancel()
+
+    async def hub_consumer(self, hub_handler):
+        starling_hub_device_id = hub_handler.starling_hub_device_id
+        try:
+            hub_queue = self.globals[QUEUES][starling_hub_device_id]
+            concurrent_requests = 0
+            semaphore = None
+
+            await asyncio.sleep(2)
+            while not hub_handler.threadStop.is_set() and not self.threadStop.is_set():
+                try:
+                    (priority, command, nest_device_list, argument_list), queued_seconds = hub_queue.get_with_timing(False)
+                except queue.Empty:
+                    await asyncio.sleep(HUB_ASYNC_ENGINE_QUEUE_POLL_SECONDS)
+                    continue
+
+                if command == STOP_THREAD:
+                    break
+
+                try:
+                    if command in [API_COMMAND_POLL_DEVICE, API_COMMAND_START_DEVICE]:
+                        if command == API_COMMAND_POLL_DEVICE:
+                            nest_device_list = hub_handler.claim_pending_poll(nest_device_list)
+                        if not await self.loop.run_in_executor(self.executor, hub_handler.check_circuit_breaker, command, nest_device_list):
+                            continue  # Starling Hub unreachable: devices marked as Disconnected without any network I/O
+                        # Pick up any change to the Starling Hub's 'Concurrent Requests' setting between batches
+                        hub_concurrent_requests = hub_handler.get_hub_endpoint().get(HUB_CONCURRENT_REQUESTS, HUB_CONCURRENT_REQUESTS_DEFAULT)
+                        if semaphore is None or hub_concurrent_requests != concurrent_requests:
+                            concurrent_requests = hub_concurrent_requests
+                            semaphore = asyncio.Semaphore(concurrent_requests)
+                        dispatch_start_time = time.time()
+                        await self.process_devices_batch(hub_handler, semaphore, command, nest_device_list)
+                        hub_handler.record_command_timing(COMMAND_REGISTRY[command][COMMAND_NAME], time.time() - dispatch_start_time)
+                    else:
+                        await self.loop.run_in_executor(self.executor, hub_handler.process_queue_item, priority, command, nest_device_list, argument_list, queued_seconds)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as exception_error:
+                    self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+        except asyncio.CancelledError:
+            pass
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+        finally:
+            self.asyncEngineLogger.debug(f"Hub Async Engine consumer for Starling Hub {starling_hub_device_id} close-down commencing.")
+            hub_handler.close_requests_session()
+
+    async def process_devices_batch(self, hub_handler, semaphore, command, nest_device_list):
+        # Fetch all the Nest devices of the batch concurrently and then apply the replies in list order
+        async def fetch_nest_device(nest_dev_id):
+            async with semaphore:
+                return await self.loop.run_in_executor(self.executor, hub_handler.fetch_nest_device, nest_dev_id)
+
+        batch_start_time = time.time()
+        batch_deadline = hub_handler.batch_deadline(command, batch_start_time)
+        batch_priority = hub_handler.batch_priority(command)
+        hub_queue = self.globals[QUEUES][hub_handler.starling_hub_device_id]
+
+        fetch_tasks = [self.loop.create_task(fetch_nest_device(nest_dev_id)) for nest_dev_id in nest_device_list]
+        pending_fetch_tasks = set(fetch_tasks)
+        while len(pending_fetch_tasks) > 0:
+            # Wake as each fetch completes (or at least every queue poll interval) so that user commands queued whilst a
+            #   slow batch is being fetched preempt it, rather than waiting for the whole fetch phase
+            wait_seconds = HUB_ASYNC_ENGINE_QUEUE_POLL_SECONDS
+            if batch_deadline is not None:
+                wait_seconds = min(wait_seconds, batch_deadline - time.time())
+                if wait_seconds <= 0:
+                    break
+            done_fetch_tasks, pending_fetch_tasks = await asyncio.wait(pending_fetch_tasks, timeout=wait_seconds, return_when=asyncio.FIRST_COMPLETED)
+            next_priority = hub_queue.peek_priority()
+            if next_priority is not None and next_priority < batch_priority:
+                if not await self.loop.run_in_executor(self.executor, hub_handler.run_preempting_commands, batch_priority):
+                    break  # Stopping
+        devices_and_replies = list()
+        for nest_dev_id, fetch_task in zip(nest_device_list, fetch_tasks):
+            if fetch_task.done() and not fetch_task.cancelled() and fetch_task.exception() is None:
+                devices_and_replies.append((nest_dev_id, fetch_task.result()))
+            else:
+                fetch_task.cancel()  # Still waiting or in progress: leave for the next poll
+        hub_handler.record_batch_deadline(command, nest_device_list, {nest_dev_id for nest_dev_id, reply in devices_and_replies})
+
+        await self.loop.run_in_executor(self.executor, self.apply_devices_batch, hub_handler, command, devices_and_replies)
+        self.asyncEngineLogger.debug(f"Starling Hub {hub_handler.starling_hub_device_id}: {len(nest_device_list)} Nest device(s) processed in {time.time() - batch_start_time:.3f} seconds")
+
+    def apply_devices_batch(self, hub_handler, command, devices_and_replies):
+        try:
+            # Runs in a single executor thread so that the Indigo updates for a batch are applied serially, as per the Hub Handler thread.
+            #   Preempting commands are also run between the fetches (see process_devices_batch).
+            batch_priority = hub_handler.batch_priority(command)
+            for nest_dev_id, reply in devices_and_replies:
+                if not hub_handler.run_preempting_commands(batch_priority):
+                    break  # Stopping
+                hub_handler.handle_devices_command(command, nest_dev_id, reply)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
@@ -11,13 +11,76 @@ try:
 except ImportError:
     pass
 
+import concurrent.futures
+import hashlib
 import queue
+import socket
 import sys
 import threading
 import time
 import traceback
 
 from constants import *  # Also imports logging
+from stateMapping import State_Mapper, STATE_MAPPINGS, MAPPING_TARGET_PRIMARY, MAPPING_TARGET_HUMIDITY, MAPPING_TARGET_HUMIDIFIER
+
+
+def derive_hub_endpoint(props):
+    # Build the Starling Hub endpoint (URL prefix and suffix plus connection settings) from the Starling Hub device plugin props.
+    #   Built once when the Starling Hub device is started and rebuilt if its configuration changes, so that individual
+    #   requests to the Starling Hub only need to join strings.
+    ip_address = props.get("starling_hub_ip", "127.0.0.1")  # Should be in format "nnn.nnn.nnn.nnn"
+    ssl_tls = bool(props.get("starling_hub_ssl_tls", True))
+    if ssl_tls:
+        https_ip_1, https_ip_2, https_ip_3, https_ip_4 = ip_address.split(".")
+        hostname = f"{https_ip_1}-{https_ip_2}-{https_ip_3}-{https_ip_4}.{STARLING_DIRECT_DOMAIN}"
+        port = 3443
+        requests_prefix = f"https://{hostname}:{port}/api/connect/v1/"
+    else:
+        hostname = ip_address
+        port = 3080
+        requests_prefix = f"http://{ip_address}:{port}/api/connect/v1/"  # noqa [http links are not secure]
+    api_key = props.get("api_key", u"not_set_in_plugin")
+
+    hub_endpoint = dict()
+    hub_endpoint[HUB_IP_ADDRESS] = ip_address
+    hub_endpoint[HUB_SSL_TLS] = ssl_tls
+    hub_endpoint[HUB_HOSTNAME] = hostname
+    hub_endpoint[HUB_PORT] = port
+    hub_endpoint[HUB_CONNECTION_POOL_SIZE] = int(props.get("connection_pool_size", HUB_CONNECTION_POOL_SIZE_DEFAULT))
+    hub_endpoint[HUB_CONCURRENT_REQUESTS] = int(props.get("concurrent_requests", HUB_CONCURRENT_REQUESTS_DEFAULT))
+    hub_endpoint[HUB_TIMEOUTS] = (float(props.get("connect_timeout", HUB_CONNECT_TIMEOUT_DEFAULT)), float(props.get("read_timeout", HUB_READ_TIMEOUT_DEFAULT)))  # requests (connect, read) timeout
+    hub_endpoint[HUB_CIRCUIT_BREAKER_THRESHOLD] = int(props.get("circuit_breaker_threshold", CIRCUIT_BREAKER_THRESHOLD_DEFAULT))
+    hub_endpoint[REQUESTS_PREFIX] = requests_prefix
+    hub_endpoint[REQUESTS_SUFFIX] = f"?key={api_key}"
+    return hub_endpoint
+
+
+def decode_starling_direct_hostname(hostname):
+    # A Starling Hub "local.starling.direct" hostname encodes the Hub's LAN address, e.g. "192-168-1-20.local.starling.direct"
+    #   resolves to "192.168.1.20". Returns the decoded address or None if the hostname isn't in this format.
+    if not hostname.endswith(f".{STARLING_DIRECT_DOMAIN}"):
+        return None
+    octets = hostname[:-len(STARLING_DIRECT_DOMAIN) - 1].split("-")
+    if len(octets) != 4 or not all(octet.isdigit() and int(octet) <= 255 for octet in octets):
+        return None
+    return ".".join(octets)
+
+
+# noinspection PyPep8Naming
+class Starling_Hub_Adapter(requests.adapters.HTTPAdapter):
+
+    # HTTP adapter that connects to the Starling Hub by (cached) IP address whilst still sending SNI and verifying the
+    #   Starling Hub's certificate against its real "local.starling.direct" hostname.
+
+    def __init__(self, server_hostname, **kwargs):
+        self.server_hostname = server_hostname  # Must be set before HTTPAdapter.__init__ invokes init_poolmanager
+        super(Starling_Hub_Adapter, self).__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        if self.server_hostname is not None:
+            pool_kwargs["server_hostname"] = self.server_hostname
+            pool_kwargs["assert_hostname"] = self.server_hostname
+        super(Starling_Hub_Adapter, self).init_poolmanager(connections, maxsize, block=block, **pool_kwargs)
 
 
 def _no_image():
@@ -45,8 +108,81 @@ class Thread_Hub_Handler(threading.Thread):
 
             self.threadStop = event
 
-            self.requests_prefix = None
-            self.requests_suffix = None
+            # Persistent keep-alive HTTP session to the Starling Hub, shared by polls and commands.
+            #   Rebuilt if the Starling Hub IP Address, SSL/TLS setting or connection pool size changes.
+            self.requests_session = None
+            self.requests_session_key = None
+            self.requests_session_lock = threading.Lock()
+
+            # Local DNS cache for the Starling Hub hostname: hostname -> [address, requests prefix, expiry time]
+            #   Guarded by dns_cache_lock as requests are prefixed from the concurrent fetch threads (see fetch_executor)
+            self.dns_cache_lock = threading.Lock()
+            self.dns_cache = dict()
+            self.dns_resolver_calls = 0  # Count of lookups that needed the system resolver
+            self.dns_resolver_calls_saved = 0  # Count of requests served from the DNS cache
+
+            # Poll coalescing: at most one poll is pending on the queue; later polls merge their devices into it
+            self.pending_poll_lock = threading.Lock()
+            self.pending_poll_device_list = None  # The device list of the queued poll, or None if no poll is queued
+            self.polls_skipped = 0
+            self.polls_skipped_reported = 0
+            self.pending_alert_poll_device_list = None  # As above, for the Nest Protect alert lane (see enqueue_alert_poll)
+
+            # Alert fast path: time from the Starling Hub reply reporting a Nest Protect alert to its triggers being fired
+            self.reply_received_times = dict()  # Nest device id -> time the last successful reply for the device was received
+            self.reply_received_at = None  # Receipt time of the reply being applied, and of the device's previous reply
+            self.previous_reply_received_at = None
+            self.alert_polls = 0
+            self.alert_latency_count = 0
+            self.alert_latency_total_seconds = 0.0
+            self.alert_latency_maximum_seconds = 0.0
+            self.alert_window_maximum_seconds = 0.0
+
+            # Circuit breaker: opened after consecutive connection failures so that polls of an unreachable Starling Hub
+            #   don't each wait for a timeout; whilst open, a single status probe is sent on an exponential backoff
+            self.circuit_lock = threading.Lock()
+            self.circuit_open = False
+            self.circuit_consecutive_failures = 0
+            self.circuit_probe_seconds = CIRCUIT_BREAKER_PROBE_INITIAL_SECONDS
+            self.circuit_probe_due = 0.0
+            self.circuit_probe_thread_id = None  # Thread running the status probe, whilst one is in flight
+            self.circuit_opened_count = 0
+            self.circuit_polls_short_circuited = 0
+
+            self.batch_deadlines_missed = 0  # Count of poll batches cut short by the per-batch deadline
+            self.batch_devices_deferred = 0  # Count of Nest devices not polled because their batch ran out of time
+
+            # Payload fingerprints: Nest device id -> hash of the raw Starling Hub reply last processed for that device
+            self.payload_fingerprints = dict()
+            self.payload_fingerprint_hits = 0  # Polls whose handler processing was skipped as the reply was unchanged
+            self.payload_fingerprint_misses = 0
+            self.reply_context = threading.local()  # Per fetching thread: fingerprint of the last successful reply
+
+            # Pending property writes for the same Nest device are merged into one POST (see merge_device_writes)
+            self.write_context = threading.local()  # Per dispatching thread: the merged write's result for the running handler
+            self.writes_merged = 0
+
+            # States applied ahead of confirmation by the Starling Hub (see apply_optimistic_states)
+            self.optimistic_lock = threading.Lock()
+            self.optimistic_states = dict()  # Nest device id -> dict of (Indigo device id, state key) -> optimistic value
+            self.optimistic_updates = 0
+            self.optimistic_rollbacks = 0
+
+            # Per command dispatch timings (see record_command_timing)
+            self.command_timings = dict()
+
+            # User actions are run between the Nest devices of a batch (see run_preempting_commands)
+            self.batch_preemptions = 0
+            self.action_latency_count = 0
+            self.action_latency_total_seconds = 0.0
+            self.action_latency_maximum_seconds = 0.0
+
+            # Declarative Nest property -> Indigo state mapping (see stateMapping.py)
+            self.state_mapper = State_Mapper(STATE_MAPPINGS)
+
+            # Worker pool used to fetch the Nest devices of a poll batch concurrently; sized by the Hub's 'Concurrent Requests'
+            self.fetch_executor = None
+            self.fetch_executor_size = 0
 
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
@@ -66,64 +202,14 @@ class Thread_Hub_Handler(threading.Thread):
             time.sleep(2)
             while not self.threadStop.is_set():
                 try:
-                    priority, command, nest_device_list, argument_list = self.globals[QUEUES][self.starling_hub_device_id].get(True, 5)
+                    (priority, command, nest_device_list, argument_list), queued_seconds = self.globals[QUEUES][self.starling_hub_device_id].get_with_timing(True, 5)
                     # self.hubHandlerLogger.warning(f"Queue [Debug={self.debug_nest_protect_count}]: Priority={priority}, Command={command}, Nest Device List={nest_device_list}")
 
-                    if command == API_COMMAND_STATUS:
-                        self.handle_status_command()
-                    elif command in [API_COMMAND_POLL_DEVICE, API_COMMAND_START_DEVICE]:
-                        for nest_dev_id in nest_device_list:
-                            self.handle_devices_command(command, nest_dev_id)
-                    elif command in [SET_TARGET_TEMPERATURE, SET_TARGET_COOLING_THRESHOLD_TEMPERATURE, SET_TARGET_HEATING_THRESHOLD_TEMPERATURE]:
-                        nest_dev_id = nest_device_list[0]
-                        target_temperature = argument_list[0]
-                        state_key = argument_list[1]
-                        log_action_name = argument_list[2]
-                        self.set_thermostat_temperature(command, nest_dev_id, target_temperature, state_key, log_action_name)
-                    elif command == SET_HVAC_MODE:
-                        nest_dev_id = nest_device_list[0]
-                        hvac_mode_translated = argument_list[0]
-                        new_indigo_hvac_mode = argument_list[1]
-                        self.set_hvac_mode(nest_dev_id, hvac_mode_translated, new_indigo_hvac_mode)
-                    elif command == SET_ECO_MODE:
-                        nest_dev_id = nest_device_list[0]
-                        eco_mode = argument_list[0]  # Bool: True | False
-                        eco_mode_ui = argument_list[1]
-                        self.set_eco_mode(nest_dev_id, eco_mode, eco_mode_ui)
-                    elif command == SET_FAN:
-                        nest_dev_id = nest_device_list[0]
-                        fan_running = argument_list[0]  # Bool: True | False
-                        fan_running_ui = argument_list[1]
-                        self.set_fan_running(nest_dev_id, fan_running, fan_running_ui)
-                    elif command == SET_HOT_WATER:
-                        nest_dev_id = nest_device_list[0]
-                        hot_water_enabled = argument_list[0]  # Bool: True | False
-                        hot_water_ui = argument_list[1]
-                        self.set_hot_water(nest_dev_id, hot_water_enabled, hot_water_ui)
-                    elif command == BOOST_HOT_WATER:
-                        nest_dev_id = nest_device_list[0]
-                        hot_water_enabled = argument_list[0]  # Bool: True | False
-                        hot_water_ui = argument_list[1]
-                        self.set_hot_boost(nest_dev_id, hot_water_enabled, hot_water_ui)
-
-                    elif command == SET_HUMIDIFIER:
-                        nest_dev_id = nest_device_list[0]
-                        humidifier_active = argument_list[0]  # Bool: True | False
-                        humidifier_ui = argument_list[1]
-                        self.set_humidifier(nest_dev_id, humidifier_active, humidifier_ui)
-                    elif command == SET_HUMIDIFIER_LEVEL:
-                        nest_dev_id = nest_device_list[0]
-                        humidifier_target_level = argument_list[0]  # int (0 - 100)
-                        humidifier_ui = argument_list[1]
-                        self.set_humidifier_level(nest_dev_id, humidifier_target_level, humidifier_ui)
-                    elif command == SET_HOME_AWAY:
-                        nest_dev_id = nest_device_list[0]
-                        humidifier_active = argument_list[0]  # Bool: True | False
-                        self.set_home_away(nest_dev_id, humidifier_active)
-
                     if command == STOP_THREAD:
                         break
 
+                    self.process_queue_item(priority, command, nest_device_list, argument_list, queued_seconds)
+
                 except queue.Empty:
                     pass
                     # self.hubHandlerLogger.warning(f"Queue: EMPTY")
@@ -133,6 +219,520 @@ class Thread_Hub_Handler(threading.Thread):
 
             self.hubHandlerLogger.debug("Hub Handler Thread close-down commencing.")
 
+            self.close_fetch_executor()
+            self.close_requests_session()
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def process_queue_item(self, priority, command, nest_device_list, argument_list, queued_seconds=None):
+        try:
+            # Process a single Starling Hub queue item; invoked by this thread's run loop or by the Hub Async Engine.
+            #   The handler and its argument schema are looked up in COMMAND_REGISTRY (see end of module).
+            command_entry = COMMAND_REGISTRY.get(command, None)
+            if command_entry is None:
+                self.hubHandlerLogger.error(f"Starling Hub {self.starling_hub_device_id}: Ignoring unregistered command '{command}'")
+                return
+
+            handler_arguments = self.command_handler_arguments(command_entry, command, nest_device_list, argument_list)
+            if handler_arguments is None:
+                return
+
+            if command_entry[COMMAND_USER_ACTION] and queued_seconds is not None:
+                self.record_action_latency(queued_seconds)
+
+            dispatch_start_time = time.time()
+            if command_entry[COMMAND_WRITE_PROPERTIES] is None or not self.merge_device_writes(command, nest_device_list[0], handler_arguments):
+                command_entry[COMMAND_HANDLER](self, *handler_arguments)
+            self.record_command_timing(command_entry[COMMAND_NAME], time.time() - dispatch_start_time)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def command_handler_arguments(self, command_entry, command, nest_device_list, argument_list):
+        try:
+            # Build a command handler's arguments from a queue item, as declared in its COMMAND_REGISTRY entry.
+            #   Returns None if the queue item's arguments don't match the declared argument names.
+            handler_arguments = list()
+            if command_entry[COMMAND_PASS_COMMAND]:
+                handler_arguments.append(command)
+            if command_entry[COMMAND_NEST_DEVICES] == COMMAND_NEST_DEVICES_FIRST:
+                handler_arguments.append(nest_device_list[0])
+            elif command_entry[COMMAND_NEST_DEVICES] == COMMAND_NEST_DEVICES_LIST:
+                handler_arguments.append(nest_device_list)
+            argument_names = command_entry[COMMAND_ARGUMENTS]
+            if len(argument_names) > 0:
+                if argument_list is None or len(argument_list) != len(argument_names):
+                    self.hubHandlerLogger.error(f"Starling Hub {self.starling_hub_device_id}: '{command_entry[COMMAND_NAME]}' expects arguments {argument_names}, received {argument_list}")
+                    return None
+                handler_arguments.extend(argument_list)
+            return handler_arguments
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def merge_device_writes(self, command, nest_device_id, handler_arguments):
+        try:
+            # Take any other pending property writes for the same Nest device off the queue and send them in a single POST
+            #   (e.g. a scene setting HVAC mode plus heat / cool setpoints). Each originating command's handler is then run
+            #   against its share of the reply (see update_starling_hub), so success / failure is still applied and logged per
+            #   command. Writes to a property already in the merged POST are sent afterwards, in queue order.
+            #   Returns False if there was nothing to merge, in which case the command's handler must be invoked as normal.
+            #   If merging fails part way, no write is lost: the taken writes not yet handled are put back on the queue and
+            #   False is returned if the command's own handler has not yet been run.
+            merge_candidates = None
+            command_handled = False
+            handled_candidates = set()  # Indexes of the merge candidates whose handlers have been run (or that are invalid)
+
+            merge_candidates = self.globals[QUEUES][self.starling_hub_device_id].take_device_items(nest_device_id, WRITE_MERGEABLE_COMMANDS)
+            if len(merge_candidates) == 0:
+                return False
+
+            merged_properties = COMMAND_REGISTRY[command][COMMAND_WRITE_PROPERTIES](self, *handler_arguments)
+            merged_writes = [(None, command, handler_arguments, merged_properties)]
+            merged_properties = dict(merged_properties)
+            sequential_writes = list()
+            for candidate_index, ((priority, candidate_command, candidate_nest_device_list, candidate_argument_list), queued_seconds) in enumerate(merge_candidates):
+                candidate_entry = COMMAND_REGISTRY[candidate_command]
+                candidate_arguments = self.command_handler_arguments(candidate_entry, candidate_command, candidate_nest_device_list, candidate_argument_list)
+                if candidate_arguments is None:
+                    handled_candidates.add(candidate_index)
+                    continue
+                self.record_action_latency(queued_seconds)
+                candidate_properties = candidate_entry[COMMAND_WRITE_PROPERTIES](self, *candidate_arguments)
+                if any(api_property in merged_properties for api_property in candidate_properties):
+                    sequential_writes.append((candidate_index, candidate_command, candidate_arguments))
+                    continue
+                merged_properties.update(candidate_properties)
+                merged_writes.append((candidate_index, candidate_command, candidate_arguments, candidate_properties))
+
+            if len(merged_writes) > 1:
+                starling_hub_dev = self.globals[SHADOW_STATES].device(self.starling_hub_device_id)
+                nest_dev = self.globals[SHADOW_STATES].device(nest_device_id)
+                status, result = self.update_starling_hub(starling_hub_dev, f"devices/{nest_dev.address}", merged_properties)
+                self.writes_merged += len(merged_writes) - 1
+                for candidate_index, merged_command, merged_arguments, merged_command_properties in merged_writes:
+                    self.write_context.replay_result = self.attribute_write_result(status, result, merged_command_properties)
+                    try:
+                        COMMAND_REGISTRY[merged_command][COMMAND_HANDLER](self, *merged_arguments)
+                    finally:
+                        self.write_context.replay_result = None
+                    if candidate_index is None:
+                        command_handled = True
+                    else:
+                        handled_candidates.add(candidate_index)
+            else:
+                COMMAND_REGISTRY[command][COMMAND_HANDLER](self, *handler_arguments)
+                command_handled = True
+
+            for candidate_index, sequential_command, sequential_arguments in sequential_writes:
+                COMMAND_REGISTRY[sequential_command][COMMAND_HANDLER](self, *sequential_arguments)
+                handled_candidates.add(candidate_index)
+            return True
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+            if merge_candidates is None:
+                return False  # Nothing was taken off the queue
+            requeued_items = [queue_item for candidate_index, (queue_item, queued_seconds) in enumerate(merge_candidates) if candidate_index not in handled_candidates]
+            for queue_item in requeued_items:
+                self.globals[QUEUES][self.starling_hub_device_id].put(queue_item)
+            if len(requeued_items) > 0:
+                self.hubHandlerLogger.warning(f"Merging writes to Nest device {nest_device_id} failed: {len(requeued_items)} write(s) put back on the queue")
+            return command_handled
+
+    def apply_optimistic_states(self, nest_device_id, dev, keyValueList):
+        try:
+            # After a successful write, apply the states it is expected to produce to the Nest device (or one of its
+            #   secondary devices) straight away rather than a poll cycle later. The Nest device is then re-fetched after
+            #   OPTIMISTIC_CONFIRM_DELAY_SECONDS, ahead of its next poll: if the Starling Hub disagrees, the normal state diff
+            #   rolls the states back (see handle_confirm_devices).
+            keyValueList = [key_value for key_value in keyValueList if dev.states.get(key_value["key"], None) != key_value["value"]]
+            if len(keyValueList) == 0:
+                return
+            dev.updateStatesOnServer(keyValueList)
+            self.payload_fingerprints.pop(nest_device_id, None)  # The confirming reply must be diffed in full, even if unchanged
+            with self.optimistic_lock:
+                optimistic_states = self.optimistic_states.setdefault(nest_device_id, dict())
+                for key_value in keyValueList:
+                    optimistic_states[(dev.id, key_value["key"])] = key_value["value"]
+            self.optimistic_updates += 1
+
+            # Queued ahead of polls by the Job Scheduler; a later write to the same Nest device reschedules the confirmation
+            self.globals[JOB_SCHEDULER].schedule(JOB_TYPE_CONFIRM_DEVICE, self.starling_hub_device_id, nest_device_id, OPTIMISTIC_CONFIRM_DELAY_SECONDS)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def handle_confirm_devices(self, nest_device_list):
+        try:
+            # Read-after-write: re-fetch each Nest device and check that the Starling Hub agrees with its optimistic states
+            for nest_dev_id in nest_device_list:
+                self.handle_devices_command(API_COMMAND_POLL_DEVICE, nest_dev_id)
+                with self.optimistic_lock:
+                    optimistic_states = self.optimistic_states.pop(nest_dev_id, None)
+                if optimistic_states is None:
+                    continue
+                rolled_back = list()
+                for (dev_id, state_key), optimistic_value in optimistic_states.items():
+                    dev = self.globals[SHADOW_STATES].device(dev_id)
+                    if dev is not None and dev.states.get(state_key, None) != optimistic_value:
+                        rolled_back.append(f"{dev.name}: {state_key}")
+                if len(rolled_back) > 0:
+                    self.optimistic_rollbacks += 1
+                    self.hubHandlerLogger.warning(f"Starling Hub did not confirm update, state(s) rolled back: {', '.join(rolled_back)}")
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def attribute_write_result(self, status, result, api_properties):
+        try:
+            # The share of a merged write's (status, result) belonging to one command's properties. A successful Starling Hub
+            #   reply reports each property's outcome in its 'setStatus' object, so one rejected property only fails its own command.
+            if status != "OK" or not isinstance(result, dict):
+                return status, result
+            set_status = result.get("setStatus", None)
+            if isinstance(set_status, dict):
+                for api_property in api_properties:
+                    property_status = set_status.get(api_property, set_status.get(api_property.strip(), "OK"))
+                    if property_status != "OK":
+                        return "Error", [property_status, f"Starling Hub did not set '{api_property.strip()}'"]
+            return status, result
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+            return status, result
+
+    def handle_devices_queue_item(self, command, nest_device_list):
+        try:
+            # Poll or start a batch of Nest devices
+            if command == API_COMMAND_POLL_DEVICE:
+                nest_device_list = self.claim_pending_poll(nest_device_list)
+            if self.check_circuit_breaker(command, nest_device_list):
+                self.handle_devices_batch(command, nest_device_list)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def record_action_latency(self, queued_seconds):
+        try:
+            # Time from a user action being queued (e.g. by action_control_thermostat) until it is executed
+            self.action_latency_count += 1
+            self.action_latency_total_seconds += queued_seconds
+            self.action_latency_maximum_seconds = max(self.action_latency_maximum_seconds, queued_seconds)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def run_preempting_commands(self, batch_priority):
+        try:
+            # Invoked between the Nest devices of a batch: run any queued items of a higher priority (e.g. user actions)
+            #   before the batch resumes. Returns False if the batch should be abandoned as the Hub Handler is stopping.
+            hub_queue = self.globals[QUEUES][self.starling_hub_device_id]
+            while True:
+                next_priority = hub_queue.peek_priority()
+                if next_priority is None or next_priority >= batch_priority:
+                    return True
+                if next_priority == QUEUE_PRIORITY_STOP_THREAD:
+                    return False  # Leave the stop request on the queue for the run loop
+                try:
+                    queue_item, queued_seconds = hub_queue.get_preempting()
+                except queue.Empty:
+                    return True
+                priority, command, nest_device_list, argument_list = queue_item
+                if command == STOP_THREAD:
+                    hub_queue.put(queue_item)
+                    return False
+                self.batch_preemptions += 1
+                self.process_queue_item(priority, command, nest_device_list, argument_list, queued_seconds)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+            return True
+
+    def record_command_timing(self, command_name, dispatch_seconds):
+        try:
+            # Command name -> [dispatch count, total seconds, maximum seconds]
+            command_timing = self.command_timings.setdefault(command_name, [0, 0.0, 0.0])
+            command_timing[0] += 1
+            command_timing[1] += dispatch_seconds
+            command_timing[2] = max(command_timing[2], dispatch_seconds)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def enqueue_poll(self, nest_device_list):
+        try:
+            # Queue a poll of the supplied Nest devices unless a poll is already pending for this Starling Hub, in which case
+            #   the devices are merged into the pending poll. Returns True if a new poll was queued.
+            with self.pending_poll_lock:
+                if self.pending_poll_device_list is not None:
+                    for nest_dev_id in nest_device_list:
+                        if nest_dev_id not in self.pending_poll_device_list:
+                            self.pending_poll_device_list.append(nest_dev_id)
+                    self.polls_skipped += 1
+                    return False
+                self.pending_poll_device_list = list(nest_device_list)
+                self.globals[QUEUES][self.starling_hub_device_id].put((QUEUE_PRIORITY_POLLING, API_COMMAND_POLL_DEVICE, self.pending_poll_device_list, None))
+                return True
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def enqueue_alert_poll(self, nest_device_list):
+        try:
+            # Queue an alert mode poll of the supplied Nest Protects ahead of all other items (QUEUE_PRIORITY_ALERT_POLLING),
+            #   merging them into the alert poll already pending, if any
+            with self.pending_poll_lock:
+                if self.pending_alert_poll_device_list is not None:
+                    for nest_dev_id in nest_device_list:
+                        if nest_dev_id not in self.pending_alert_poll_device_list:
+                            self.pending_alert_poll_device_list.append(nest_dev_id)
+                    return False
+                self.pending_alert_poll_device_list = list(nest_device_list)
+                self.globals[QUEUES][self.starling_hub_device_id].put((QUEUE_PRIORITY_ALERT_POLLING, API_COMMAND_ALERT_POLL_DEVICE, self.pending_alert_poll_device_list, None))
+                return True
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def handle_alert_poll_queue_item(self, nest_device_list):
+        try:
+            # Poll the Nest Protects of a Starling Hub in alert mode; processed as a normal poll, but can't be preempted
+            with self.pending_poll_lock:
+                if nest_device_list is self.pending_alert_poll_device_list:
+                    self.pending_alert_poll_device_list = None
+                nest_device_list = list(nest_device_list)
+            self.alert_polls += 1
+            if self.check_circuit_breaker(API_COMMAND_POLL_DEVICE, nest_device_list):
+                self.handle_devices_batch(API_COMMAND_POLL_DEVICE, nest_device_list, QUEUE_PRIORITY_ALERT_POLLING)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def update_alert_mode(self):
+        try:
+            # Alert mode is on whilst any of this Starling Hub's Nest Protects has an alert in progress
+            alert_active = any(nest_dev_id in self.globals[ALERTS_IN_PROGRESS]
+                               for nest_dev_id in self.globals[DEVICE_INDEX].device_ids("nestProtect", self.starling_hub_device_id))
+            if self.globals[POLL_SCHEDULER].set_alert_mode(self.starling_hub_device_id, alert_active):
+                starling_hub_dev = self.globals[SHADOW_STATES].device(self.starling_hub_device_id)
+                if alert_active:
+                    self.hubHandlerLogger.info(f"Starling Hub '{starling_hub_dev.name}': Nest Protect alert in progress, polling Nest Protects every {ALERT_POLLING_SECONDS} second(s)")
+                else:
+                    self.hubHandlerLogger.info(f"Starling Hub '{starling_hub_dev.name}': Nest Protect alerts cleared, normal polling resumed")
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def record_alert_latency(self, nest_dev):
+        try:
+            # Invoked once a new alert's triggers have been fired. The Starling Hub reports no detection time, so the
+            #   alert arose at some point between the device's previous reply and this one (the detection window).
+            if self.reply_received_at is None:
+                return
+            latency_seconds = time.time() - self.reply_received_at
+            self.alert_latency_count += 1
+            self.alert_latency_total_seconds += latency_seconds
+            self.alert_latency_maximum_seconds = max(self.alert_latency_maximum_seconds, latency_seconds)
+            window_message = ""
+            if self.previous_reply_received_at is not None:
+                window_seconds = self.reply_received_at - self.previous_reply_received_at
+                self.alert_window_maximum_seconds = max(self.alert_window_maximum_seconds, window_seconds)
+                window_message = f", alert raised within the preceding {window_seconds:.1f} seconds"
+            self.hubHandlerLogger.info(f"Nest Protect '{nest_dev.name}' alert: triggers fired {latency_seconds * 1000:.1f} ms after the Starling Hub reply{window_message}")
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def claim_pending_poll(self, nest_device_list):
+        try:
+            # Invoked when a poll is taken off the queue: from now on, new polls must be queued afresh rather than merged
+            with self.pending_poll_lock:
+                if nest_device_list is self.pending_poll_device_list:
+                    self.pending_poll_device_list = None
+                nest_device_list = list(nest_device_list)
+                polls_skipped = self.polls_skipped
+
+            if polls_skipped != self.polls_skipped_reported:
+                self.polls_skipped_reported = polls_skipped
+                starling_hub_dev = self.globals[SHADOW_STATES].device(self.starling_hub_device_id)
+                if starling_hub_dev is not None:
+                    starling_hub_dev.updateStateOnServer(key="polls_skipped", value=polls_skipped)
+
+            return nest_device_list
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+            return list(nest_device_list)
+
+    def record_hub_success(self):
+        try:
+            # The Starling Hub replied, so close the circuit if it was open
+            with self.circuit_lock:
+                self.circuit_consecutive_failures = 0
+                if not self.circuit_open:
+                    return
+                self.circuit_open = False
+                self.circuit_probe_seconds = CIRCUIT_BREAKER_PROBE_INITIAL_SECONDS
+
+            self.update_circuit_state("Closed")
+            self.hubHandlerLogger.info(f"Starling Hub '{self.globals[SHADOW_STATES].device(self.starling_hub_device_id).name}' is reachable again; resuming polling")
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def record_hub_failure(self):
+        try:
+            # The Starling Hub couldn't be reached (timeout or connection error); open the circuit once the threshold is reached
+            threshold = self.get_hub_endpoint().get(HUB_CIRCUIT_BREAKER_THRESHOLD, CIRCUIT_BREAKER_THRESHOLD_DEFAULT)
+            with self.circuit_lock:
+                self.circuit_consecutive_failures += 1
+                if self.circuit_open:
+                    if self.circuit_probe_thread_id != threading.get_ident():
+                        return  # e.g. a fetch of the same concurrent batch that was already in flight when the circuit opened
+                    # The status probe failed: back off further
+                    self.circuit_probe_seconds = min(self.circuit_probe_seconds * CIRCUIT_BREAKER_PROBE_BACKOFF_FACTOR, CIRCUIT_BREAKER_PROBE_MAXIMUM_SECONDS)
+                    self.circuit_probe_due = time.time() + self.circuit_probe_seconds
+                    return
+                if threshold <= 0 or self.circuit_consecutive_failures < threshold:
+                    return
+                self.circuit_open = True
+                self.circuit_opened_count += 1
+                self.circuit_probe_seconds = CIRCUIT_BREAKER_PROBE_INITIAL_SECONDS
+                self.circuit_probe_due = time.time() + self.circuit_probe_seconds
+                consecutive_failures = self.circuit_consecutive_failures
+
+            self.update_circuit_state("Open")
+            self.hubHandlerLogger.warning(f"Starling Hub '{self.globals[SHADOW_STATES].device(self.starling_hub_device_id).name}' unreachable after {consecutive_failures} consecutive failures; polling suspended until it responds")
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def update_circuit_state(self, circuit_state):
+        try:
+            starling_hub_dev = self.globals[SHADOW_STATES].device(self.starling_hub_device_id)
+            if starling_hub_dev is not None:
+                starling_hub_dev.updateStateOnServer(key="circuit_state", value=circuit_state)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def check_circuit_breaker(self, command, nest_device_list):
+        try:
+            # Returns True if the batch of Nest devices should be fetched from the Starling Hub. Whilst the circuit is
+            #   open, a status probe is sent when due and, if the Starling Hub is still unreachable, the devices are marked
+            #   as Disconnected without any network I/O.
+            with self.circuit_lock:
+                if not self.circuit_open:
+                    return True
+                probe_due = time.time() >= self.circuit_probe_due
+                if probe_due:
+                    self.circuit_probe_due = time.time() + self.circuit_probe_seconds  # Only one probe at a time
+                    self.circuit_probe_thread_id = threading.get_ident()
+
+            if probe_due:
+                starling_hub_dev = self.globals[SHADOW_STATES].device(self.starling_hub_device_id)
+                try:
+                    self.access_starling_hub(starling_hub_dev, GET_CONTROL_API_STATUS, "status")  # Closes the circuit if successful
+                finally:
+                    with self.circuit_lock:
+                        self.circuit_probe_thread_id = None
+                if not self.circuit_open:
+                    return True
+
+            self.circuit_polls_short_circuited += 1
+            circuit_open_reply = ("Error", ["Hub Unreachable", "Starling Hub unreachable; waiting to retry"])
+            for nest_dev_id in nest_device_list:
+                nest_dev = self.globals[SHADOW_STATES].device(nest_dev_id)
+                if nest_dev is not None and nest_dev.states.get("status", "") != "Disconnected":
+                    self.handle_devices_command(command, nest_dev_id, circuit_open_reply)
+            return False
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+            return True
+
+    def handle_devices_batch(self, command, nest_device_list, batch_priority=None):
+        try:
+            # Fetch the Nest devices of a batch using the worker pool (if more than one concurrent request is allowed)
+            #   and then apply the replies in list order so that Indigo updates and triggers stay deterministic
+            batch_start_time = time.time()
+            batch_deadline = self.batch_deadline(command, batch_start_time)
+            if batch_priority is None:
+                batch_priority = self.batch_priority(command)
+
+            concurrent_requests = self.get_hub_endpoint().get(HUB_CONCURRENT_REQUESTS, HUB_CONCURRENT_REQUESTS_DEFAULT)
+            if concurrent_requests > 1 and len(nest_device_list) > 1:
+                fetch_executor = self.get_fetch_executor(concurrent_requests)
+                fetch_futures = [fetch_executor.submit(self.fetch_nest_device, nest_dev_id) for nest_dev_id in nest_device_list]
+                concurrent.futures.wait(fetch_futures, timeout=None if batch_deadline is None else max(batch_deadline - time.time(), 0))
+                processed_nest_dev_ids = set()
+                for nest_dev_id, fetch_future in zip(nest_device_list, fetch_futures):
+                    if fetch_future.done() and self.run_preempting_commands(batch_priority):
+                        self.handle_devices_command(command, nest_dev_id, fetch_future.result())
+                        processed_nest_dev_ids.add(nest_dev_id)
+                    else:
+                        fetch_future.cancel()  # Still queued or in progress (or stopping): leave for the next poll
+                self.record_batch_deadline(command, nest_device_list, processed_nest_dev_ids)
+            else:
+                processed_nest_dev_ids = set()
+                for nest_dev_id in nest_device_list:
+                    if batch_deadline is not None and time.time() >= batch_deadline:
+                        break
+                    if not self.run_preempting_commands(batch_priority):
+                        break
+                    self.handle_devices_command(command, nest_dev_id)
+                    processed_nest_dev_ids.add(nest_dev_id)
+                self.record_batch_deadline(command, nest_device_list, processed_nest_dev_ids)
+
+            self.hubHandlerLogger.debug(f"Starling Hub {self.starling_hub_device_id}: {len(nest_device_list)} Nest device(s) processed in {time.time() - batch_start_time:.3f} seconds")
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def batch_priority(self, command):
+        # Queue priority at which a batch was queued; only items of a higher priority may preempt it
+        return QUEUE_PRIORITY_POLLING if command == API_COMMAND_POLL_DEVICE else QUEUE_PRIORITY_COMMAND_MEDIUM
+
+    def batch_deadline(self, command, batch_start_time):
+        # A poll batch must not run past the polling interval (so that it can't delay the next one); a start batch always completes
+        if command != API_COMMAND_POLL_DEVICE:
+            return None
+        return batch_start_time + self.globals[POLLING_SECONDS]
+
+    def record_batch_deadline(self, command, nest_device_list, processed_nest_dev_ids):
+        try:
+            deferred_nest_dev_ids = [nest_dev_id for nest_dev_id in nest_device_list if nest_dev_id not in processed_nest_dev_ids]
+            if len(deferred_nest_dev_ids) > 0:
+                self.batch_deadlines_missed += 1
+                self.batch_devices_deferred += len(deferred_nest_dev_ids)
+                if command == API_COMMAND_POLL_DEVICE:
+                    self.globals[POLL_SCHEDULER].defer(deferred_nest_dev_ids)  # So that they are in the next poll
+                self.hubHandlerLogger.debug(f"Starling Hub {self.starling_hub_device_id}: poll batch deadline reached; {len(deferred_nest_dev_ids)} of {len(nest_device_list)} Nest device(s) deferred to the next poll")
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def get_fetch_executor(self, concurrent_requests):
+        try:
+            # Return the worker pool for concurrent Nest device fetches, recreating it if the pool size has changed
+            if self.fetch_executor is None or self.fetch_executor_size != concurrent_requests:
+                self.close_fetch_executor()
+                self.fetch_executor = concurrent.futures.ThreadPoolExecutor(max_workers=concurrent_requests, thread_name_prefix=f"Starling_Hub_{self.starling_hub_device_id}")
+                self.fetch_executor_size = concurrent_requests
+            return self.fetch_executor
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def close_fetch_executor(self):
+        try:
+            if self.fetch_executor is not None:
+                self.fetch_executor.shutdown(wait=False)
+            self.fetch_executor = None
+            self.fetch_executor_size = 0
+
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
 
@@ -185,6 +785,7 @@ class Thread_Hub_Handler(threading.Thread):
             if status == "OK":
                 # All is good
 
+                live_nest_devices = dict()  # For the discovery cache
                 for nest_device in result["devices"]:
                     # self.hubHandlerLogger.info(f"Nest Device: {nest_device}")
                     nest_type = nest_device["type"]
@@ -201,6 +802,8 @@ class Thread_Hub_Handler(threading.Thread):
 
                     # self.hubHandlerLogger.warning(f"DEBUG: Nest Device: {nest_name} located in '{nest_where}', [{nest_type} | {nest_device_id}]")
 
+                    live_nest_devices[nest_device_id] = {"type": self.derive_nest_deviceTypeId(nest_type), "name": nest_name, "where": nest_where}
+
                     if nest_device_id not in self.globals[HUBS][dev.id][NEST_DEVICES_BY_NEST_ID]:
                         self.globals[HUBS][dev.id][NEST_DEVICES_BY_NEST_ID][nest_device_id] = dict()
                         self.globals[HUBS][dev.id][NEST_DEVICES_BY_NEST_ID][nest_device_id][INDIGO_DEV_ID] = 0  # No Indigo device created for this Nest device
@@ -221,6 +824,8 @@ class Thread_Hub_Handler(threading.Thread):
                             self.globals[HUBS][dev.id][NEST_DEVICES_BY_NEST_ID][nest_device_id][NEST_NAME] = nest_name
                             self.globals[HUBS][dev.id][NEST_DEVICES_BY_NEST_ID][nest_device_id][NEST_WHERE] = nest_where
 
+                self.globals[DISCOVERY_CACHE].reconcile_hub(dev.id, live_nest_devices)
+
                 # self.hubHandlerLogger.info(f"Device '{dev.name}' Started")
             else:
                 error_code = result[0]
@@ -239,24 +844,48 @@ class Thread_Hub_Handler(threading.Thread):
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
 
-    def handle_devices_command(self, command, nest_device_id):
+    def fetch_nest_device(self, nest_device_id):
+        try:
+            # Retrieve the Starling Hub properties of a Nest device; safe to run concurrently for different devices
+            starling_hub_dev = self.globals[SHADOW_STATES].device(self.starling_hub_device_id)
+            nest_dev = self.globals[SHADOW_STATES].device(nest_device_id)
+            if starling_hub_dev is None or nest_dev is None:
+                return "Error", ["Not Found", "Device no longer exists"]
+
+            nest_device_command = f"devices/{nest_dev.address}"
+
+            self.reply_context.fingerprint = None
+            status, result = self.access_starling_hub(starling_hub_dev, GET_CONTROL_API_DEVICES_ID, nest_device_command)
+            return status, result, self.reply_context.fingerprint, time.time()
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+            return "Error", ["Exception", "Fetch of Nest device failed"]
+
+    def handle_devices_command(self, command, nest_device_id, prefetched_reply=None):
         try:
-            if self.starling_hub_device_id not in indigo.devices:
+            # Devices come from the shadow state store, so the comparisons made by the handlers don't need Indigo server round trips
+            starling_hub_dev = self.globals[SHADOW_STATES].device(self.starling_hub_device_id)
+            if starling_hub_dev is None:
                 return
-            starling_hub_dev = indigo.devices[self.starling_hub_device_id]
 
-            nest_dev = indigo.devices[nest_device_id]
+            nest_dev = self.globals[SHADOW_STATES].device(nest_device_id)
+            if nest_dev is None:
+                return
             nest_dev_props = nest_dev.pluginProps
             hub_id = int(nest_dev_props.get("starling_hub_indigo_id", 0))
             if hub_id == 0:
                 self.hubHandlerLogger.error(f"Warning: Starling Hub id not defined for {nest_dev.name}")
                 return
 
-            nest_device_command = f"devices/{nest_dev.address}"
-
-            status, result = self.access_starling_hub(starling_hub_dev, GET_CONTROL_API_DEVICES_ID, nest_device_command)
+            if prefetched_reply is None:
+                prefetched_reply = self.fetch_nest_device(nest_device_id)
+            status, result = prefetched_reply[0], prefetched_reply[1]  # May have been retrieved concurrently as part of a batch
+            fingerprint = prefetched_reply[2] if len(prefetched_reply) > 2 else None
+            reply_received_at = prefetched_reply[3] if len(prefetched_reply) > 3 else time.time()
 
             if status != "OK":
+                self.payload_fingerprints.pop(nest_dev.id, None)  # Ensure the next successful reply is processed in full
                 error_code = result[0]
                 # error_message = result[1]
                 keyValueList = [
@@ -293,36 +922,40 @@ class Thread_Hub_Handler(threading.Thread):
 
                 nest_properties = result["properties"]
 
-                # Properties common across all devices
-                nest_type = nest_properties["type"]
-                nest_id = nest_properties["id"]
-                nest_where = nest_properties["where"]
-                nest_name = nest_properties["name"]
-                nest_serial_number = nest_properties["serialNumber"]
-                nest_structure_name = nest_properties["structureName"]
-
-                # Properties common across all devices
-                # keyValueList.append({"key": "type", "value": nest_type})
-                # keyValueList.append({"key": "id", "value": nest_id})
-                if nest_dev.deviceTypeId != "nestHomeAwayControl":
-                    if nest_dev.states["where"] != nest_where:
-                        keyValueList.append({"key": "where", "value": nest_where})
-                if nest_dev.states["name"] != nest_name:
-                    keyValueList.append({"key": "name", "value": nest_name})
-                if nest_dev.deviceTypeId != "nestHomeAwayControl":
-                    if nest_dev.states["serial_number"] != nest_serial_number:
-                        keyValueList.append({"key": "serial_number", "value": nest_serial_number})
-                if nest_dev.states["structure_name"] != nest_structure_name:
-                    keyValueList.append({"key": "structure_name", "value": nest_structure_name})
-
-                if nest_dev.deviceTypeId == "nestThermostat":
-                    self.handle_devices_command_thermostat(command, hub_id, nest_dev, nest_properties, keyValueList)
-                elif nest_dev.deviceTypeId == "nestProtect":
-                    self.handle_devices_command_protect(command, hub_id, nest_dev, nest_properties, keyValueList)
-                elif nest_dev.deviceTypeId == "nestHomeAwayControl":
-                    self.handle_devices_command_home_away_control(command, hub_id, nest_dev, nest_properties, keyValueList)
-                elif nest_dev.deviceTypeId == "nestWeather":
-                    self.handle_devices_command_weather(command, hub_id, nest_dev, nest_properties, keyValueList)
+                self.reply_received_at = reply_received_at
+                self.previous_reply_received_at = self.reply_received_times.get(nest_dev.id, None)
+                self.reply_received_times[nest_dev.id] = reply_received_at
+
+                # Let the poll scheduler adapt this device's polling interval to how often its properties change
+                self.globals[POLL_SCHEDULER].report_properties(nest_dev.id, nest_properties)
+
+                # Skip the device handlers if the Starling Hub reply is byte-for-byte the same as the last one processed.
+                #   Never whilst debug overrides are active, as they are applied by the (Protect, Thermostat and Home/Away) handlers.
+                if fingerprint is not None:
+                    if (command != API_COMMAND_START_DEVICE and len(keyValueList) == 0
+                            and self.payload_fingerprints.get(nest_dev.id, None) == fingerprint
+                            and not self.starling_debug_active()):
+                        self.payload_fingerprint_hits += 1
+                        return
+                    self.payload_fingerprint_misses += 1
+                    self.payload_fingerprints[nest_dev.id] = fingerprint
+
+                # Debug overrides are applied before the Nest properties are mapped to states (see apply_debug_overrides_...)
+                if self.starling_debug_active():
+                    debug_overrides_handler = DEBUG_OVERRIDES_REGISTRY.get(nest_dev.deviceTypeId, None)
+                    if debug_overrides_handler is not None:
+                        debug_overrides_handler(self, nest_properties)
+
+                # Properties common across all devices, plus simple device specific properties, are mapped to the primary
+                #   device's states by the declarative state mapper (see STATE_MAPPINGS in stateMapping.py)
+                self.state_mapper.diff(command, nest_dev.deviceTypeId, nest_dev_props, nest_properties,
+                                       {MAPPING_TARGET_PRIMARY: nest_dev.states}, {MAPPING_TARGET_PRIMARY: keyValueList})
+
+                device_type_handler = DEVICE_TYPE_REGISTRY.get(nest_dev.deviceTypeId, None)
+                if device_type_handler is not None:
+                    device_type_handler(self, command, hub_id, nest_dev, nest_properties, keyValueList)
+                else:
+                    self.hubHandlerLogger.debug(f"No handler registered for Nest device type '{nest_dev.deviceTypeId}' of '{nest_dev.name}'")
 
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
@@ -331,22 +964,6 @@ class Thread_Hub_Handler(threading.Thread):
         try:
             # self.globals[HUBS][hub_id][NEST_DEVICES_BY_INDIGO_DEVICE_ID]
 
-            # DEBUG SETUP START ...
-            if "_starling_debug" in indigo.variables and indigo.variables["_starling_debug"].getValue(bool):
-                starling_debug_protect = indigo.variables["_starling_debug_protect"].getValue(bool)
-                if starling_debug_protect:
-                    if "Kitchen" in nest_properties["where"]:
-                        nest_properties["smokeDetected"] = indigo.variables["starling_smoke_kitchen"].getValue(bool)
-                        nest_properties["coDetected"] = indigo.variables["starling_co_kitchen"].getValue(bool)
-                    elif "Den" in nest_properties["where"]:
-                        nest_properties["smokeDetected"] = indigo.variables["starling_smoke_study"].getValue(bool)
-                        nest_properties["coDetected"] = indigo.variables["starling_co_study"].getValue(bool)
-                    nest_properties["manualTestActive"] = indigo.variables["starling_manual_test"].getValue(bool)
-                    if indigo.variables["starling_occupancy_enabled"].getValue(bool):
-                        nest_properties["occupancyDetected"] = indigo.variables["starling_occupancy"].getValue(bool)
-                    nest_properties["batteryStatus"] = indigo.variables["starling_battery"].value
-            # .. DEBUG SETUP END
-
             # Properties below already processed by invoking metheod:
             #   nest_id = nest_properties["id"]
             #   nest_name = nest_properties["name"]
@@ -355,20 +972,13 @@ class Thread_Hub_Handler(threading.Thread):
             #   nest_type = nest_properties["type"]
             #   nest_where = nest_properties["where"]
 
-            # Nest Protect Specific properties
-            nest_battery_status = nest_properties["batteryStatus"]
+            # Nest Protect Specific properties: batteryStatus is mapped to states by the state mapper
             nest_co_detected = nest_properties["coDetected"]
             # nest_manual_test_active = nest_properties["manualTestActive"]
             nest_manual_test_active = False
             nest_occupancy_detected = nest_properties.get("occupancyDetected", None)
             nest_smoke_detected = nest_properties["smokeDetected"]
 
-            # Battery Status Check
-            battery_level = 100 if nest_battery_status == "normal" else 20
-            if nest_dev.states["batteryLevel"] != battery_level:
-                keyValueList.append({"key": "batteryLevel", "value": battery_level})
-                keyValueList.append({"key": "batteryStatus", "value": nest_battery_status})
-
             # CO Device Check
             # self.hubHandlerLogger.error(f"Checking CO for device '{nest_dev.name}'")
             if CO_DEV_ID in self.globals[HUBS][hub_id][NEST_DEVICES_BY_INDIGO_DEVICE_ID][nest_dev.id]:
@@ -378,7 +988,7 @@ class Thread_Hub_Handler(threading.Thread):
             if nest_dev_co_id == 0:
                 # Create CO device
                 nest_dev_co_id = self.create_co_sensor_device(hub_id, nest_dev)
-            nest_dev_co = indigo.devices[nest_dev_co_id]
+            nest_dev_co = self.globals[SHADOW_STATES].device(nest_dev_co_id)
             keyValueList_co = list()
 
             if (nest_dev_co.states["onOffState"] != nest_co_detected) or (command == API_COMMAND_START_DEVICE):
@@ -420,7 +1030,7 @@ class Thread_Hub_Handler(threading.Thread):
                 if nest_dev_motion_id == 0:
                     # Create Motion device
                     nest_dev_motion_id = self.create_motion_sensor_device(hub_id, nest_dev)
-                nest_dev_motion = indigo.devices[nest_dev_motion_id]
+                nest_dev_motion = self.globals[SHADOW_STATES].device(nest_dev_motion_id)
                 keyValueList_motion = list()
 
                 if (nest_dev_motion.states["onOffState"] != nest_occupancy_detected) or (command == API_COMMAND_START_DEVICE):
@@ -525,6 +1135,10 @@ class Thread_Hub_Handler(threading.Thread):
                     if (alerts_previously_in_progress == 0) or (alerts_currently_in_progress == 0):
                         self.checkAllNestsTriggers(alerts_currently_in_progress)
 
+                if nest_alert_currently_in_progress and not nest_alert_previously_in_progress and command != API_COMMAND_START_DEVICE:
+                    self.record_alert_latency(nest_dev)
+                self.update_alert_mode()  # Switch the Starling Hub's Nest Protects to (or from) the alert polling lane
+
             if len(keyValueList) > 0:
                 nest_dev.updateStatesOnServer(keyValueList)
             if nest_dev.displayStateImageSel != k_state_image_sel:
@@ -538,91 +1152,111 @@ class Thread_Hub_Handler(threading.Thread):
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
 
+    def apply_debug_overrides_protect(self, nest_properties):
+        try:
+            # Override the Nest Protect properties from the "starling_..." Indigo variables for testing
+            debug_overrides = self.globals[DEBUG_OVERRIDES]
+            starling_debug_protect = debug_overrides.variable("_starling_debug_protect").getValue(bool)
+            if starling_debug_protect:
+                if "Kitchen" in nest_properties["where"]:
+                    nest_properties["smokeDetected"] = debug_overrides.variable("starling_smoke_kitchen").getValue(bool)
+                    nest_properties["coDetected"] = debug_overrides.variable("starling_co_kitchen").getValue(bool)
+                elif "Den" in nest_properties["where"]:
+                    nest_properties["smokeDetected"] = debug_overrides.variable("starling_smoke_study").getValue(bool)
+                    nest_properties["coDetected"] = debug_overrides.variable("starling_co_study").getValue(bool)
+                nest_properties["manualTestActive"] = debug_overrides.variable("starling_manual_test").getValue(bool)
+                if debug_overrides.variable("starling_occupancy_enabled").getValue(bool):
+                    nest_properties["occupancyDetected"] = debug_overrides.variable("starling_occupancy").getValue(bool)
+                nest_properties["batteryStatus"] = debug_overrides.variable("starling_battery").value
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def apply_debug_overrides_thermostat(self, nest_properties):
+        try:
+            # Override the Nest Thermostat properties from the "starling_..." Indigo variables for testing
+            debug_overrides = self.globals[DEBUG_OVERRIDES]
+            starling_debug_thermostat = debug_overrides.variable("_starling_debug_thermostat").getValue(bool)
+            if starling_debug_thermostat:
+                if debug_overrides.variable("starling_hvac_mode_enabled").getValue(bool):
+                    nest_properties["hvacMode"] = debug_overrides.variable("starling_hvac_mode").value
+                    nest_properties["hvacState"] = debug_overrides.variable("starling_hvac_state").value
+                if debug_overrides.variable("starling_hot_water_enabled").getValue(bool):
+                    nest_properties["hotWaterEnabled"] = debug_overrides.variable("starling_hot_water").getValue(bool)
+                elif debug_overrides.variable("starling_hot_water_disabled").getValue(bool):
+                    if "hotWaterEnabled" in nest_properties:
+                        del nest_properties["hotWaterEnabled"]
+                nest_properties["canCool"] = debug_overrides.variable("starling_can_cool").getValue(bool)
+                if nest_properties["canCool"]:
+                    nest_properties["targetCoolingThresholdTemperature"] = debug_overrides.variable("starling_threshold_cooling").getValue(float)
+                    nest_properties["targetHeatingThresholdTemperature"] = debug_overrides.variable("starling_threshold_heating").getValue(float)
+                if debug_overrides.variable("starling_eco_mode_enabled").getValue(bool):
+                    nest_properties["ecoMode"] = debug_overrides.variable("starling_eco_mode").getValue(bool)
+                elif debug_overrides.variable("starling_eco_mode_disabled").getValue(bool):
+                    if "ecoMode" in nest_properties:
+                        del nest_properties["ecoMode"]
+                if debug_overrides.variable("starling_fan_running_enabled").getValue(bool):
+                    nest_properties["fanRunning"] = debug_overrides.variable("starling_fan_running").getValue(bool)
+                if debug_overrides.variable("starling_humidifier_enabled").getValue(bool):
+                    nest_properties["currentHumidifierState"] = debug_overrides.variable("starling_humidifier_current_state").value
+                    nest_properties["humidifierActive"] = debug_overrides.variable("starling_humidifier_active").getValue(bool)
+                    nest_properties["targetHumidity"] = debug_overrides.variable("starling_humidifier_target_humidity").getValue(int)
+                if debug_overrides.variable("starling_backplate_temperature_overide_enabled").getValue(bool):
+                    nest_properties["backplateTemperature"] = debug_overrides.variable("starling_backplate_temperature").getValue(float)
+                    nest_properties["currentTemperature"] = debug_overrides.variable("starling_backplate_temperature").getValue(float)
+                if debug_overrides.variable("starling_humidity_override_enabled").getValue(bool):
+                    nest_properties["humidityPercent"] = debug_overrides.variable("starling_humidity").getValue(int)
+                    if debug_overrides.variable("starling_humidifier_enabled").getValue(bool):
+                        if nest_properties["targetHumidity"] < nest_properties["humidityPercent"]:
+                            nest_properties["currentHumidifierState"] = "dehumidifying"
+                        elif nest_properties["targetHumidity"] > nest_properties["humidityPercent"]:
+                            nest_properties["currentHumidifierState"] = "humidifying"
+                        else:
+                            nest_properties["currentHumidifierState"] = "idle"
+                if debug_overrides.variable("starling_temp_hold_mode_enabled").getValue(bool):
+                    nest_properties["tempHoldMode"] = debug_overrides.variable("starling_temp_hold_mode").getValue(bool)
+                if debug_overrides.variable("starling_preset_selected_enabled").getValue(bool):
+                    nest_properties["presetSelected"] = debug_overrides.variable("starling_preset_selected").value
+                self.hubHandlerLogger.warning(f"Modified Message: {nest_properties} ")
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def apply_debug_overrides_home_away_control(self, nest_properties):
+        try:
+            # Override the Nest Home/Away Control properties from the "starling_..." Indigo variables for testing
+            debug_overrides = self.globals[DEBUG_OVERRIDES]
+            starling_debug_home_away_control = debug_overrides.variable("_starling_debug_home_away_control").getValue(bool)
+            if starling_debug_home_away_control:
+                nest_properties["homeState"] = debug_overrides.variable("starling_home_away_control").getValue(bool)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def starling_debug_active(self):
+        # True if the "_starling_debug" Indigo variable is overriding Nest device properties for testing
+        return self.globals[DEBUG_OVERRIDES].active
+
     def checkIndividualNestTriggers(self, dev, alert_in_progress):
 
         if not dev.enabled:
             return
-        for trigger in self.globals[TRIGGERS_NEST_PROTECT].values():
-            self.hubHandlerLogger.debug(f"{trigger.name}: Testing Event Trigger")
-
-            # self.hubHandlerLogger.info(f"Trigger: {trigger.name}, Alerts In progress: {len(self.globals[ALERTS_IN_PROGRESS])}:\n{trigger}\n")
-            if trigger.pluginTypeId in ("alertDetected", "alertNoLongerDetected"):
-                if trigger.pluginProps.get("nestProtectDevice", "") == str(dev.id):
-                    self.hubHandlerLogger.debug(f"{trigger.name}: Nest protect '{dev.name}'")
-                    if trigger.pluginTypeId == "alertDetected":
-                        if alert_in_progress:
-                            indigo.trigger.execute(trigger)
-                    elif trigger.pluginTypeId == "alertNoLongerDetected":
-                        if not alert_in_progress:
-                            indigo.trigger.execute(trigger)
-            else:
-                self.hubHandlerLogger.error(f"{trigger.name}: Ignoring Trigger Type {trigger.pluginTypeId}")
+        # Triggers are indexed by (Nest Protect Indigo device id, trigger type id) in triggerStartProcessing
+        trigger_type_id = "alertDetected" if alert_in_progress else "alertNoLongerDetected"
+        for trigger in list(self.globals[TRIGGERS_NEST_PROTECT].get((dev.id, trigger_type_id), dict()).values()):
+            self.hubHandlerLogger.debug(f"{trigger.name}: Nest protect '{dev.name}'")
+            indigo.trigger.execute(trigger)
 
     def checkAllNestsTriggers(self, alerts_currently_in_progress):
 
-        for trigger in self.globals[TRIGGERS_NEST_PROTECTS_ALL].values():
-            self.hubHandlerLogger.debug(f"{trigger.name}: Testing Event Trigger")
-
-            # self.hubHandlerLogger.info(f"Trigger: {trigger.name}, Alerts In progress: {len(self.globals[ALERTS_IN_PROGRESS])}:\n{trigger}\n")
-
-            if trigger.pluginTypeId == "alertDetectedAnyProtect":
-                if alerts_currently_in_progress > 0:
-                    indigo.trigger.execute(trigger)
-            elif trigger.pluginTypeId == "alerttNoLongeDetectedAnyProtect":
-                if alerts_currently_in_progress == 0:
-                    indigo.trigger.execute(trigger)
-            else:
-                self.hubHandlerLogger.error(f"{trigger.name}: Ignoring Trigger Type {trigger.pluginTypeId}")
+        # Triggers are indexed by trigger type id in triggerStartProcessing
+        trigger_type_id = "alertDetectedAnyProtect" if alerts_currently_in_progress > 0 else "alerttNoLongeDetectedAnyProtect"
+        for trigger in list(self.globals[TRIGGERS_NEST_PROTECTS_ALL].get(trigger_type_id, dict()).values()):
+            self.hubHandlerLogger.debug(f"{trigger.name}: Alerts in progress: {alerts_currently_in_progress}")
+            indigo.trigger.execute(trigger)
 
     def handle_devices_command_thermostat(self, command, hub_id, nest_dev, nest_properties, keyValueList):
         try:
-            # DEBUG SETUP START ...
-            if "_starling_debug" in indigo.variables and indigo.variables["_starling_debug"].getValue(bool):
-                starling_debug_thermostat = indigo.variables["_starling_debug_thermostat"].getValue(bool)
-                if starling_debug_thermostat:
-                    if indigo.variables["starling_hvac_mode_enabled"].getValue(bool):
-                        nest_properties["hvacMode"] = indigo.variables["starling_hvac_mode"].value
-                        nest_properties["hvacState"] = indigo.variables["starling_hvac_state"].value
-                    if indigo.variables["starling_hot_water_enabled"].getValue(bool):
-                        nest_properties["hotWaterEnabled"] = indigo.variables["starling_hot_water"].getValue(bool)
-                    elif indigo.variables["starling_hot_water_disabled"].getValue(bool):
-                        if "hotWaterEnabled" in nest_properties:
-                            del nest_properties["hotWaterEnabled"]
-                    nest_properties["canCool"] = indigo.variables["starling_can_cool"].getValue(bool)
-                    if nest_properties["canCool"]:
-                        nest_properties["targetCoolingThresholdTemperature"] = indigo.variables["starling_threshold_cooling"].getValue(float)
-                        nest_properties["targetHeatingThresholdTemperature"] = indigo.variables["starling_threshold_heating"].getValue(float)
-                    if indigo.variables["starling_eco_mode_enabled"].getValue(bool):
-                        nest_properties["ecoMode"] = indigo.variables["starling_eco_mode"].getValue(bool)
-                    elif indigo.variables["starling_eco_mode_disabled"].getValue(bool):
-                        if "ecoMode" in nest_properties:
-                            del nest_properties["ecoMode"]
-                    if indigo.variables["starling_fan_running_enabled"].getValue(bool):
-                        nest_properties["fanRunning"] = indigo.variables["starling_fan_running"].getValue(bool)
-                    if indigo.variables["starling_humidifier_enabled"].getValue(bool):
-                        nest_properties["currentHumidifierState"] = indigo.variables["starling_humidifier_current_state"].value
-                        nest_properties["humidifierActive"] = indigo.variables["starling_humidifier_active"].getValue(bool)
-                        nest_properties["targetHumidity"] = indigo.variables["starling_humidifier_target_humidity"].getValue(int)
-                    if indigo.variables["starling_backplate_temperature_overide_enabled"].getValue(bool):
-                        nest_properties["backplateTemperature"] = indigo.variables["starling_backplate_temperature"].getValue(float)
-                        nest_properties["currentTemperature"] = indigo.variables["starling_backplate_temperature"].getValue(float)
-                    if indigo.variables["starling_humidity_override_enabled"].getValue(bool):
-                        nest_properties["humidityPercent"] = indigo.variables["starling_humidity"].getValue(int)
-                        if indigo.variables["starling_humidifier_enabled"].getValue(bool):
-                            if nest_properties["targetHumidity"] < nest_properties["humidityPercent"]:
-                                nest_properties["currentHumidifierState"] = "dehumidifying"
-                            elif nest_properties["targetHumidity"] > nest_properties["humidityPercent"]:
-                                nest_properties["currentHumidifierState"] = "humidifying"
-                            else:
-                                nest_properties["currentHumidifierState"] = "idle"
-                    if indigo.variables["starling_temp_hold_mode_enabled"].getValue(bool):
-                        nest_properties["tempHoldMode"] = indigo.variables["starling_temp_hold_mode"].getValue(bool)
-                    if indigo.variables["starling_preset_selected_enabled"].getValue(bool):
-                        nest_properties["presetSelected"] = indigo.variables["starling_preset_selected"].value
-                    self.hubHandlerLogger.warning(f"Modified Message: {nest_properties} ")
-
-            # .. DEBUG SETUP END
-
             # Properties below already processed by invoking metheod:
             #   nest_id = nest_properties["id"]
             #   nest_name = nest_properties["name"]
@@ -631,30 +1265,15 @@ class Thread_Hub_Handler(threading.Thread):
             #   nest_type = nest_properties["type"]
             #   nest_where = nest_properties["where"]
 
-            # Thermostat specific properties
-            if "backplateTemperature" in nest_properties:
-                nest_backplate_temperature = nest_properties["backplateTemperature"]
-            else:
-                nest_backplate_temperature = nest_properties["currentTemperature"]
+            # Thermostat specific properties: plain value properties (capabilities, temperatures, humidity, humidifier, ...)
+            #   are mapped to the primary and humidifier device states by the state mapper (see STATE_MAPPINGS)
             nest_can_cool = nest_properties["canCool"]
-            nest_can_heat = nest_properties["canHeat"]
             nest_current_humidifier_state = nest_properties.get("currentHumidifierState", None)
-            nest_current_temperature = nest_properties["currentTemperature"]
             nest_display_temperature_units = nest_properties.get("displayTemperatureUnits", "")
             nest_eco_mode = nest_properties.get("ecoMode", None)
             nest_fan_running = nest_properties.get("fanRunning", None)
             nest_hot_water_enabled = nest_properties.get("hotWaterEnabled", None)
             nest_humidifier_active = nest_properties.get("humidifierActive", None)
-            nest_humidity_percent = nest_properties["humidityPercent"]
-
-            # Fix 2023-11-21: See https://forums.indigodomo.com/viewtopic.php?f=369&t=27594
-            try:
-                nest_humidity_percent = int(round(float(nest_humidity_percent)))
-            except ValueError:
-                pass
-            # Fix end.
-
-            nest_humidity_percent_ui = f"{nest_humidity_percent}%"
             nest_hvac_mode = nest_properties["hvacMode"]
             nest_hvac_state = nest_properties["hvacState"]
             nest_sensor_selected = nest_properties.get("sensorSelected", None)
@@ -678,25 +1297,19 @@ class Thread_Hub_Handler(threading.Thread):
                 nest_dev_props["preset_enabled"] = False if nest_preset_selected is None else True
                 nest_dev_props["sensor_enabled"] = False if nest_sensor_selected is None else True
                 nest_dev_props["temp_hold_mode_enabled"] = False if nest_temp_hold_mode is None else True
-                nest_dev.replacePluginPropsOnServer(nest_dev_props)
-                nest_dev_id = nest_dev.id
-                nest_dev = indigo.devices[nest_dev_id]  # Refresh Indigo Device to ensure Plugin Props updated in working copy
+                nest_dev.replacePluginPropsOnServer(nest_dev_props)  # Also refreshes the shadow's working copy of the Plugin Props
                 nest_dev.stateListOrDisplayStateIdChanged()  # Force State List update via getDeviceStateList method
 
             nest_dev_props = nest_dev.pluginProps
 
             # TODO: FINISH CHECKING can cool
 
-            if (nest_dev.states["can_cool"] != nest_can_cool) or (command == API_COMMAND_START_DEVICE):
-                keyValueList.append({"key": "can_cool", "value": nest_can_cool})
-
             supports_cool_setpoint = bool(nest_dev_props.get("SupportsCoolSetpoint", False))
             if nest_can_cool != supports_cool_setpoint:
                 nest_dev_props["SupportsCoolSetpoint"] = nest_can_cool
                 nest_dev.replacePluginPropsOnServer(nest_dev_props)
 
-            if (nest_dev.states["can_heat"] != nest_can_heat) or (command == API_COMMAND_START_DEVICE):
-                keyValueList.append({"key": "can_heat", "value": nest_can_heat})
+            nest_can_heat = nest_properties["canHeat"]
             if nest_can_heat != nest_dev_props.get("supportsHeatSetpoint", False):
                 nest_dev_props["supportsHeatSetpoint"] = nest_can_heat
                 nest_dev.replacePluginPropsOnServer(nest_dev_props)
@@ -704,37 +1317,8 @@ class Thread_Hub_Handler(threading.Thread):
             if nest_eco_mode is not None:
                 if (nest_dev.states["eco_mode"] != nest_eco_mode) or (command == API_COMMAND_START_DEVICE):
                     keyValueList.append({"key": "eco_mode", "value": nest_eco_mode})
-                    if nest_eco_mode:
-                        if nest_can_cool:
-                            indigo_hvac_mode =indigo.kHvacMode.ProgramHeatCool
-                        else:
-                            indigo_hvac_mode = indigo.kHvacMode.ProgramHeat
-                    else:
-                        if nest_can_cool:
-                            indigo_hvac_mode = indigo.kHvacMode.HeatCool
-                        else:
-                            indigo_hvac_mode = indigo.kHvacMode.Heat
-                    keyValueList.append({"key": "hvacOperationMode", "value": indigo_hvac_mode})
-
-            if nest_sensor_selected is not None:
-                if (nest_dev.states["sensor_selected"] != nest_sensor_selected) or (command == API_COMMAND_START_DEVICE):
-                    keyValueList.append({"key": "sensor_selected", "value": nest_sensor_selected})
-
-            if nest_preset_selected is not None:
-                if (nest_dev.states["preset_selected"] != nest_preset_selected) or (command == API_COMMAND_START_DEVICE):
-                    keyValueList.append({"key": "preset_selected", "value": nest_preset_selected})
-
-            if nest_temp_hold_mode is not None:
-                if (nest_dev.states["temp_hold_mode"] != nest_temp_hold_mode) or (command == API_COMMAND_START_DEVICE):
-                    keyValueList.append({"key": "temp_hold_mode", "value": nest_temp_hold_mode})
 
             if nest_display_temperature_units == "F":
-                nest_backplate_temperature = round((((float(nest_backplate_temperature) * 9) / 5) + 32.0), 1)
-                nest_backplate_temperature_ui = f"{nest_backplate_temperature}°F"
-
-                nest_current_temperature = round((((float(nest_current_temperature) * 9) / 5) + 32.0), 1)
-                nest_current_temperature_ui = f"{nest_current_temperature}°F"
-
                 if nest_can_cool:
                     nest_target_cooling_threshold_temperature = int(round((((float(nest_target_cooling_threshold_temperature) * 9) / 5) + 32.0), 0))
                     nest_target_cooling_threshold_temperature_ui = f"{nest_target_cooling_threshold_temperature}°F"
@@ -746,12 +1330,6 @@ class Thread_Hub_Handler(threading.Thread):
                 nest_target_temperature_ui = f"{nest_target_temperature}"
 
             else:
-                nest_backplate_temperature = round(nest_backplate_temperature, 1)
-                nest_backplate_temperature_ui = f"{nest_backplate_temperature}°C"
-
-                nest_current_temperature = round(nest_current_temperature, 1)
-                nest_current_temperature_ui = f"{nest_current_temperature}°C"
-
                 if nest_can_cool:
                     nest_target_cooling_threshold_temperature = round(nest_target_cooling_threshold_temperature, 1)
                     nest_target_cooling_threshold_temperature_ui = f"{nest_target_cooling_threshold_temperature}°C"
@@ -762,40 +1340,22 @@ class Thread_Hub_Handler(threading.Thread):
                 nest_target_temperature = round(nest_target_temperature, 1)
                 nest_target_temperature_ui = f"{nest_target_temperature}°C"
 
-            if (nest_dev.states["display_temperature_units"] != nest_display_temperature_units) or (command == API_COMMAND_START_DEVICE):
-                keyValueList.append({"key": "display_temperature_units", "value": nest_display_temperature_units})
-
-            if (nest_dev.states["backplate_temperature"] != nest_backplate_temperature) or (command == API_COMMAND_START_DEVICE):
-                keyValueList.append({"key": "backplate_temperature", "value": nest_backplate_temperature, "uiValue": nest_backplate_temperature_ui})
-            if (nest_dev.states["current_temperature"] != nest_current_temperature) or (command == API_COMMAND_START_DEVICE):
-                keyValueList.append({"key": "current_temperature", "value": nest_current_temperature, "uiValue": nest_current_temperature_ui})
-                keyValueList.append({"key": "temperatureInput1", "value": nest_current_temperature, "uiValue": nest_current_temperature_ui})
-                if not nest_dev_props.get("hideTemperatureBroadcast", False):
-                    self.hubHandlerLogger.info(f"Received \"{nest_dev.name}\" temperature update to {nest_current_temperature_ui}")
+            for key_value in keyValueList:
+                if key_value["key"] == "current_temperature" and not nest_dev_props.get("hideTemperatureBroadcast", False):
+                    self.hubHandlerLogger.info(f"Received \"{nest_dev.name}\" temperature update to {key_value['uiValue']}")
+                elif key_value["key"] == "humidity_percent" and not nest_dev_props.get("hideHumidityBroadcast", False):
+                    self.hubHandlerLogger.info(f"Received \"{nest_dev.name}\" humidity update to {key_value['uiValue']}")
 
             hvac_mode_changed = False
             if (nest_dev.states["hvac_mode"] != nest_hvac_mode) or (command == API_COMMAND_START_DEVICE):
                 hvac_mode_changed = True
                 keyValueList.append({"key": "hvac_mode", "value": nest_hvac_mode})
 
-                # TODO: Enhance following code.
-
-                # Set Indigo required internal state: hvacOperationMode
-                if nest_eco_mode is not None and nest_eco_mode:
-                    if nest_can_cool:
-                        keyValueList.append({"key": "hvacOperationMode", "value": indigo.kHvacMode.ProgramHeatCool})
-                    else:
-                        keyValueList.append({"key": "hvacOperationMode", "value": indigo.kHvacMode.ProgramHeat})
-                    # keyValueList.append({"key": "hvac_mode", "value": "eco"})  # Not a valid Starling Nest Thermostat mode BUT indicates what is happening TODO Remove this?
-                else:
-                    if nest_hvac_mode == "heat":
-                        keyValueList.append({"key": "hvacOperationMode", "value": indigo.kHvacMode.Heat})
-                    elif nest_hvac_mode == "cool":
-                        keyValueList.append({"key": "hvacOperationMode", "value": indigo.kHvacMode.Cool})
-                    elif nest_hvac_mode == "heatCool":
-                        keyValueList.append({"key": "hvacOperationMode", "value": indigo.kHvacMode.HeatCool})
-                    else:  # Assume: nest_hvac_mode = 'off'
-                        keyValueList.append({"key": "hvacOperationMode", "value": indigo.kHvacMode.Off})
+            # Set Indigo required internal state: hvacOperationMode, derived from both the HVAC mode and Eco mode so that a
+            #   change to either (including a rejected write being rolled back, see handle_confirm_devices) is reflected
+            indigo_hvac_mode = self.derive_hvac_operation_mode(nest_hvac_mode, nest_eco_mode, nest_can_cool)
+            if (nest_dev.states.get("hvacOperationMode", None) != indigo_hvac_mode) or (command == API_COMMAND_START_DEVICE):
+                keyValueList.append({"key": "hvacOperationMode", "value": indigo_hvac_mode})
 
             if (nest_dev.states["hvac_state"] != nest_hvac_state) or (command == API_COMMAND_START_DEVICE):
                 keyValueList.append({"key": "hvac_state", "value": nest_hvac_state})
@@ -846,13 +1406,6 @@ class Thread_Hub_Handler(threading.Thread):
                     if not nest_dev_props.get("hideSetpointBroadcast", False):
                         self.hubHandlerLogger.info(f"Received \"{nest_dev.name}\" set heating threshold setpoint to {nest_target_heating_threshold_temperature_ui}")
 
-            if (nest_dev.states["humidity_percent"] != nest_humidity_percent) or (command == API_COMMAND_START_DEVICE):
-                keyValueList.append({"key": "humidity_percent", "value": nest_humidity_percent, "uiValue": nest_humidity_percent_ui})
-                # Set Indigo required internal states: humidityInput1
-                keyValueList.append({"key": "humidityInput1", "value": nest_humidity_percent, "uiValue": nest_humidity_percent_ui})
-                if not nest_dev_props.get("hideHumidityBroadcast", False):
-                    self.hubHandlerLogger.info(f"Received \"{nest_dev.name}\" humidity update to {nest_humidity_percent_ui}")
-
             # Humidifier Device Check
             if HUMIDIFIER_DEV_ID not in self.globals[HUBS][hub_id][NEST_DEVICES_BY_INDIGO_DEVICE_ID][nest_dev.id]:
                 self.globals[HUBS][hub_id][NEST_DEVICES_BY_INDIGO_DEVICE_ID][nest_dev.id][HUMIDIFIER_DEV_ID] = 0
@@ -869,24 +1422,11 @@ class Thread_Hub_Handler(threading.Thread):
                     # Create Humidifier device
                     nest_dev_humidifier_id = self.create_humidifier_device(hub_id, nest_dev)
 
-                nest_dev_humidifier = indigo.devices[nest_dev_humidifier_id]
+                nest_dev_humidifier = self.globals[SHADOW_STATES].device(nest_dev_humidifier_id)
                 keyValueList_humidifier = list()
-                current_humidifier_state_changed = False
-                if (nest_dev_humidifier.states["humidifier_active"] != nest_humidifier_active) or (command == API_COMMAND_START_DEVICE):
-                    keyValueList_humidifier.append({"key": "humidifier_active", "value": nest_humidifier_active})
-                    # keyValueList.append({"key": "humidifier_active", "value": nest_humidifier_active})  # TODO: Implement this?
-                if (nest_dev_humidifier.states["current_humidifier_state"] != nest_current_humidifier_state) or (command == API_COMMAND_START_DEVICE):
-                    keyValueList_humidifier.append({"key": "current_humidifier_state", "value": nest_current_humidifier_state})
-                    # keyValueList.append({"key": "current_humidifier_state", "value": nest_current_humidifier_state})  # TODO: Implement this for primary device?
-                    current_humidifier_state_changed = True
-                if (nest_dev_humidifier.states["target_humidity"] != nest_target_humidity) or (command == API_COMMAND_START_DEVICE):
-                    keyValueList_humidifier.append({"key": "target_humidity", "value": nest_target_humidity})
-                    keyValueList_humidifier.append({"key": "brightnessLevel", "value": int(nest_target_humidity)})
-                    # keyValueList.append({"key": "target_humidity", "value": nest_target_humidity})  # TODO: Implement this for primary device?
-                    current_humidifier_state_changed = True
-                if (nest_dev_humidifier.states["humidity_percent"] != nest_humidity_percent) or (command == API_COMMAND_START_DEVICE):
-                    keyValueList_humidifier.append({"key": "humidity_percent", "value": nest_humidity_percent})
-                    # Note that the main Thermostat device has the humidity percent updated separately as not dependent on having a humidifier
+                self.state_mapper.diff(command, nest_dev.deviceTypeId, nest_dev_props, nest_properties,
+                                       {MAPPING_TARGET_HUMIDIFIER: nest_dev_humidifier.states}, {MAPPING_TARGET_HUMIDIFIER: keyValueList_humidifier})
+                current_humidifier_state_changed = any(key_value["key"] in ("current_humidifier_state", "target_humidity") for key_value in keyValueList_humidifier)
                 if len(keyValueList_humidifier) > 0:
                     if current_humidifier_state_changed:
                         # Set Indigo required internal states: hvacDehumidifierIsOn, hvacHumidifierIsOn  TODO: Implement this for primary device??
@@ -923,7 +1463,7 @@ class Thread_Hub_Handler(threading.Thread):
                     # Create Fan device
                     nest_dev_fan_id = self.create_fan_device(hub_id, nest_dev)
 
-                nest_dev_fan = indigo.devices[nest_dev_fan_id]
+                nest_dev_fan = self.globals[SHADOW_STATES].device(nest_dev_fan_id)
 
                 nest_fan_running_bool = self.derive_boolean(nest_fan_running)
 
@@ -959,7 +1499,7 @@ class Thread_Hub_Handler(threading.Thread):
                     # Create Hot_water device
                     nest_dev_hot_water_id = self.create_hot_water_device(hub_id, nest_dev)
 
-                nest_dev_hot_water = indigo.devices[nest_dev_hot_water_id]
+                nest_dev_hot_water = self.globals[SHADOW_STATES].device(nest_dev_hot_water_id)
 
                 nest_hot_water_enabled_bool = self.derive_boolean(nest_hot_water_enabled)
 
@@ -983,13 +1523,6 @@ class Thread_Hub_Handler(threading.Thread):
 
     def handle_devices_command_home_away_control(self, command, hub_id, nest_dev, nest_properties, keyValueList):
         try:
-            # DEBUG SETUP START ...
-            if "_starling_debug" in indigo.variables and indigo.variables["_starling_debug"].getValue(bool):
-                starling_debug_home_away_control = indigo.variables["_starling_debug_home_away_control"].getValue(bool)
-                if starling_debug_home_away_control:
-                    nest_properties["homeState"] = indigo.variables["starling_home_away_control"].getValue(bool)
-            # .. DEBUG SETUP END
-
             # Properties below already processed by invoking metheod:
             #   nest_id = nest_properties["id"]
             #   nest_name = nest_properties["name"]
@@ -1029,27 +1562,12 @@ class Thread_Hub_Handler(threading.Thread):
             #   nest_type = nest_properties["type"]
             #   nest_where = nest_properties["where"]
 
-            # Weather specific properties
-            nest_current_temperature = nest_properties["currentTemperature"]
-            nest_humidity_percent = nest_properties["humidityPercent"]
-            nest_humidity_percent_ui = f"{nest_humidity_percent}%"
-
+            # Weather specific properties: currentTemperature and humidityPercent are mapped to states by the state mapper
             nest_dev_props = nest_dev.pluginProps
-            nest_display_temperature_units = nest_dev_props.get("temperature_units", "C")
 
-            if nest_display_temperature_units == "F":
-
-                nest_current_temperature = round((((float(nest_current_temperature) * 9) / 5) + 32.0), 1)
-                nest_current_temperature_ui = f"{nest_current_temperature}°F"
-            else:
-                nest_current_temperature = round(nest_current_temperature, 1)
-                nest_current_temperature_ui = f"{nest_current_temperature}°C"
-
-            if (nest_dev.states["current_temperature"] != nest_current_temperature) or (command == API_COMMAND_START_DEVICE):
-                keyValueList.append({"key": "current_temperature", "value": nest_current_temperature, "uiValue": nest_current_temperature_ui})
-                keyValueList.append({"key": "sensorValue", "value": nest_current_temperature, "uiValue": nest_current_temperature_ui})
-                if not nest_dev_props.get("hideTemperatureBroadcast", False):
-                    self.hubHandlerLogger.info(f"Received \"{nest_dev.name}\" temperature update to {nest_current_temperature_ui}")
+            for key_value in keyValueList:
+                if key_value["key"] == "current_temperature" and not nest_dev_props.get("hideTemperatureBroadcast", False):
+                    self.hubHandlerLogger.info(f"Received \"{nest_dev.name}\" temperature update to {key_value['uiValue']}")
 
             # Humidity Device Check
             if HUMIDITY_DEV_ID in self.globals[HUBS][hub_id][NEST_DEVICES_BY_INDIGO_DEVICE_ID][nest_dev.id]:
@@ -1059,15 +1577,13 @@ class Thread_Hub_Handler(threading.Thread):
             if nest_dev_humidity_id == 0:
                 # Create Humidity device
                 nest_dev_humidity_id = self.create_humidity_sensor_device(hub_id, nest_dev)
-            nest_dev_humidity = indigo.devices[nest_dev_humidity_id]
+            nest_dev_humidity = self.globals[SHADOW_STATES].device(nest_dev_humidity_id)
             keyValueList_humidity = list()
 
-            if (nest_dev_humidity.states["humidity_percent"] != nest_humidity_percent) or (command == API_COMMAND_START_DEVICE):
-                keyValueList_humidity.append({"key": "humidity_percent", "value": nest_humidity_percent, "uiValue": nest_humidity_percent_ui})
-                # Set Indigo required internal states: humidityInput1
-                keyValueList_humidity.append({"key": "sensorValue", "value": nest_humidity_percent, "uiValue": nest_humidity_percent_ui})
-                if not nest_dev_props.get("hideHumidityBroadcast", False):
-                    self.hubHandlerLogger.info(f"Received \"{nest_dev_humidity.name}\" humidity update to {nest_humidity_percent_ui}")
+            self.state_mapper.diff(command, nest_dev.deviceTypeId, nest_dev_props, nest_properties,
+                                   {MAPPING_TARGET_HUMIDITY: nest_dev_humidity.states}, {MAPPING_TARGET_HUMIDITY: keyValueList_humidity})
+            if len(keyValueList_humidity) > 0 and not nest_dev_props.get("hideHumidityBroadcast", False):
+                self.hubHandlerLogger.info(f"Received \"{nest_dev_humidity.name}\" humidity update to {keyValueList_humidity[0]['uiValue']}")
 
             if len(keyValueList_humidity) > 0:
                 nest_dev_humidity.updateStatesOnServer(keyValueList_humidity)
@@ -1080,14 +1596,7 @@ class Thread_Hub_Handler(threading.Thread):
 
     def determine_secondary_device_id(self, dev_id, secondary_dev_type_id):
         try:
-            dev_id_list = indigo.device.getGroupList(dev_id)
-            secondary_dev_id = 0
-            if len(dev_id_list) > 1:
-                for grouped_dev_id in dev_id_list:
-                    if grouped_dev_id != dev_id and indigo.devices[grouped_dev_id].deviceTypeId == secondary_dev_type_id:
-                        secondary_dev_id = grouped_dev_id
-                        break
-            return secondary_dev_id
+            return self.globals[DEVICE_INDEX].secondary_device_ids(dev_id).get(secondary_dev_type_id, 0)
 
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
@@ -1113,20 +1622,10 @@ class Thread_Hub_Handler(threading.Thread):
 
             previous_status_message = starling_hub_dev.states["status_message"]
 
-            props = starling_hub_dev.pluginProps
-            ip_address = props.get("starling_hub_ip", "127.0.0.1")  # Should be in format "nnn.nnn.nnn.nnn"
-            if props.get("starling_hub_ssl_tls", True):
-                https_ip = ip_address.split(".")
-                https_ip_1 = https_ip[0]
-                https_ip_2 = https_ip[1]
-                https_ip_3 = https_ip[2]
-                https_ip_4 = https_ip[3]
-                self.requests_prefix = f"https://{https_ip_1}-{https_ip_2}-{https_ip_3}-{https_ip_4}.local.starling.direct:3443/api/connect/v1/"
-            else:
-                self.requests_prefix = f"http://{ip_address}:3080/api/connect/v1/"  # noqa [http links are not secure]
-            api_key = props.get("api_key", u"not_set_in_plugin")
-            self.requests_suffix = f"?key={api_key}"
-            requests_string = f"{self.requests_prefix}{starling_command}{self.requests_suffix}"
+            hub_endpoint = self.get_hub_endpoint()
+            requests_string = f"{self.get_requests_prefix(hub_endpoint)}{starling_command}{hub_endpoint[REQUESTS_SUFFIX]}"
+
+            requests_session = self.get_requests_session(hub_endpoint)
 
             # print(f"access_starling_hub Request String: {requests_string}")
 
@@ -1134,7 +1633,8 @@ class Thread_Hub_Handler(threading.Thread):
             error_message_ui = ""
             try:
                 status_code = -1
-                reply = requests.get(requests_string, timeout=5)
+                reply = requests_session.get(requests_string, timeout=hub_endpoint[HUB_TIMEOUTS])
+                self.record_hub_success()  # The Starling Hub replied, even if with an error status
                 reply.raise_for_status()  # raise an HTTP error if one coccurred
                 # print(f"Reply Status: {reply.status_code}, Text: {reply.text}")
                 status_code = reply.status_code
@@ -1158,12 +1658,14 @@ class Thread_Hub_Handler(threading.Thread):
                     self.hubHandlerLogger.error(error_message_ui)
                 return "Error", [error_code, error_message_ui]
             except requests.exceptions.Timeout as error_message:
+                self.record_hub_failure()
                 error_code = "Timeout Error"
                 error_message_ui = f"Access Starling Hub failed with a timeout error. Retrying . . ."
                 if error_code != previous_status_message:
                     self.hubHandlerLogger.error(error_message_ui)
                 return "Error", [error_code, error_message_ui]
             except requests.exceptions.ConnectionError as error_message:
+                self.record_hub_failure()
                 error_code = "Connection Error"
                 error_message_ui = f"Access Starling Hub failed with a connection error. Retrying . . ."
                 if error_code != previous_status_message:
@@ -1177,6 +1679,7 @@ class Thread_Hub_Handler(threading.Thread):
                 return "Error", [error_code, error_message_ui]
 
             if status_code == 200:
+                self.reply_context.fingerprint = hashlib.blake2b(reply.content, digest_size=16).digest()
                 reply = reply.json()
 
                 # Check Filter
@@ -1199,6 +1702,134 @@ class Thread_Hub_Handler(threading.Thread):
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
 
+    def get_hub_endpoint(self):
+        try:
+            # Return the precomputed endpoint for this Starling Hub, only deriving it from the Hub's plugin props if it
+            #   has been invalidated (or not yet built) by the plugin
+            hub_endpoint = self.globals[HUBS][self.starling_hub_device_id].get(HUB_ENDPOINT, None)
+            if hub_endpoint is None:
+                hub_endpoint = derive_hub_endpoint(indigo.devices[self.starling_hub_device_id].pluginProps)
+                self.globals[HUBS][self.starling_hub_device_id][HUB_ENDPOINT] = hub_endpoint
+            return hub_endpoint
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def get_requests_prefix(self, hub_endpoint):
+        try:
+            # Return the requests prefix addressing the Starling Hub by its cached IP address so that the system resolver
+            #   is bypassed for "local.starling.direct" hostnames (SNI and certificate checks still use the real hostname).
+            if not hub_endpoint[HUB_SSL_TLS]:
+                return hub_endpoint[REQUESTS_PREFIX]  # Already addressed by IP address
+
+            hostname = hub_endpoint[HUB_HOSTNAME]
+            with self.dns_cache_lock:
+                dns_cache_entry = self.dns_cache.get(hostname, None)
+                if dns_cache_entry is not None and dns_cache_entry[2] > time.time():
+                    self.dns_resolver_calls_saved += 1  # Only a cache hit saves a lookup
+                    return dns_cache_entry[1]
+
+            # Resolved outside the lock so that a slow system resolver doesn't hold up the other fetch threads
+            address = decode_starling_direct_hostname(hostname)
+            if address is None:
+                try:
+                    with self.dns_cache_lock:
+                        self.dns_resolver_calls += 1
+                    address = socket.getaddrinfo(hostname, hub_endpoint[HUB_PORT], socket.AF_INET, socket.SOCK_STREAM)[0][4][0]
+                except socket.gaierror as error_message:
+                    self.hubHandlerLogger.debug(f"Unable to resolve Starling Hub hostname '{hostname}': {error_message}")
+                    return hub_endpoint[REQUESTS_PREFIX]  # Fall back to letting requests resolve the hostname
+
+            requests_prefix = f"https://{address}:{hub_endpoint[HUB_PORT]}/api/connect/v1/"
+            with self.dns_cache_lock:
+                self.dns_cache[hostname] = [address, requests_prefix, time.time() + HUB_DNS_CACHE_TTL_SECONDS]
+            return requests_prefix
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def get_requests_session(self, hub_endpoint):
+        try:
+            # Return the persistent session for this Starling Hub, (re)building it if the connection settings have changed
+            ip_address = hub_endpoint[HUB_IP_ADDRESS]
+            ssl_tls = hub_endpoint[HUB_SSL_TLS]
+            # Concurrent requests each need their own connection, so the pool must be at least as large as the concurrency limit
+            pool_size = max(hub_endpoint[HUB_CONNECTION_POOL_SIZE], hub_endpoint.get(HUB_CONCURRENT_REQUESTS, 1))
+            requests_session_key = (ip_address, ssl_tls, pool_size)
+
+            with self.requests_session_lock:
+                if self.requests_session is None or self.requests_session_key != requests_session_key:
+                    if self.requests_session is not None:
+                        self.hubHandlerLogger.debug(f"Starling Hub connection settings changed; rebuilding HTTP session [IP={ip_address}, SSL/TLS={ssl_tls}, Pool Size={pool_size}]")
+                        self.requests_session.close()
+                    requests_session = requests.Session()
+                    if ssl_tls:
+                        # Requests are addressed by IP address (see get_requests_prefix), so send the real hostname for SNI,
+                        #   certificate verification and the Host header
+                        adapter = Starling_Hub_Adapter(hub_endpoint[HUB_HOSTNAME], pool_connections=1, pool_maxsize=pool_size)
+                        requests_session.headers["Host"] = f"{hub_endpoint[HUB_HOSTNAME]}:{hub_endpoint[HUB_PORT]}"
+                    else:
+                        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+                    requests_session.mount("https://", adapter)
+                    requests_session.mount("http://", adapter)  # noqa [http links are not secure]
+                    with self.dns_cache_lock:
+                        self.dns_cache = dict()  # Connection settings changed, so drop any cached Starling Hub address
+                    self.requests_session = requests_session
+                    self.requests_session_key = requests_session_key
+
+                return self.requests_session
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def statistics_report(self):
+        try:
+            # Return a list of (description, value) tuples summarising this Hub Handler's performance counters
+            statistics = list()
+            statistics.append(("DNS Resolver Calls", self.dns_resolver_calls))
+            statistics.append(("DNS Resolver Calls Saved", self.dns_resolver_calls_saved))
+            statistics.append(("Polls Skipped (coalesced)", self.polls_skipped))
+            statistics.append(("Unchanged Replies Skipped", self.payload_fingerprint_hits))
+            statistics.append(("Changed Replies Processed", self.payload_fingerprint_misses))
+            statistics.append(("State Mapping Diff Passes", self.state_mapper.diff_count))
+            statistics.append(("State Mapping Diff Time (ms)", round(self.state_mapper.diff_seconds * 1000, 1)))
+            for command_name, command_timing in sorted(self.command_timings.items()):
+                statistics.append((f"Command '{command_name}'", f"{command_timing[0]} dispatched, average {command_timing[1] * 1000 / command_timing[0]:.1f} ms, maximum {command_timing[2] * 1000:.1f} ms"))
+            hub_queue = self.globals[QUEUES].get(self.starling_hub_device_id, None)
+            if hub_queue is not None:
+                statistics.append(("Setpoint Writes Saved (coalesced)", hub_queue.items_coalesced))
+                statistics.append(("Queue Items Lifted By Aging", hub_queue.items_aged))
+                statistics.append(("Queue Items Dropped / Rejected (full)", f"{hub_queue.items_dropped} / {hub_queue.items_rejected}"))
+            statistics.append(("Property Writes Merged", self.writes_merged))
+            statistics.append(("Optimistic Updates / Rolled Back", f"{self.optimistic_updates} / {self.optimistic_rollbacks}"))
+            statistics.append(("Batches Preempted By Commands", self.batch_preemptions))
+            statistics.append(("Alert Mode Polls", self.alert_polls))
+            if self.alert_latency_count > 0:
+                statistics.append(("Alert Reply To Trigger Latency", f"{self.alert_latency_count} alerts, average {self.alert_latency_total_seconds * 1000 / self.alert_latency_count:.1f} ms, maximum {self.alert_latency_maximum_seconds * 1000:.1f} ms"))
+                statistics.append(("Alert Detection Window Maximum (s)", round(self.alert_window_maximum_seconds, 1)))
+            if self.action_latency_count > 0:
+                statistics.append(("User Action Queue Latency", f"{self.action_latency_count} actions, average {self.action_latency_total_seconds * 1000 / self.action_latency_count:.1f} ms, maximum {self.action_latency_maximum_seconds * 1000:.1f} ms"))
+            statistics.append(("Poll Batch Deadlines Missed", self.batch_deadlines_missed))
+            statistics.append(("Nest Devices Deferred By Deadline", self.batch_devices_deferred))
+            statistics.append(("Circuit Breaker State", "Open" if self.circuit_open else "Closed"))
+            statistics.append(("Circuit Breaker Times Opened", self.circuit_opened_count))
+            statistics.append(("Polls Short-Circuited", self.circuit_polls_short_circuited))
+            return statistics
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def close_requests_session(self):
+        try:
+            with self.requests_session_lock:
+                if self.requests_session is not None:
+                    self.requests_session.close()
+                self.requests_session = None
+                self.requests_session_key = None
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
     def nest_filter_log_processing(self, hub_id, hub_name, control_api, reply):
         try:
             log_nest_msg = False  # Assume Nest message should NOT be logged
@@ -1223,16 +1854,54 @@ class Thread_Hub_Handler(threading.Thread):
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
 
+    # Starling Hub properties written by each mergeable command (see merge_device_writes); invoked with the handler's arguments
+
+    def hvac_mode_properties(self, nest_device_id, hvac_mode_translated, new_indigo_hvac_mode):  # noqa [parameters not used]
+        return {"hvacMode": hvac_mode_translated}
+
+    def thermostat_temperature_properties(self, command, nest_device_id, target_temperature, state_key, log_action_name):  # noqa [parameters not used]
+        try:
+            nest_dev = self.globals[SHADOW_STATES].device(nest_device_id)
+
+            # Note that updates to the Starling Hub must always be done in centigrade, so need to be converted if Fahrenheit
+            if nest_dev.states["display_temperature_units"] == "F":
+                nest_target_temperature_converted = round(float(((float(target_temperature) - 32.0) * 5.0) / 9.0), 1)
+            else:
+                nest_target_temperature_converted = target_temperature
+
+            if nest_target_temperature_converted < 9.0:
+                nest_target_temperature_converted = 9.0  # set to Nest Thermostat minimum setpoint value
+            elif nest_target_temperature_converted > 32.0:
+                nest_target_temperature_converted = 32.0  # set to Nest Thermostat maximum setpoint value
+
+            return {THERMOSTAT_SETPOINT_API_PROPERTIES[command]: nest_target_temperature_converted}
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+            return dict()
+
+    def eco_mode_properties(self, nest_device_id, eco_mode, eco_mode_ui):  # noqa [parameters not used]
+        return {"ecoMode": eco_mode}
+
+    def fan_running_properties(self, nest_device_id, fan_running, fan_running_ui):  # noqa [parameters not used]
+        return {"fanRunning": fan_running}
+
+    def humidifier_properties(self, nest_device_id, humidifier_active, humidifier_ui):  # noqa [parameters not used]
+        return {"humidifierActive ": humidifier_active}
+
+    def humidifier_level_properties(self, nest_device_id, humidifier_target_level, humidifier_ui):  # noqa [parameters not used]
+        return {"targetHumidity ": humidifier_target_level}
+
     def set_hvac_mode(self, nest_device_id, hvac_mode_translated, new_indigo_hvac_mode):
         try:
             pass
-            starling_hub_dev = indigo.devices[self.starling_hub_device_id]
+            starling_hub_dev = self.globals[SHADOW_STATES].device(self.starling_hub_device_id)
 
-            nest_dev = indigo.devices[nest_device_id]
+            nest_dev = self.globals[SHADOW_STATES].device(nest_device_id)
 
             nest_device_command = f"devices/{nest_dev.address}"
 
-            hvac_mode_for_api = {"hvacMode": hvac_mode_translated}
+            hvac_mode_for_api = self.hvac_mode_properties(nest_device_id, hvac_mode_translated, new_indigo_hvac_mode)
 
             status, result = self.update_starling_hub(starling_hub_dev, nest_device_command, hvac_mode_for_api)
 
@@ -1248,6 +1917,12 @@ class Thread_Hub_Handler(threading.Thread):
 
                 return
 
+            keyValueList = list()
+            keyValueList.append({"key": "hvac_mode", "value": hvac_mode_translated})
+            if not nest_dev.states.get("eco_mode", False):
+                keyValueList.append({"key": "hvacOperationMode", "value": new_indigo_hvac_mode})
+            self.apply_optimistic_states(nest_device_id, nest_dev, keyValueList)
+
             self.hubHandlerLogger.debug(f"Starling API: Status={status}, Result='{result}'")
 
         except Exception as exception_error:
@@ -1256,46 +1931,35 @@ class Thread_Hub_Handler(threading.Thread):
     def set_thermostat_temperature(self, command, nest_device_id, target_temperature, state_key, log_action_name):
         try:
             pass
-            starling_hub_dev = indigo.devices[self.starling_hub_device_id]
+            starling_hub_dev = self.globals[SHADOW_STATES].device(self.starling_hub_device_id)
 
-            nest_dev = indigo.devices[nest_device_id]
+            nest_dev = self.globals[SHADOW_STATES].device(nest_device_id)
             nest_dev_props = nest_dev.pluginProps
 
             temperature_units = nest_dev.states["display_temperature_units"]
-            # Note that updates to the Starling Hub must always be done in centigrade, so need to be converted if Fahrenheit
             if temperature_units == "F":
-                nest_target_temperature_converted = round(float(((float(target_temperature) - 32.0) * 5.0) / 9.0), 1)
                 nest_target_temperature_ui = f"{target_temperature}°F"
             else:
-                nest_target_temperature_converted = target_temperature
                 nest_target_temperature_ui = f"{target_temperature:.1f}°C"
 
-            if nest_target_temperature_converted < 9.0:
-                nest_target_temperature_converted = 9.0  # set to Nest Thermostat minimum setpoint value
-            elif nest_target_temperature_converted > 32.0:
-                nest_target_temperature_converted = 32.0  # set to Nest Thermostat maximum setpoint value
-
             nest_device_command = f"devices/{nest_dev.address}"
 
             # Update dependant on HVAC state
 
             indigo_device_state = state_key  # One of "setpointHeat" or "setpointCool"
             if command == SET_TARGET_TEMPERATURE:
-                api_property = "targetTemperature"
                 plugin_device_state = "target_temperature"
                 ui_state = "Thermostat Setpoint"
             elif command == SET_TARGET_COOLING_THRESHOLD_TEMPERATURE:
-                api_property = "targetCoolingThresholdTemperature"
                 plugin_device_state = "target_cooling_threshold_temperature"
                 ui_state = "Thermostat Cooling Setpoint"
             elif command == SET_TARGET_HEATING_THRESHOLD_TEMPERATURE:
-                api_property = "targetHeatingThresholdTemperature"
                 plugin_device_state = "target_heating_threshold_temperature"
                 ui_state = "Thermostat Heating Setpoint"
             else:
                 return
 
-            thermostat_temperature_for_api = {api_property: nest_target_temperature_converted}
+            thermostat_temperature_for_api = self.thermostat_temperature_properties(command, nest_device_id, target_temperature, state_key, log_action_name)
             status, result = self.update_starling_hub(starling_hub_dev, nest_device_command, thermostat_temperature_for_api)
 
             if status != "OK":
@@ -1326,14 +1990,26 @@ class Thread_Hub_Handler(threading.Thread):
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
 
+    def derive_hvac_operation_mode(self, nest_hvac_mode, nest_eco_mode, nest_can_cool):
+        # Indigo's hvacOperationMode for a Nest Thermostat's HVAC mode and Eco mode (nest_eco_mode is None if not supported)
+        if nest_eco_mode:
+            return indigo.kHvacMode.ProgramHeatCool if nest_can_cool else indigo.kHvacMode.ProgramHeat
+        if nest_hvac_mode == "heat":
+            return indigo.kHvacMode.Heat
+        elif nest_hvac_mode == "cool":
+            return indigo.kHvacMode.Cool
+        elif nest_hvac_mode == "heatCool":
+            return indigo.kHvacMode.HeatCool
+        return indigo.kHvacMode.Off  # Assume: nest_hvac_mode = 'off'
+
     def set_eco_mode(self, nest_device_id, eco_mode, eco_mode_ui):
         try:
-            starling_hub_dev = indigo.devices[self.starling_hub_device_id]
+            starling_hub_dev = self.globals[SHADOW_STATES].device(self.starling_hub_device_id)
 
-            nest_dev = indigo.devices[nest_device_id]
+            nest_dev = self.globals[SHADOW_STATES].device(nest_device_id)
 
             nest_device_command = f"devices/{nest_dev.address}"
-            eco_mode_for_api = {"ecoMode": eco_mode}
+            eco_mode_for_api = self.eco_mode_properties(nest_device_id, eco_mode, eco_mode_ui)
             status, result = self.update_starling_hub(starling_hub_dev, nest_device_command, eco_mode_for_api)
 
             if status != "OK":
@@ -1352,6 +2028,12 @@ class Thread_Hub_Handler(threading.Thread):
                 # All is good
                 self.hubHandlerLogger.info(f"sent \"{nest_dev.name}\" {eco_mode_ui} Eco Mode")
 
+                indigo_hvac_mode = self.derive_hvac_operation_mode(nest_dev.states.get("hvac_mode", "off"), eco_mode, nest_dev.states.get("can_cool", False))
+                keyValueList = list()
+                keyValueList.append({"key": "eco_mode", "value": eco_mode})
+                keyValueList.append({"key": "hvacOperationMode", "value": indigo_hvac_mode})
+                self.apply_optimistic_states(nest_device_id, nest_dev, keyValueList)
+
                 self.hubHandlerLogger.debug(f"Starling API: Status={status}, Result='{result}'")
 
         except Exception as exception_error:
@@ -1359,13 +2041,13 @@ class Thread_Hub_Handler(threading.Thread):
 
     def set_fan_running(self, nest_device_id, fan_running, fan_running_ui):
         try:
-            starling_hub_dev = indigo.devices[self.starling_hub_device_id]
+            starling_hub_dev = self.globals[SHADOW_STATES].device(self.starling_hub_device_id)
 
-            nest_dev = indigo.devices[nest_device_id]
+            nest_dev = self.globals[SHADOW_STATES].device(nest_device_id)
 
             nest_device_command = f"devices/{nest_dev.address}"
             # fan_mode_state = ["false", "true"][fan_mode]
-            fan_running_for_api = {"fanRunning": fan_running}
+            fan_running_for_api = self.fan_running_properties(nest_device_id, fan_running, fan_running_ui)
             status, result = self.update_starling_hub(starling_hub_dev, nest_device_command, fan_running_for_api)
 
             if status != "OK":
@@ -1384,6 +2066,18 @@ class Thread_Hub_Handler(threading.Thread):
                 # All is good
                 self.hubHandlerLogger.info(f"sent \"{nest_dev.name}\" {fan_running_ui} Fan")
 
+                fan_running_bool = self.derive_boolean(fan_running)
+                keyValueList = list()
+                keyValueList.append({"key": "fan_running", "value": fan_running_bool})
+                keyValueList.append({"key": "hvacFanIsOn", "value": fan_running_bool})
+                self.apply_optimistic_states(nest_device_id, nest_dev, keyValueList)
+                # The Fan device's state is the one compared when polled, so it must be applied too for a roll back to be seen
+                nest_dev_fan_id = self.globals[HUBS][self.starling_hub_device_id][NEST_DEVICES_BY_INDIGO_DEVICE_ID].get(nest_device_id, dict()).get(FAN_DEV_ID, 0)
+                nest_dev_fan = self.globals[SHADOW_STATES].device(nest_dev_fan_id) if nest_dev_fan_id != 0 else None
+                if nest_dev_fan is not None:
+                    self.apply_optimistic_states(nest_device_id, nest_dev_fan, [{"key": "onOffState", "value": fan_running_bool}])
+                    nest_dev_fan.updateStateImageOnServer(indigo.kStateImageSel.FanHigh if fan_running_bool else indigo.kStateImageSel.FanOff)
+
                 self.hubHandlerLogger.debug(f"Starling API: Status={status}, Result='{result}'")
 
             pass
@@ -1392,9 +2086,9 @@ class Thread_Hub_Handler(threading.Thread):
 
     def set_home_away(self, nest_device_id, home_away):
         try:
-            starling_hub_dev = indigo.devices[self.starling_hub_device_id]
+            starling_hub_dev = self.globals[SHADOW_STATES].device(self.starling_hub_device_id)
 
-            nest_dev = indigo.devices[nest_device_id]
+            nest_dev = self.globals[SHADOW_STATES].device(nest_device_id)
 
             nest_device_command = f"devices/{nest_dev.address}"
             home_away_for_api = {"homeState": home_away}
@@ -1427,13 +2121,11 @@ class Thread_Hub_Handler(threading.Thread):
     def set_hot_water(self, nest_device_id, hot_water_enabled, hot_water_ui):
         try:
             # self.hubHandlerLogger.error(f"SET_HOT_WATER: {hot_water_enabled}, UI='{hot_water_ui}'")  # TODO: Debug
-            starling_hub_dev = indigo.devices[self.starling_hub_device_id]
-            nest_dev = indigo.devices[nest_device_id]
+            starling_hub_dev = self.globals[SHADOW_STATES].device(self.starling_hub_device_id)
+            nest_dev = self.globals[SHADOW_STATES].device(nest_device_id)
 
-            # Cancel and delete any existing timer for hot water
-            if nest_device_id in self.globals[HOT_WATER_TIMERS]:
-                self.globals[HOT_WATER_TIMERS][nest_device_id].cancel()
-                del self.globals[HOT_WATER_TIMERS][nest_device_id]
+            # Cancel any existing hot water repeat
+            self.globals[JOB_SCHEDULER].cancel(JOB_TYPE_HOT_WATER_REPEAT, nest_device_id)
 
             # If currently Hot water Mode is OFF, force it to ON (Will get reset if request is to turn hot water off.
             if self.globals[HUBS][self.starling_hub_device_id][NEST_DEVICES_BY_INDIGO_DEVICE_ID][nest_device_id][HOT_WATER_MODE] == HOT_WATER_MODE_OFF:
@@ -1441,12 +2133,7 @@ class Thread_Hub_Handler(threading.Thread):
 
             if hot_water_enabled:
                 if self.globals[HUBS][self.starling_hub_device_id][NEST_DEVICES_BY_INDIGO_DEVICE_ID][nest_device_id][HOT_WATER_MODE] in [HOT_WATER_MODE_ON, HOT_WATER_MODE_ON_REPEATING]:
-                    timer_interval_seconds = 25.0 * 60  # Set to 25 Minutes as the minimum boost is 30 minutes
-                    # timer_interval_seconds = 2.0 * 60  # TODO: TESTING, Set to 2 Minutes
-                    self.globals[HOT_WATER_TIMERS][nest_device_id] = threading.Timer(timer_interval_seconds,
-                                                                                     self.set_hot_water_repeat_by_timer,
-                                                                                [[nest_device_id, hot_water_enabled, "repeat turn"]])
-                    self.globals[HOT_WATER_TIMERS][nest_device_id].start()
+                    self.globals[JOB_SCHEDULER].schedule(JOB_TYPE_HOT_WATER_REPEAT, self.starling_hub_device_id, nest_device_id, HOT_WATER_REPEAT_SECONDS)
                     self.globals[HUBS][self.starling_hub_device_id][NEST_DEVICES_BY_INDIGO_DEVICE_ID][nest_device_id][HOT_WATER_MODE] = HOT_WATER_MODE_ON_REPEATING
             else:
                 self.globals[HUBS][self.starling_hub_device_id][NEST_DEVICES_BY_INDIGO_DEVICE_ID][nest_device_id][HOT_WATER_MODE] = HOT_WATER_MODE_OFF
@@ -1477,23 +2164,14 @@ class Thread_Hub_Handler(threading.Thread):
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
 
-    def set_hot_water_repeat_by_timer(self, arguments):
-        try:
-            nest_device_id, hot_water_enabled, hot_water_ui = arguments
-            if hot_water_enabled:
-                if self.globals[HUBS][self.starling_hub_device_id][NEST_DEVICES_BY_INDIGO_DEVICE_ID][nest_device_id][HOT_WATER_MODE] == HOT_WATER_MODE_ON_REPEATING:
-                    action_request_ui = "repeat turn on"
-                    self.globals[QUEUES][self.starling_hub_device_id].put((QUEUE_PRIORITY_COMMAND_HIGH, SET_HOT_WATER, [nest_device_id], [True, action_request_ui]))
-
-        except Exception as exception_error:
-            self.exception_handler(exception_error, True)  # Log error and display failing statement
-
     def set_hot_boost(self, nest_device_id, hot_water_enabled, hot_water_ui):
         try:
-            starling_hub_dev = indigo.devices[self.starling_hub_device_id]
-            nest_dev = indigo.devices[nest_device_id]
+            starling_hub_dev = self.globals[SHADOW_STATES].device(self.starling_hub_device_id)
+            nest_dev = self.globals[SHADOW_STATES].device(nest_device_id)
 
             self.globals[HUBS][self.starling_hub_device_id][NEST_DEVICES_BY_INDIGO_DEVICE_ID][nest_device_id][HOT_WATER_MODE] = HOT_WATER_MODE_BOOST
+            self.globals[JOB_SCHEDULER].cancel(JOB_TYPE_HOT_WATER_REPEAT, nest_device_id)  # A boost replaces any repeating hot water
+            self.globals[JOB_SCHEDULER].schedule(JOB_TYPE_HOT_WATER_BOOST_EXPIRY, self.starling_hub_device_id, nest_device_id, HOT_WATER_BOOST_SECONDS)
 
             nest_device_command = f"devices/{nest_dev.address}"
             hot_water_enabled_for_api = {"hotWaterEnabled": hot_water_enabled}
@@ -1523,12 +2201,12 @@ class Thread_Hub_Handler(threading.Thread):
 
     def set_humidifier(self, nest_device_id, humidifier_active, humidifier_ui):
         try:
-            starling_hub_dev = indigo.devices[self.starling_hub_device_id]
+            starling_hub_dev = self.globals[SHADOW_STATES].device(self.starling_hub_device_id)
 
-            nest_dev = indigo.devices[nest_device_id]
+            nest_dev = self.globals[SHADOW_STATES].device(nest_device_id)
 
             nest_device_command = f"devices/{nest_dev.address}"
-            humidifier_active_for_api = {"humidifierActive ": humidifier_active}
+            humidifier_active_for_api = self.humidifier_properties(nest_device_id, humidifier_active, humidifier_ui)
             status, result = self.update_starling_hub(starling_hub_dev, nest_device_command, humidifier_active_for_api)
 
             if status != "OK":
@@ -1555,12 +2233,12 @@ class Thread_Hub_Handler(threading.Thread):
 
     def set_humidifier_level(self, nest_device_id, humidifier_target_level, humidifier_ui):
         try:
-            starling_hub_dev = indigo.devices[self.starling_hub_device_id]
+            starling_hub_dev = self.globals[SHADOW_STATES].device(self.starling_hub_device_id)
 
-            nest_dev = indigo.devices[nest_device_id]
+            nest_dev = self.globals[SHADOW_STATES].device(nest_device_id)
 
             nest_device_command = f"devices/{nest_dev.address}"
-            humidifier_active_for_api = {"targetHumidity ": humidifier_target_level}
+            humidifier_active_for_api = self.humidifier_level_properties(nest_device_id, humidifier_target_level, humidifier_ui)
             status, result = self.update_starling_hub(starling_hub_dev, nest_device_command, humidifier_active_for_api)
 
             if status != "OK":
@@ -1583,10 +2261,11 @@ class Thread_Hub_Handler(threading.Thread):
                 self.hubHandlerLogger.debug(f"Starling API: Status={status}, Result='{result}'")
 
                 # DEBUG SETUP START ...
-                if "_starling_debug" in indigo.variables and indigo.variables["_starling_debug"].getValue(bool):
-                    starling_debug_thermostat = indigo.variables["_starling_debug_thermostat"].getValue(bool)
+                debug_overrides = self.globals[DEBUG_OVERRIDES]
+                if debug_overrides.active:
+                    starling_debug_thermostat = debug_overrides.variable("_starling_debug_thermostat").getValue(bool)
                     if starling_debug_thermostat:
-                        if indigo.variables["starling_humidifier_enabled"].getValue(bool):
+                        if debug_overrides.variable("starling_humidifier_enabled").getValue(bool):
                             var_humidifier_target_level = f"{humidifier_target_level}"
                             indigo.variable.updateValue("starling_humidifier_target_humidity", value=var_humidifier_target_level)
                 # .. DEBUG SETUP END
@@ -1597,22 +2276,18 @@ class Thread_Hub_Handler(threading.Thread):
 
     def update_starling_hub(self, starling_hub_dev, starling_command, starling_properties):
         try:
+            # A handler re-run for its part of a merged write gets that write's result rather than sending its own POST
+            replay_result = getattr(self.write_context, "replay_result", None)
+            if replay_result is not None:
+                self.write_context.replay_result = None
+                return replay_result
+
             # Connect to Starling Hub
 
-            props = starling_hub_dev.pluginProps
-            ip_address = props.get("starling_hub_ip", "127.0.0.1")  # Should be in format "nnn.nnn.nnn.nnn"
-            if props.get("starling_hub_ssl_tls", True):
-                https_ip = ip_address.split(".")
-                https_ip_1 = https_ip[0]
-                https_ip_2 = https_ip[1]
-                https_ip_3 = https_ip[2]
-                https_ip_4 = https_ip[3]
-                self.requests_prefix = f"https://{https_ip_1}-{https_ip_2}-{https_ip_3}-{https_ip_4}.local.starling.direct:3443/api/connect/v1/"
-            else:
-                self.requests_prefix = f"http://{ip_address}:3080/api/connect/v1/"  # noqa [http links are not secure]
-            api_key = props.get("api_key", u"not_set_in_plugin")
-            self.requests_suffix = f"?key={api_key}"
-            requests_string = f"{self.requests_prefix}{starling_command}{self.requests_suffix}"
+            hub_endpoint = self.get_hub_endpoint()
+            requests_string = f"{self.get_requests_prefix(hub_endpoint)}{starling_command}{hub_endpoint[REQUESTS_SUFFIX]}"
+
+            requests_session = self.get_requests_session(hub_endpoint)
 
             # print(f"update_starling_hub Request String: {requests_string}, Properties [{type(starling_properties)}]: {starling_properties}")
 
@@ -1621,7 +2296,8 @@ class Thread_Hub_Handler(threading.Thread):
 
             try:
                 self.hubHandlerLogger.starling_api(f"Sending message to '{starling_hub_dev.name}':{requests_string} | {starling_properties}")  # noqa [Unresolved attribute reference]
-                reply = requests.post(requests_string, json=starling_properties, timeout=5)
+                reply = requests_session.post(requests_string, json=starling_properties, timeout=hub_endpoint[HUB_TIMEOUTS])
+                self.record_hub_success()  # The Starling Hub replied, even if with an error status
                 # print(f"Reply Status: {reply.status_code}, Text: {reply.text}")
                 status_code = reply.status_code
                 if status_code == 200:
@@ -1638,6 +2314,8 @@ class Thread_Hub_Handler(threading.Thread):
                     error_code = "Unknown"
                     error_message = "unknown connection error"
             except Exception as error_message:
+                if isinstance(error_message, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+                    self.record_hub_failure()
                 status_code = -1
                 error_code = "Unknown"
                 error_message = error_message
@@ -1989,3 +2667,72 @@ class Thread_Hub_Handler(threading.Thread):
 
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+
+# Command registry: queue item command id -> how the Hub Handler dispatches it.
+#   Each entry declares the handler (invoked with the Hub Handler as its first argument), whether the command id itself
+#   is passed, how the queue item's Nest device list is passed and the names of the expected queue item arguments.
+COMMAND_REGISTRY = dict()
+
+# Commands that only write Starling Hub properties of a single Nest device and so can share a POST (see merge_device_writes)
+WRITE_MERGEABLE_COMMANDS = set()
+
+# Starling Hub property written by each thermostat setpoint command
+THERMOSTAT_SETPOINT_API_PROPERTIES = {SET_TARGET_TEMPERATURE: "targetTemperature",
+                                      SET_TARGET_COOLING_THRESHOLD_TEMPERATURE: "targetCoolingThresholdTemperature",
+                                      SET_TARGET_HEATING_THRESHOLD_TEMPERATURE: "targetHeatingThresholdTemperature"}
+
+# Device type registry: Indigo device type id -> handler for a Nest device's Starling Hub properties.
+#   Invoked as handler(hub_handler, command, hub_id, nest_dev, nest_properties, keyValueList).
+DEVICE_TYPE_REGISTRY = dict()
+DEBUG_OVERRIDES_REGISTRY = dict()
+
+
+def register_command(command, command_name, handler, nest_devices=COMMAND_NEST_DEVICES_NONE, argument_names=(), pass_command=False, user_action=True, write_properties=None):
+    command_entry = dict()
+    command_entry[COMMAND_NAME] = command_name
+    command_entry[COMMAND_HANDLER] = handler
+    command_entry[COMMAND_NEST_DEVICES] = nest_devices
+    command_entry[COMMAND_ARGUMENTS] = tuple(argument_names)
+    command_entry[COMMAND_PASS_COMMAND] = pass_command
+    command_entry[COMMAND_USER_ACTION] = user_action  # Record the time queued as user action latency
+    command_entry[COMMAND_WRITE_PROPERTIES] = write_properties  # Invoked with the handler's arguments -> Starling Hub properties
+    COMMAND_REGISTRY[command] = command_entry
+    if write_properties is not None:
+        WRITE_MERGEABLE_COMMANDS.add(command)
+
+
+def register_device_type(device_type_id, handler, debug_overrides_handler=None):
+    DEVICE_TYPE_REGISTRY[device_type_id] = handler
+    if debug_overrides_handler is not None:
+        DEBUG_OVERRIDES_REGISTRY[device_type_id] = debug_overrides_handler
+
+
+register_command(API_COMMAND_STATUS, "Status", Thread_Hub_Handler.handle_status_command, user_action=False)
+register_command(API_COMMAND_POLL_DEVICE, "Poll Devices", Thread_Hub_Handler.handle_devices_queue_item, COMMAND_NEST_DEVICES_LIST, pass_command=True, user_action=False)
+register_command(API_COMMAND_ALERT_POLL_DEVICE, "Alert Poll Devices", Thread_Hub_Handler.handle_alert_poll_queue_item, COMMAND_NEST_DEVICES_LIST, user_action=False)
+register_command(API_COMMAND_START_DEVICE, "Start Devices", Thread_Hub_Handler.handle_devices_queue_item, COMMAND_NEST_DEVICES_LIST, pass_command=True, user_action=False)
+for _set_temperature_command, _set_temperature_command_name in ((SET_TARGET_TEMPERATURE, "Set Target Temperature"),
+                                                                (SET_TARGET_COOLING_THRESHOLD_TEMPERATURE, "Set Cooling Threshold"),
+                                                                (SET_TARGET_HEATING_THRESHOLD_TEMPERATURE, "Set Heating Threshold")):
+    register_command(_set_temperature_command, _set_temperature_command_name, Thread_Hub_Handler.set_thermostat_temperature, COMMAND_NEST_DEVICES_FIRST,
+                     ("target_temperature", "state_key", "log_action_name"), pass_command=True, write_properties=Thread_Hub_Handler.thermostat_temperature_properties)
+register_command(API_COMMAND_CONFIRM_DEVICE, "Confirm Devices", Thread_Hub_Handler.handle_confirm_devices, COMMAND_NEST_DEVICES_LIST, user_action=False)
+register_command(SET_HVAC_MODE, "Set HVAC Mode", Thread_Hub_Handler.set_hvac_mode, COMMAND_NEST_DEVICES_FIRST, ("hvac_mode_translated", "new_indigo_hvac_mode"),
+                 write_properties=Thread_Hub_Handler.hvac_mode_properties)
+register_command(SET_ECO_MODE, "Set Eco Mode", Thread_Hub_Handler.set_eco_mode, COMMAND_NEST_DEVICES_FIRST, ("eco_mode", "eco_mode_ui"),
+                 write_properties=Thread_Hub_Handler.eco_mode_properties)
+register_command(SET_FAN, "Set Fan", Thread_Hub_Handler.set_fan_running, COMMAND_NEST_DEVICES_FIRST, ("fan_running", "fan_running_ui"),
+                 write_properties=Thread_Hub_Handler.fan_running_properties)
+register_command(SET_HOT_WATER, "Set Hot Water", Thread_Hub_Handler.set_hot_water, COMMAND_NEST_DEVICES_FIRST, ("hot_water_enabled", "hot_water_ui"))
+register_command(BOOST_HOT_WATER, "Boost Hot Water", Thread_Hub_Handler.set_hot_boost, COMMAND_NEST_DEVICES_FIRST, ("hot_water_enabled", "hot_water_ui"))
+register_command(SET_HUMIDIFIER, "Set Humidifier", Thread_Hub_Handler.set_humidifier, COMMAND_NEST_DEVICES_FIRST, ("humidifier_active", "humidifier_ui"),
+                 write_properties=Thread_Hub_Handler.humidifier_properties)
+register_command(SET_HUMIDIFIER_LEVEL, "Set Humidifier Level", Thread_Hub_Handler.set_humidifier_level, COMMAND_NEST_DEVICES_FIRST, ("humidifier_target_level", "humidifier_ui"),
+                 write_properties=Thread_Hub_Handler.humidifier_level_properties)
+register_command(SET_HOME_AWAY, "Set Home/Away", Thread_Hub_Handler.set_home_away, COMMAND_NEST_DEVICES_FIRST, ("home_away",))
+
+register_device_type("nestThermostat", Thread_Hub_Handler.handle_devices_command_thermostat, Thread_Hub_Handler.apply_debug_overrides_thermostat)
+register_device_type("nestProtect", Thread_Hub_Handler.handle_devices_command_protect, Thread_Hub_Handler.apply_debug_overrides_protect)
+register_device_type("nestHomeAwayControl", Thread_Hub_Handler.handle_devices_command_home_away_control, Thread_Hub_Handler.apply_debug_overrides_home_away_control)
+register_device_type("nestWeather", Thread_Hub_Handler.handle_devices_command_weather)
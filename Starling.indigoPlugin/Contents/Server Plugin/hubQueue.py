@@ -0,0 +1,209 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Starling - Hub Queue © Autolog 2022-2025
+#
+
+import collections
+import queue
+import time
+
+from constants import *  # Also imports logging
+
+
+# noinspection PyPep8Naming
+class Hub_Queue_Entry(object):
+
+    # A queued item plus the details used to schedule it
+
+    __slots__ = ("priority", "enqueued_at", "item", "device_key", "setpoint_key")
+
+    def __init__(self, priority, item, device_key, setpoint_key):
+        self.priority = priority
+        self.enqueued_at = time.time()
+        self.item = item
+        self.device_key = device_key
+        self.setpoint_key = setpoint_key
+
+
+# noinspection PyPep8Naming
+class Hub_Queue(queue.Queue):
+
+    # Scheduling queue of Starling Hub queue items: (priority, command, nest_device_list, argument_list).
+    #   put() / get() / get_nowait() accept and return plain queue items, as for queue.PriorityQueue, but:
+    #   - Items are taken in FIFO order within a priority, without ever comparing commands or device lists.
+    #   - Aging: a priority level's effective priority rises by HUB_QUEUE_AGING_STEP for every HUB_QUEUE_AGING_SECONDS its
+    #     oldest item has waited (never above QUEUE_PRIORITY_COMMAND_HIGH), so polls can't be starved by a command burst.
+    #   - Fairness: within a priority, single Nest device items are taken round-robin across the Nest devices.
+    #   - Coalescing: a setpoint command (HUB_QUEUE_COALESCED_COMMANDS) for a Nest device that already has the same command
+    #     pending replaces the pending item's arguments, so only the final target is written to the Starling Hub. The pending
+    #     item moves up to the new item's priority if that is more important.
+    #   - Capacity: when HUB_QUEUE_CAPACITY items are queued, the oldest item of the least important priority (no more
+    #     important than the new item) is dropped; if there is none, the new item is rejected. Polls, device starts and
+    #     stop requests are never dropped as the Hub Handler relies on them being processed.
+    #   Coalesced, rejected and dropped items are never taken, so they are not counted as unfinished tasks for join() /
+    #   task_done(); every item taken by get(), get_with_timing(), get_preempting() or take_device_items() is.
+
+    def __init__(self, capacity=HUB_QUEUE_CAPACITY):
+        self.capacity = capacity
+        queue.Queue.__init__(self, 0)  # put() never blocks, the capacity is enforced by the overflow policy
+
+        self.hubQueueLogger = logging.getLogger("Plugin.HUB_QUEUE")
+
+    def _init(self, maxsize):
+        self.levels = dict()  # Priority -> OrderedDict of device key -> deque of Hub_Queue_Entry (round-robin order)
+        self.item_count = 0
+        self.pending_setpoints = dict()  # (command, Nest device id) -> pending Hub_Queue_Entry
+
+        self.items_coalesced = 0  # Setpoint writes saved
+        self.items_aged = 0  # Items taken ahead of a more important priority because of aging
+        self.items_dropped = 0  # Items dropped to make room for a more important item
+        self.items_rejected = 0  # Items rejected because the queue was full
+
+    def _qsize(self):
+        return self.item_count
+
+    def _put(self, item):
+        priority, command, nest_device_list = item[0], item[1], item[2]
+        device_key = nest_device_list[0] if nest_device_list is not None and len(nest_device_list) == 1 else None
+
+        setpoint_key = None
+        if command in HUB_QUEUE_COALESCED_COMMANDS and device_key is not None:
+            setpoint_key = (command, device_key)
+            pending_entry = self.pending_setpoints.get(setpoint_key, None)
+            if pending_entry is not None:
+                pending_entry.item = item  # Keeps its place in the queue and its enqueue time
+                if priority < pending_entry.priority:
+                    self.move_entry(pending_entry, priority)
+                self.items_coalesced += 1
+                self.unfinished_tasks -= 1  # Offsets queue.Queue.put's count, as no new item was queued
+                return
+
+        if self.item_count >= self.capacity and priority != QUEUE_PRIORITY_STOP_THREAD:
+            if not self.drop_least_important(priority):
+                self.items_rejected += 1
+                self.unfinished_tasks -= 1  # Offsets queue.Queue.put's count, as no new item was queued
+                self.hubQueueLogger.warning(f"Starling Hub queue full ({self.item_count} items): command '{command}' rejected")
+                return
+
+        entry = Hub_Queue_Entry(priority, item, device_key, setpoint_key)
+        self.levels.setdefault(priority, collections.OrderedDict()).setdefault(device_key, collections.deque()).append(entry)
+        self.item_count += 1
+        if setpoint_key is not None:
+            self.pending_setpoints[setpoint_key] = entry
+
+    def _get(self):
+        priority, device_key = self.select()
+        if priority > min(self.levels):
+            self.items_aged += 1
+        return self.remove(priority, device_key, 0)
+
+    def select(self):
+        # Returns the (priority, device key) of the next entry to be taken; must be called with the mutex held and items queued
+        now = time.time()
+        selected_rank = None
+        selected = None
+        for priority, devices in self.levels.items():
+            effective_priority = priority
+            oldest_enqueued_at = min(entries[0].enqueued_at for entries in devices.values())
+            if priority > QUEUE_PRIORITY_COMMAND_HIGH:
+                aging_steps = int((now - oldest_enqueued_at) / HUB_QUEUE_AGING_SECONDS)
+                effective_priority = max(priority - (aging_steps * HUB_QUEUE_AGING_STEP), QUEUE_PRIORITY_COMMAND_HIGH)
+            rank = (effective_priority, oldest_enqueued_at)  # Fully aged items then take turns with user commands by age
+            if selected_rank is None or rank < selected_rank:
+                selected_rank = rank
+                selected = (priority, next(iter(devices)))
+        return selected
+
+    def remove(self, priority, device_key, index):
+        # Remove and return an entry; must be called with the mutex held
+        devices = self.levels[priority]
+        entries = devices[device_key]
+        entry = entries[index]
+        del entries[index]
+        if len(entries) == 0:
+            del devices[device_key]
+        elif index == 0:
+            devices.move_to_end(device_key)  # Round-robin: this Nest device's next item goes after the other devices' items
+        if len(devices) == 0:
+            del self.levels[priority]
+        self.item_count -= 1
+        if entry.setpoint_key is not None and self.pending_setpoints.get(entry.setpoint_key, None) is entry:
+            del self.pending_setpoints[entry.setpoint_key]
+        return entry
+
+    def move_entry(self, entry, priority):
+        # Move a pending entry to a more important priority, at the back of its Nest device's entries; must be called with the mutex held
+        devices = self.levels[entry.priority]
+        entries = devices[entry.device_key]
+        entries.remove(entry)
+        if len(entries) == 0:
+            del devices[entry.device_key]
+        if len(devices) == 0:
+            del self.levels[entry.priority]
+        entry.priority = priority
+        self.levels.setdefault(priority, collections.OrderedDict()).setdefault(entry.device_key, collections.deque()).append(entry)
+
+    def drop_least_important(self, priority):
+        # Overflow policy: drop the oldest droppable entry at the least important priority no more important than 'priority'
+        for level_priority in sorted(self.levels, reverse=True):
+            if level_priority < priority:
+                break
+            oldest = None
+            for device_key, entries in self.levels[level_priority].items():
+                for index, entry in enumerate(entries):
+                    if entry.item[1] in HUB_QUEUE_UNDROPPABLE_COMMANDS:
+                        continue
+                    if oldest is None or entry.enqueued_at < oldest[2].enqueued_at:
+                        oldest = (device_key, index, entry)
+                    break  # Entries for a device are in enqueue order
+            if oldest is not None:
+                entry = self.remove(level_priority, oldest[0], oldest[1])
+                self.items_dropped += 1
+                self.unfinished_tasks -= 1  # A dropped item is never taken, so can't be marked as done
+                self.hubQueueLogger.warning(f"Starling Hub queue full: command '{entry.item[1]}' dropped")
+                return True
+        return False
+
+    def take_device_items(self, nest_device_id, commands):
+        # Remove and return, in queue order, the pending items of the given commands for a single Nest device as
+        #   (queue item, seconds queued) tuples (used to merge writes to the same Nest device, see Thread_Hub_Handler)
+        now = time.time()
+        taken_entries = list()
+        with self.mutex:
+            for priority in sorted(self.levels):
+                entries = self.levels[priority].get(nest_device_id, None)
+                if entries is None:
+                    continue
+                indexes = [index for index, entry in enumerate(entries) if entry.item[1] in commands]
+                for index in reversed(indexes):
+                    taken_entries.append(self.remove(priority, nest_device_id, index))
+        taken_entries.sort(key=lambda taken_entry: taken_entry.enqueued_at)
+        return [(entry.item, now - entry.enqueued_at) for entry in taken_entries]
+
+    def get(self, block=True, timeout=None):
+        return queue.Queue.get(self, block, timeout).item
+
+    def get_with_timing(self, block=True, timeout=None):
+        # Returns the queue item and the number of seconds it was queued for
+        entry = queue.Queue.get(self, block, timeout)
+        return entry.item, time.time() - entry.enqueued_at
+
+    def peek_priority(self):
+        # Returns the most important (un-aged) priority with items queued, or None if the queue is empty. Used to decide
+        #   preemption, so aging (which only affects what get() takes next) must not hide a user command queued behind an aged item.
+        with self.mutex:
+            if self.item_count == 0:
+                return None
+            return min(self.levels)
+
+    def get_preempting(self):
+        # Take the next item of the most important priority (ignoring aging) without blocking, as per peek_priority;
+        #   returns the queue item and the number of seconds it was queued for. Raises queue.Empty if the queue is empty.
+        with self.not_empty:
+            if self.item_count == 0:
+                raise queue.Empty
+            priority = min(self.levels)
+            entry = self.remove(priority, next(iter(self.levels[priority])), 0)
+            self.not_full.notify()
+        return entry.item, time.time() - entry.enqueued_at
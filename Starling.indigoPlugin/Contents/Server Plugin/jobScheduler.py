@@ -0,0 +1,227 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Starling - Job Scheduler © Autolog 2022-2025
+#
+
+try:
+    # noinspection PyUnresolvedReferences
+    import indigo
+except ImportError:
+    pass
+
+import heapq
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+
+from constants import *  # Also imports logging
+
+
+# noinspection PyPep8Naming
+class Thread_Job_Scheduler(threading.Thread):
+
+    # This class owns all of the plugin's deferred work (hot water repeats, hot water boost expiry and the delayed
+    #   confirmation fetches that follow an optimistic state update) in a single thread, rather than a threading.Timer
+    #   thread per job. Jobs are held in a heap ordered by due time; there is at most one job of each type per Indigo
+    #   device, so scheduling a job replaces any existing one. Jobs of the types in JOB_TYPES_PERSISTENT are saved to
+    #   the plugin's preferences folder so that they survive a plugin restart.
+
+    def __init__(self, plugin_globals, event):
+        try:
+
+            threading.Thread.__init__(self)
+
+            self.globals = plugin_globals
+
+            self.jobSchedulerLogger = logging.getLogger("Plugin.JOB_SCHEDULER")
+
+            self.threadStop = event
+
+            self.job_condition = threading.Condition()
+            self.job_heap = list()  # (due time, sequence, job); superseded entries are skipped when they reach the top
+            self.job_sequence = itertools.count()
+            self.jobs = dict()  # (job type, Indigo device id) -> job dict
+
+            self.jobs_file_path = None
+            self.jobs_file_lock = threading.Lock()
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def exception_handler(self, exception_error_message, log_failing_statement):
+        filename, line_number, method, statement = traceback.extract_tb(sys.exc_info()[2])[-1]  # noqa [Ignore duplicate code warning]
+        module = filename.split('/')
+        log_message = u"'{0}' in module '{1}', method '{2}'".format(exception_error_message, module[-1], method)
+        if log_failing_statement:
+            log_message = log_message + u"\n   Failing statement [line {0}]: '{1}'".format(line_number, statement)
+        else:
+            log_message = log_message + u" at line {0}".format(line_number)
+        self.jobSchedulerLogger.error(log_message)
+
+    def run(self):
+        try:
+            # Give the plugin's devices time to start before any restored jobs are run
+            self.threadStop.wait(JOB_SCHEDULER_START_DELAY_SECONDS)
+
+            while not self.threadStop.is_set():
+                due_jobs = list()
+                with self.job_condition:
+                    now = time.time()
+                    while len(self.job_heap) > 0 and self.job_heap[0][0] <= now:
+                        due_time, sequence, job = heapq.heappop(self.job_heap)
+                        job_key = (job[JOB_TYPE], job[JOB_DEV_ID])
+                        if self.jobs.get(job_key, None) is job:
+                            del self.jobs[job_key]
+                            due_jobs.append(job)
+                    if len(due_jobs) == 0:
+                        wait_seconds = JOB_SCHEDULER_IDLE_SECONDS if len(self.job_heap) == 0 else min(self.job_heap[0][0] - now, JOB_SCHEDULER_IDLE_SECONDS)
+                        self.job_condition.wait(wait_seconds)
+                        continue
+
+                for job in due_jobs:
+                    self.run_job(job)
+                if any(job[JOB_TYPE] in JOB_TYPES_PERSISTENT for job in due_jobs):
+                    self.save_jobs()
+
+            self.jobSchedulerLogger.debug("Job Scheduler Thread close-down commencing.")
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def stop(self):
+        try:
+            self.threadStop.set()
+            with self.job_condition:
+                self.job_condition.notify()
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def schedule(self, job_type, starling_hub_dev_id, dev_id, delay_seconds):
+        try:
+            # Schedule a job, replacing any job of the same type already scheduled for the Indigo device
+            job = dict()
+            job[JOB_TYPE] = job_type
+            job[JOB_HUB_ID] = starling_hub_dev_id
+            job[JOB_DEV_ID] = dev_id
+            job[JOB_DUE] = time.time() + delay_seconds
+            self.add_job(job)
+            if job_type in JOB_TYPES_PERSISTENT:
+                self.save_jobs()
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def add_job(self, job):
+        with self.job_condition:
+            self.jobs[(job[JOB_TYPE], job[JOB_DEV_ID])] = job
+            heapq.heappush(self.job_heap, (job[JOB_DUE], next(self.job_sequence), job))
+            self.job_condition.notify()
+
+    def cancel(self, job_type, dev_id):
+        try:
+            with self.job_condition:
+                job = self.jobs.pop((job_type, dev_id), None)  # Its heap entry is skipped when it becomes due
+            if job is not None and job_type in JOB_TYPES_PERSISTENT:
+                self.save_jobs()
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def pending_jobs(self):
+        try:
+            # Return the scheduled jobs in due order
+            with self.job_condition:
+                return sorted((dict(job) for job in self.jobs.values()), key=lambda job: job[JOB_DUE])
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+            return list()
+
+    def hot_water_mode(self, dev_id):
+        try:
+            # The hot water mode implied by the device's scheduled jobs; invoked when a device is started, so that the
+            #   hot water mode of a job restored by load_jobs (or still scheduled across a device restart) isn't lost
+            with self.job_condition:
+                if (JOB_TYPE_HOT_WATER_REPEAT, dev_id) in self.jobs:
+                    return HOT_WATER_MODE_ON_REPEATING
+                if (JOB_TYPE_HOT_WATER_BOOST_EXPIRY, dev_id) in self.jobs:
+                    return HOT_WATER_MODE_BOOST
+            return HOT_WATER_MODE_OFF
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+            return HOT_WATER_MODE_OFF
+
+    def run_job(self, job):
+        try:
+            job_type = job[JOB_TYPE]
+            starling_hub_dev_id = job[JOB_HUB_ID]
+            dev_id = job[JOB_DEV_ID]
+            if starling_hub_dev_id not in self.globals[QUEUES] or starling_hub_dev_id not in self.globals[HUBS]:
+                self.jobSchedulerLogger.debug(f"Job '{job_type}' for device {dev_id} dropped: Starling Hub {starling_hub_dev_id} not started")
+                return
+            nest_device = self.globals[HUBS][starling_hub_dev_id][NEST_DEVICES_BY_INDIGO_DEVICE_ID].get(dev_id, None)
+            if nest_device is None:
+                self.jobSchedulerLogger.debug(f"Job '{job_type}' for device {dev_id} dropped: device not started")
+                return
+
+            if job_type == JOB_TYPE_HOT_WATER_REPEAT:
+                # Re-issue the hot water request before the Nest boost period runs out (see Thread_Hub_Handler.set_hot_water)
+                if nest_device.get(HOT_WATER_MODE, HOT_WATER_MODE_OFF) == HOT_WATER_MODE_ON_REPEATING:
+                    self.globals[QUEUES][starling_hub_dev_id].put((QUEUE_PRIORITY_COMMAND_HIGH, SET_HOT_WATER, [dev_id], [True, "repeat turn on"]))
+            elif job_type == JOB_TYPE_HOT_WATER_BOOST_EXPIRY:
+                # The Nest boost has run out: the hot water state itself is picked up by the thermostat's next poll
+                if nest_device.get(HOT_WATER_MODE, HOT_WATER_MODE_OFF) == HOT_WATER_MODE_BOOST:
+                    nest_device[HOT_WATER_MODE] = HOT_WATER_MODE_OFF
+            elif job_type == JOB_TYPE_CONFIRM_DEVICE:
+                self.globals[QUEUES][starling_hub_dev_id].put((QUEUE_PRIORITY_COMMAND_MEDIUM, API_COMMAND_CONFIRM_DEVICE, [dev_id], None))
+            else:
+                self.jobSchedulerLogger.warning(f"Ignoring unknown job '{job_type}' for device {dev_id}")
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def load_jobs(self, plugin_prefs_folder):
+        try:
+            # Restore the persistent jobs saved by a previous run of the plugin; invoked before the thread is started
+            self.jobs_file_path = os.path.join(plugin_prefs_folder, JOB_SCHEDULER_FILE_NAME)
+            if not os.path.isfile(self.jobs_file_path):
+                return
+            with open(self.jobs_file_path, "r") as jobs_file:
+                saved_jobs = json.load(jobs_file)
+            for saved_job in saved_jobs:
+                if saved_job.get("type", "") not in JOB_TYPES_PERSISTENT:
+                    continue
+                job = dict()
+                job[JOB_TYPE] = saved_job["type"]
+                job[JOB_HUB_ID] = int(saved_job["hub_id"])
+                job[JOB_DEV_ID] = int(saved_job["dev_id"])
+                job[JOB_DUE] = float(saved_job["due"])
+                self.add_job(job)
+            self.jobSchedulerLogger.debug(f"{len(self.jobs)} scheduled job(s) restored")
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def save_jobs(self):
+        try:
+            # Constant ids are not stable across plugin versions, so jobs are saved with plain keys
+            if self.jobs_file_path is None:
+                return
+            with self.job_condition:
+                saved_jobs = [{"type": job[JOB_TYPE], "hub_id": job[JOB_HUB_ID], "dev_id": job[JOB_DEV_ID], "due": job[JOB_DUE]}
+                              for job in self.jobs.values() if job[JOB_TYPE] in JOB_TYPES_PERSISTENT]
+            with self.jobs_file_lock:
+                jobs_file_path_temporary = f"{self.jobs_file_path}.tmp"
+                with open(jobs_file_path_temporary, "w") as jobs_file:
+                    json.dump(saved_jobs, jobs_file)
+                os.replace(jobs_file_path_temporary, self.jobs_file_path)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
@@ -28,7 +28,15 @@ except ImportError:
     pass
 
 from constants import *  # Also imports logging
-from hubHandler import Thread_Hub_Handler
+from debugOverrides import Debug_Overrides
+from deviceIndex import Device_Index
+from discoveryCache import Discovery_Cache
+from hubAsyncEngine import Thread_Hub_Async_Engine
+from hubHandler import Thread_Hub_Handler, derive_hub_endpoint
+from hubQueue import Hub_Queue
+from jobScheduler import Thread_Job_Scheduler
+from pollScheduler import Poll_Scheduler
+from shadowStates import Shadow_State_Store
 
 # ================================== Header ===================================
 __author__    = "Autolog"
@@ -106,6 +114,7 @@ class Plugin(indigo.PluginBase):
         self.globals = dict()
 
         self.globals[POLLING_SECONDS] = 5
+        self.globals[POLLING_INTERVALS] = dict()
 
         logging.addLevelName(LOG_LEVEL_STARLING_API, "starling_api")
 
@@ -122,6 +131,8 @@ class Plugin(indigo.PluginBase):
         self.globals[PLUGIN_INFO][PATH] = indigo.server.getInstallFolderPath()
         self.globals[PLUGIN_INFO][API_VERSION] = indigo.server.apiVersion
         self.globals[PLUGIN_INFO][ADDRESS] = indigo.server.address
+        self.globals[PLUGIN_INFO][PLUGIN_PREFS_FOLDER] = f"{self.globals[PLUGIN_INFO][PATH]}/Preferences/Plugins/{plugin_id}"
+        os.makedirs(self.globals[PLUGIN_INFO][PLUGIN_PREFS_FOLDER], exist_ok=True)
 
         log_format = logging.Formatter("%(asctime)s.%(msecs)03d\t%(levelname)-12s\t%(name)s.%(funcName)-25s %(msg)s", datefmt="%Y-%m-%d %H:%M:%S")
         self.plugin_file_handler.setFormatter(log_format)
@@ -134,10 +145,10 @@ class Plugin(indigo.PluginBase):
         self.globals[HUBS] = dict()
         self.globals[EVENT] = dict()
         self.globals[THREAD] = dict()
-        self.globals[HOT_WATER_TIMERS] = dict()
         self.globals[INDIGO_DEVICE_TO_HUB] = dict()
-        self.globals[TRIGGERS_NEST_PROTECT] = dict()
-        self.globals[TRIGGERS_NEST_PROTECTS_ALL] = dict()
+        self.globals[TRIGGERS_NEST_PROTECT] = dict()  # (Nest Protect Indigo device id, trigger type id) -> trigger id -> trigger
+        self.globals[TRIGGERS_NEST_PROTECTS_ALL] = dict()  # Trigger type id -> trigger id -> trigger
+        self.globals[TRIGGERS_INDEX_KEYS] = dict()  # Trigger id -> key the trigger is indexed under
         self.globals[ALERTS_IN_PROGRESS] = dict()
 
         self.globals[LIST_STARLING_HUBS] = set()
@@ -150,9 +161,32 @@ class Plugin(indigo.PluginBase):
         # Initialise Queues area for Starling Hubs
         self.globals[QUEUES] = dict()
 
+        # Initialise the shadow state store used by the Hub Handlers to avoid reading device states from the Indigo server
+        self.globals[SHADOW_STATES] = Shadow_State_Store(self.globals)
+
+        # Initialise the per-device poll scheduler
+        self.globals[POLL_SCHEDULER] = Poll_Scheduler(self.globals)
+
+        # Initialise the scheduler for deferred work (hot water repeats, boost expiry, confirmation fetches); started in startup
+        self.globals[JOB_SCHEDULER] = Thread_Job_Scheduler(self.globals, threading.Event())
+
+        # Load the Nest devices discovered on each Starling Hub when the plugin last ran
+        self.globals[DISCOVERY_CACHE] = Discovery_Cache(self.globals)
+        self.globals[DISCOVERY_CACHE].load(self.globals[PLUGIN_INFO][PLUGIN_PREFS_FOLDER])
+
+        # Index of the plugin's devices by type, Starling Hub and Nest id; built in startup
+        self.globals[DEVICE_INDEX] = Device_Index(self.globals)
+
+        # Cached copies of the "_starling_debug" testing variables; loaded in startup
+        self.globals[DEBUG_OVERRIDES] = Debug_Overrides(self.globals)
+
         # Set Plugin Config Values
         self.closed_prefs_config_ui(plugin_prefs, False)
 
+        # The Starling Hub I/O engine is only selected when the plugin starts
+        self.globals[HUB_IO_ENGINE] = plugin_prefs.get("hub_io_engine", HUB_IO_ENGINE_THREAD)
+        self.globals[ASYNC_ENGINE] = None
+
     def display_plugin_information(self):
         try:
             def plugin_information_message():
@@ -176,6 +210,42 @@ class Plugin(indigo.PluginBase):
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
 
+    def display_hub_statistics(self):
+        try:
+            statistics_message_ui = "Starling Hub Statistics:\n"
+            statistics_message_ui += f"{'':={'^'}80}\n"
+            for starling_hub_dev_id, hub_handler in self.globals[THREAD].items():
+                statistics_message_ui += f"{indigo.devices[starling_hub_dev_id].name}\n"
+                for statistic_ui, statistic_value in hub_handler.statistics_report():
+                    statistics_message_ui += f"    {statistic_ui + ':':<40} {statistic_value}\n"
+            statistics_message_ui += "Shadow State Store\n"
+            statistics_message_ui += f"    {'Device Lookups Served In Process:':<40} {self.globals[SHADOW_STATES].shadow_hits}\n"
+            statistics_message_ui += f"    {'Device Lookups From Indigo Server:':<40} {self.globals[SHADOW_STATES].shadow_misses}\n"
+            statistics_message_ui += f"{'':={'^'}80}\n"
+
+            self.logger.info(statistics_message_ui)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def display_scheduled_jobs(self):
+        try:
+            scheduled_jobs_message_ui = "Starling Scheduled Jobs:\n"
+            scheduled_jobs_message_ui += f"{'':={'^'}80}\n"
+            pending_jobs = self.globals[JOB_SCHEDULER].pending_jobs()
+            for job in pending_jobs:
+                dev_name = indigo.devices[job[JOB_DEV_ID]].name if job[JOB_DEV_ID] in indigo.devices else f"Device {job[JOB_DEV_ID]}"
+                job_due_ui = datetime.fromtimestamp(job[JOB_DUE]).strftime("%Y-%m-%d %H:%M:%S")
+                scheduled_jobs_message_ui += f"    {job_due_ui}  {JOB_TYPES_UI.get(job[JOB_TYPE], job[JOB_TYPE]):<24} {dev_name}\n"
+            if len(pending_jobs) == 0:
+                scheduled_jobs_message_ui += "    No jobs scheduled\n"
+            scheduled_jobs_message_ui += f"{'':={'^'}80}\n"
+
+            self.logger.info(scheduled_jobs_message_ui)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
     def exception_handler(self, exception_error_message, log_failing_statement):
         filename, line_number, method, statement = traceback.extract_tb(sys.exc_info()[2])[-1]
         module = filename.split('/')
@@ -192,21 +262,39 @@ class Plugin(indigo.PluginBase):
 
     def triggerStartProcessing(self, trigger):
         self.logger.debug(f"{trigger.name}: Adding Trigger")
+        # Triggers are indexed by what fires them, so that the Hub Handler finds the triggers for an alert change with a
+        #   dict lookup rather than testing every trigger (and reading its pluginProps) for each Nest Protect
         if trigger.pluginTypeId in ("alertDetected", "alertNoLongerDetected"):
-            assert trigger.id not in self.globals[TRIGGERS_NEST_PROTECT]
-            self.globals[TRIGGERS_NEST_PROTECT][trigger.id] = trigger
+            assert trigger.id not in self.globals[TRIGGERS_INDEX_KEYS]
+            try:
+                nest_protect_dev_id = int(trigger.pluginProps.get("nestProtectDevice", 0))
+            except ValueError:
+                nest_protect_dev_id = 0
+            trigger_index_key = (nest_protect_dev_id, trigger.pluginTypeId)
+            self.globals[TRIGGERS_NEST_PROTECT].setdefault(trigger_index_key, dict())[trigger.id] = trigger
+            self.globals[TRIGGERS_INDEX_KEYS][trigger.id] = trigger_index_key
         elif trigger.pluginTypeId in ("alertDetectedAnyProtect", "alerttNoLongeDetectedAnyProtect"):
-            assert trigger.id not in self.globals[TRIGGERS_NEST_PROTECTS_ALL]
-            self.globals[TRIGGERS_NEST_PROTECTS_ALL][trigger.id] = trigger
+            assert trigger.id not in self.globals[TRIGGERS_INDEX_KEYS]
+            self.globals[TRIGGERS_NEST_PROTECTS_ALL].setdefault(trigger.pluginTypeId, dict())[trigger.id] = trigger
+            self.globals[TRIGGERS_INDEX_KEYS][trigger.id] = trigger.pluginTypeId
 
     def triggerStopProcessing(self, trigger):
         self.logger.debug(f"{trigger.name}: Removing Trigger")
+        # Removed using the key it was indexed under, as the trigger's properties may have been edited since it was started
         if trigger.pluginTypeId in ("alertDetected", "alertNoLongerDetected"):
-            assert trigger.id in self.globals[TRIGGERS_NEST_PROTECT]
-            del self.globals[TRIGGERS_NEST_PROTECT][trigger.id]
+            assert trigger.id in self.globals[TRIGGERS_INDEX_KEYS]
+            trigger_index_key = self.globals[TRIGGERS_INDEX_KEYS].pop(trigger.id)
+            triggers = self.globals[TRIGGERS_NEST_PROTECT][trigger_index_key]
+            del triggers[trigger.id]
+            if len(triggers) == 0:
+                del self.globals[TRIGGERS_NEST_PROTECT][trigger_index_key]
         elif trigger.pluginTypeId in ("alertDetectedAnyProtect", "alerttNoLongeDetectedAnyProtect"):
-            assert trigger.id in self.globals[TRIGGERS_NEST_PROTECTS_ALL]
-            del self.globals[TRIGGERS_NEST_PROTECTS_ALL][trigger.id]
+            assert trigger.id in self.globals[TRIGGERS_INDEX_KEYS]
+            trigger_index_key = self.globals[TRIGGERS_INDEX_KEYS].pop(trigger.id)
+            triggers = self.globals[TRIGGERS_NEST_PROTECTS_ALL][trigger_index_key]
+            del triggers[trigger.id]
+            if len(triggers) == 0:
+                del self.globals[TRIGGERS_NEST_PROTECTS_ALL][trigger_index_key]
 
     def action_control_device(self, action, dev):
         try:
@@ -485,6 +573,11 @@ class Plugin(indigo.PluginBase):
                 self.logger.threaddebug(f"'closedDeviceConfigUi' called with userCancelled = {str(user_cancelled)}")
                 return
 
+            if type_id == "starlingHub":
+                if dev_id in self.globals[HUBS]:
+                    # Rebuild the Starling Hub endpoint from the updated configuration
+                    self.globals[HUBS][dev_id][HUB_ENDPOINT] = derive_hub_endpoint(values_dict)
+
             if type_id in ("nestProtect", "nestThermostat", "nestHomeAwayControl", "nestWeather"):
                 starling_hub_device_id = int(values_dict.get("starling_hub_indigo_id", 0))
                 if starling_hub_device_id > 0:
@@ -509,6 +602,14 @@ class Plugin(indigo.PluginBase):
             # The frequency of Starling Home Hub polling
             self.globals[POLLING_SECONDS] = int(values_dict.get("polling_seconds", 5))
 
+            # Per device type polling intervals (0 = use the polling interval above)
+            self.globals[POLLING_INTERVALS] = dict()
+            self.globals[POLLING_INTERVALS]["nestProtect"] = int(values_dict.get("polling_seconds_protect", 0))
+            self.globals[POLLING_INTERVALS]["nestThermostat"] = int(values_dict.get("polling_seconds_thermostat", 0))
+            self.globals[POLLING_INTERVALS]["nestWeather"] = int(values_dict.get("polling_seconds_weather", 0))
+            self.globals[POLLING_INTERVALS]["nestHomeAwayControl"] = int(values_dict.get("polling_seconds_home_away", 0))
+            self.globals[POLL_SCHEDULER].reset()  # Reschedule all devices using the new intervals
+
             # Get required Event Log and Plugin Log logging levels
             plugin_log_level = int(values_dict.get("pluginLogLevel", LOG_LEVEL_INFO))
             event_log_level = int(values_dict.get("eventLogLevel", LOG_LEVEL_INFO))
@@ -612,6 +713,7 @@ class Plugin(indigo.PluginBase):
                 return
             self.logger.warning(f"Starting '{dev.name} [{dev.deviceTypeId}] ...")
             dev.stateListOrDisplayStateIdChanged()  # Ensure that latest devices.xml is being used
+            self.globals[DEVICE_INDEX].update(dev)  # Picks up devices created since startup
             
             # "thermostat", "temp_sensor", "protect", "cam", "guard", "detect", "lock", "home_away_control"
 
@@ -653,15 +755,24 @@ class Plugin(indigo.PluginBase):
                 self.globals[HUBS][dev.id][NEST_DEVICES_BY_INDIGO_DEVICE_ID] = dict()
                 self.globals[HUBS][dev.id][NEST_DEVICES_BY_NEST_ID] = dict()
 
+            # Offer the previously discovered Nest devices straight away; reconciled when the Hub Handler lists the live devices
+            self.globals[DISCOVERY_CACHE].seed_hub(dev.id)
+
+            # Precompute the Starling Hub endpoint (request URL prefix and suffix) used by the Hub Handler
+            self.globals[HUBS][dev.id][HUB_ENDPOINT] = derive_hub_endpoint(dev.pluginProps)
+
             if dev.id not in self.globals[QUEUES]:
                 # Create Queues for handling Starling Hub API requests
-                self.globals[QUEUES][dev.id] = queue.PriorityQueue()   # Used to queue API requests for specific Starling Hubs
+                self.globals[QUEUES][dev.id] = Hub_Queue()   # Used to queue API requests for specific Starling Hubs
             if dev.id not in self.globals[THREAD]:
                 # Create the thread to handle API calls to Starling Hub
                 # self.globals[THREAD_STARTED][dev.id] = False
                 self.globals[EVENT][dev.id] = threading.Event()
                 self.globals[THREAD][dev.id] = Thread_Hub_Handler(self.globals, dev.id, self.globals[EVENT][dev.id])
-                self.globals[THREAD][dev.id].start()
+                if self.globals[ASYNC_ENGINE] is not None:
+                    self.globals[ASYNC_ENGINE].register_hub(self.globals[THREAD][dev.id])  # Serviced by the Hub Async Engine's event loop
+                else:
+                    self.globals[THREAD][dev.id].start()
                 # self.globals[THREAD_STARTED][dev.id] = True
 
             props = dev.pluginProps
@@ -673,6 +784,7 @@ class Plugin(indigo.PluginBase):
             keyValueList = [
                 {"key": "api_ready", "value": False},
                 {"key": "connected_to_nest", "value": False},
+                {"key": "circuit_state", "value": "Closed"},
                 {"key": "status", "value": "Connecting"},
                 {"key": "status_message", "value": "Connecting ..."}
             ]
@@ -809,7 +921,7 @@ class Plugin(indigo.PluginBase):
             self.globals[HUBS][hub_id][NEST_DEVICES_BY_INDIGO_DEVICE_ID][dev.id][HUMIDIFIER_DEV_ID] = 0
             self.globals[HUBS][hub_id][NEST_DEVICES_BY_INDIGO_DEVICE_ID][dev.id][FAN_DEV_ID] = 0
             self.globals[HUBS][hub_id][NEST_DEVICES_BY_INDIGO_DEVICE_ID][dev.id][HOT_WATER_DEV_ID] = 0
-            self.globals[HUBS][hub_id][NEST_DEVICES_BY_INDIGO_DEVICE_ID][dev.id][HOT_WATER_MODE] = HOT_WATER_MODE_OFF
+            self.globals[HUBS][hub_id][NEST_DEVICES_BY_INDIGO_DEVICE_ID][dev.id][HOT_WATER_MODE] = self.globals[JOB_SCHEDULER].hot_water_mode(dev.id)
 
             self.check_grouped_devices(hub_id, dev)  # Check grouped devices and ungroup if necessary
 
@@ -833,20 +945,15 @@ class Plugin(indigo.PluginBase):
             dev.updateStatesOnServer(keyValueList)
             dev.updateStateImageOnServer(indigo.kStateImageSel.TimerOn)
 
+            # The Starling Hub is that of the Nest Thermostat this Hot Water device is grouped with
             starling_hub_indigo_id = 0
-            dev_id_list = indigo.device.getGroupList(dev.id)
-            if len(dev_id_list) > 1:
-                for linked_dev_id in dev_id_list:
-                    if linked_dev_id != dev.id:
-                        linked_dev = indigo.devices[linked_dev_id]
-                        if linked_dev.deviceTypeId == "nestThermostat":
-                            props = linked_dev.pluginProps
-                            starling_hub_indigo_id = props.get("starling_hub_indigo_id", 0)
-                            break
-            if starling_hub_indigo_id != 0:
+            nest_thermostat_dev_id = self.globals[DEVICE_INDEX].primary_device_id(dev.id)
+            if nest_thermostat_dev_id != 0:
+                starling_hub_indigo_id = self.globals[DEVICE_INDEX].device_entry(nest_thermostat_dev_id)[INDEX_HUB_ID]
+            if starling_hub_indigo_id != 0 and starling_hub_indigo_id in self.globals[HUBS]:
                 if dev.id not in self.globals[HUBS][starling_hub_indigo_id][NEST_DEVICES_BY_INDIGO_DEVICE_ID]:
                     self.globals[HUBS][starling_hub_indigo_id][NEST_DEVICES_BY_INDIGO_DEVICE_ID][dev.id] = dict()
-                self.globals[HUBS][starling_hub_indigo_id][NEST_DEVICES_BY_INDIGO_DEVICE_ID][dev.id][HOT_WATER_MODE] = HOT_WATER_MODE_OFF
+                self.globals[HUBS][starling_hub_indigo_id][NEST_DEVICES_BY_INDIGO_DEVICE_ID][dev.id][HOT_WATER_MODE] = self.globals[JOB_SCHEDULER].hot_water_mode(dev.id)
 
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
@@ -907,52 +1014,49 @@ class Plugin(indigo.PluginBase):
     def check_grouped_devices(self, hub_id, nest_dev):
         try:
             props = nest_dev.pluginProps
-            dev_id_list = indigo.device.getGroupList(nest_dev.id)
-            if len(dev_id_list) > 1:
-                for linked_dev_id in dev_id_list:
-                    if linked_dev_id != nest_dev.id:
-                        linked_dev = indigo.devices[linked_dev_id]
-                        if nest_dev.deviceTypeId == "nestThermostat":
-                            if linked_dev.deviceTypeId == "nestThermostatHumidifier":
-                                if props.get("humidifier_enabled", False):
-                                    self.globals[HUBS][hub_id][NEST_DEVICES_BY_INDIGO_DEVICE_ID][nest_dev.id][HUMIDIFIER_DEV_ID] = linked_dev_id
-                                    self.globals[INDIGO_DEVICE_TO_HUB][linked_dev_id] = hub_id
-                                else:
-                                    # Ungroup linked Humidifier Device
-                                    self.globals[HUBS][hub_id][NEST_DEVICES_BY_INDIGO_DEVICE_ID][nest_dev.id][HUMIDIFIER_DEV_ID] = 0
-                                    self.ungroup_linked_device(nest_dev, linked_dev)
-                            elif linked_dev.deviceTypeId == "nestThermostatFan":
-                                if props.get("fan_enabled", False):
-                                    self.globals[HUBS][hub_id][NEST_DEVICES_BY_INDIGO_DEVICE_ID][nest_dev.id][FAN_DEV_ID] = linked_dev_id
-                                    self.globals[INDIGO_DEVICE_TO_HUB][linked_dev_id] = hub_id
-                                else:
-                                    # Ungroup linked Fan Device
-                                    self.globals[HUBS][hub_id][NEST_DEVICES_BY_INDIGO_DEVICE_ID][nest_dev.id][FAN_DEV_ID] = 0
-                                    self.ungroup_linked_device(nest_dev, linked_dev)
-                            elif linked_dev.deviceTypeId == "nestThermostatHotWater":
-                                if props.get("hot_water_enabled", False):
-                                    self.globals[HUBS][hub_id][NEST_DEVICES_BY_INDIGO_DEVICE_ID][nest_dev.id][HOT_WATER_DEV_ID] = linked_dev_id
-                                    self.globals[INDIGO_DEVICE_TO_HUB][linked_dev_id] = hub_id
-                                else:
-                                    # Ungroup linked Hot water device
-                                    self.globals[HUBS][hub_id][NEST_DEVICES_BY_INDIGO_DEVICE_ID][nest_dev.id][HOT_WATER_DEV_ID] = 0
-                                    self.ungroup_linked_device(nest_dev, linked_dev)
-                        elif nest_dev.deviceTypeId == "nestProtect":
-                            if linked_dev.deviceTypeId == "nestProtectCo":
-                                self.globals[HUBS][hub_id][NEST_DEVICES_BY_INDIGO_DEVICE_ID][nest_dev.id][CO_DEV_ID] = linked_dev_id
-                                self.globals[INDIGO_DEVICE_TO_HUB][linked_dev_id] = hub_id
-                            elif linked_dev.deviceTypeId == "nestProtectMotion":
-                                if props.get("nest_occupancy_detected_enabled", False):
-                                    self.globals[HUBS][hub_id][NEST_DEVICES_BY_INDIGO_DEVICE_ID][nest_dev.id][MOTION_DEV_ID] = linked_dev_id
-                                    self.globals[INDIGO_DEVICE_TO_HUB][linked_dev_id] = hub_id
-                                else:
-                                    # Ungroup linked Motion Device
-                                    self.globals[HUBS][hub_id][NEST_DEVICES_BY_INDIGO_DEVICE_ID][nest_dev.id][MOTION_DEV_ID] = 0
-                                    self.ungroup_linked_device(nest_dev, linked_dev)
-                        elif nest_dev.deviceTypeId == "nestWeather":
-                            if linked_dev.deviceTypeId == "nestWeatherHumidity":
-                                self.globals[HUBS][hub_id][NEST_DEVICES_BY_INDIGO_DEVICE_ID][nest_dev.id][HUMIDITY_DEV_ID] = linked_dev_id
-                                self.globals[INDIGO_DEVICE_TO_HUB][linked_dev_id] = hub_id
+            # The grouped secondary devices come from the device index rather than walking the Indigo device group
+            for linked_dev_type_id, linked_dev_id in self.globals[DEVICE_INDEX].secondary_device_ids(nest_dev.id).items():
+                if nest_dev.deviceTypeId == "nestThermostat":
+                    if linked_dev_type_id == "nestThermostatHumidifier":
+                        if props.get("humidifier_enabled", False):
+                            self.globals[HUBS][hub_id][NEST_DEVICES_BY_INDIGO_DEVICE_ID][nest_dev.id][HUMIDIFIER_DEV_ID] = linked_dev_id
+                            self.globals[INDIGO_DEVICE_TO_HUB][linked_dev_id] = hub_id
+                        else:
+                            # Ungroup linked Humidifier Device
+                            self.globals[HUBS][hub_id][NEST_DEVICES_BY_INDIGO_DEVICE_ID][nest_dev.id][HUMIDIFIER_DEV_ID] = 0
+                            self.ungroup_linked_device(nest_dev, indigo.devices[linked_dev_id])
+                    elif linked_dev_type_id == "nestThermostatFan":
+                        if props.get("fan_enabled", False):
+                            self.globals[HUBS][hub_id][NEST_DEVICES_BY_INDIGO_DEVICE_ID][nest_dev.id][FAN_DEV_ID] = linked_dev_id
+                            self.globals[INDIGO_DEVICE_TO_HUB][linked_dev_id] = hub_id
+                        else:
+                            # Ungroup linked Fan Device
+                            self.globals[HUBS][hub_id][NEST_DEVICES_BY_INDIGO_DEVICE_ID][nest_dev.id][FAN_DEV_ID] = 0
+                            self.ungroup_linked_device(nest_dev, indigo.devices[linked_dev_id])
+                    elif linked_dev_type_id == "nestThermostatHotWater":
+                        if props.get("hot_water_enabled", False):
+                            self.globals[HUBS][hub_id][NEST_DEVICES_BY_INDIGO_DEVICE_ID][nest_dev.id][HOT_WATER_DEV_ID] = linked_dev_id
+                            self.globals[INDIGO_DEVICE_TO_HUB][linked_dev_id] = hub_id
+                        else:
+                            # Ungroup linked Hot water device
+                            self.globals[HUBS][hub_id][NEST_DEVICES_BY_INDIGO_DEVICE_ID][nest_dev.id][HOT_WATER_DEV_ID] = 0
+                            self.ungroup_linked_device(nest_dev, indigo.devices[linked_dev_id])
+                elif nest_dev.deviceTypeId == "nestProtect":
+                    if linked_dev_type_id == "nestProtectCo":
+                        self.globals[HUBS][hub_id][NEST_DEVICES_BY_INDIGO_DEVICE_ID][nest_dev.id][CO_DEV_ID] = linked_dev_id
+                        self.globals[INDIGO_DEVICE_TO_HUB][linked_dev_id] = hub_id
+                    elif linked_dev_type_id == "nestProtectMotion":
+                        if props.get("nest_occupancy_detected_enabled", False):
+                            self.globals[HUBS][hub_id][NEST_DEVICES_BY_INDIGO_DEVICE_ID][nest_dev.id][MOTION_DEV_ID] = linked_dev_id
+                            self.globals[INDIGO_DEVICE_TO_HUB][linked_dev_id] = hub_id
+                        else:
+                            # Ungroup linked Motion Device
+                            self.globals[HUBS][hub_id][NEST_DEVICES_BY_INDIGO_DEVICE_ID][nest_dev.id][MOTION_DEV_ID] = 0
+                            self.ungroup_linked_device(nest_dev, indigo.devices[linked_dev_id])
+                elif nest_dev.deviceTypeId == "nestWeather":
+                    if linked_dev_type_id == "nestWeatherHumidity":
+                        self.globals[HUBS][hub_id][NEST_DEVICES_BY_INDIGO_DEVICE_ID][nest_dev.id][HUMIDITY_DEV_ID] = linked_dev_id
+                        self.globals[INDIGO_DEVICE_TO_HUB][linked_dev_id] = hub_id
 
 
         except Exception as exception_error:
@@ -977,6 +1081,11 @@ class Plugin(indigo.PluginBase):
 
             linked_dev_name = linked_dev.name
 
+            if linked_dev.id not in indigo.device.getGroupList(nest_dev.id):
+                # Already ungrouped (e.g. in the Indigo UI) since it was indexed: just bring the index up to date
+                self.globals[DEVICE_INDEX].update(linked_dev)
+                return
+
             indigo.device.ungroupDevice(linked_dev)
             linked_dev.refreshFromServer()
             nest_dev.refreshFromServer()
@@ -994,6 +1103,7 @@ class Plugin(indigo.PluginBase):
             ungrouped_name = f"{linked_dev.name} [UNGROUPED @ {ungrouped_time}]"
             linked_dev.name = ungrouped_name
             linked_dev.replaceOnServer()
+            self.globals[DEVICE_INDEX].update(linked_dev)  # No longer a secondary device of nest_dev
 
             self.logger.warning(f"'{device_type_ui}' not enabled for {nest_dev.name}.\n    Device '{linked_dev_name}' ungrouped and renamed to '{ungrouped_name}'")
 
@@ -1085,6 +1195,8 @@ class Plugin(indigo.PluginBase):
             if self.do_not_start_devices:  # This is set on if Package requirements listed in requirements.txt are not met
                 return
 
+            self.globals[SHADOW_STATES].forget(dev.id)
+
             # self.logger.info(f"Device '{dev.name}' Stopped")
 
             if dev.deviceTypeId in ("nestProtect", "nestThermostat", "nestHomeAwayControl", "nestWeather"):
@@ -1102,7 +1214,10 @@ class Plugin(indigo.PluginBase):
                 # TODO: Stop hubhandler thread
 
                 self.globals[EVENT][dev.id].set()  # Stop the Hub handler Thread
-                self.globals[THREAD][dev.id].join(5.0)  # noqa [Expected type 'Iterable[str]', got 'float' instead] - Wait for up t0 5 seconds for it to end
+                if self.globals[ASYNC_ENGINE] is not None:
+                    self.globals[ASYNC_ENGINE].unregister_hub(dev.id)
+                if self.globals[THREAD][dev.id].is_alive():
+                    self.globals[THREAD][dev.id].join(5.0)  # noqa [Expected type 'Iterable[str]', got 'float' instead] - Wait for up t0 5 seconds for it to end
 
                 # Delete thread so that it can be recreated if the Starling Hub device is turned on again
                 del self.globals[THREAD][dev.id]
@@ -1114,9 +1229,60 @@ class Plugin(indigo.PluginBase):
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
 
+    def device_deleted(self, dev):
+        try:
+            self.globals[DEVICE_INDEX].remove(dev.id)
+            if dev.deviceTypeId == "starlingHub":
+                self.globals[DISCOVERY_CACHE].forget_hub(dev.id)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+        super(Plugin, self).device_deleted(dev)
+
+    def variable_created(self, var):
+        try:
+            self.globals[DEBUG_OVERRIDES].update(None, var)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+        super(Plugin, self).variable_created(var)
+
+    def variable_deleted(self, var):
+        try:
+            self.globals[DEBUG_OVERRIDES].remove(var)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+        super(Plugin, self).variable_deleted(var)
+
+    def variable_updated(self, orig_var, new_var):
+        try:
+            self.globals[DEBUG_OVERRIDES].update(orig_var, new_var)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+        super(Plugin, self).variable_updated(orig_var, new_var)
+
     def device_updated(self, origDev, newDev):
         try:
-            pass
+            self.globals[SHADOW_STATES].reconcile(newDev)  # Keep the Hub Handlers' shadow copy in step with Indigo
+            self.globals[DEVICE_INDEX].update(newDev)  # e.g. renamed, enabled / disabled or moved to another Starling Hub
+
+            if newDev.deviceTypeId == "starlingHub" and newDev.id in self.globals[HUBS]:
+                # Invalidate the precomputed Starling Hub endpoint if any of its connection settings have changed
+                orig_props = origDev.pluginProps
+                new_props = newDev.pluginProps
+                for endpoint_prop in ("starling_hub_ip", "starling_hub_ssl_tls", "api_key", "connection_pool_size", "concurrent_requests", "circuit_breaker_threshold", "connect_timeout", "read_timeout"):
+                    if orig_props.get(endpoint_prop, None) != new_props.get(endpoint_prop, None):
+                        self.globals[HUBS][newDev.id][HUB_ENDPOINT] = derive_hub_endpoint(new_props)
+                        break
+            elif newDev.deviceTypeId in ("nestProtect", "nestThermostat", "nestHomeAwayControl", "nestWeather"):
+                if origDev.pluginProps.get("polling_seconds_override", "0") != newDev.pluginProps.get("polling_seconds_override", "0"):
+                    self.globals[POLL_SCHEDULER].forget_device(newDev.id)  # Reschedule using the new polling interval
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
 
@@ -1149,6 +1315,7 @@ class Plugin(indigo.PluginBase):
                 plugin_props["primaryIndigoDevice"] = False
                 if dev_id in indigo.devices:
                     dev_id_list = indigo.device.getGroupList(dev_id)
+                    self.globals[DEVICE_INDEX].update(indigo.devices[dev_id])  # Keep the index's grouping current
                     if len(dev_id_list) > 1:
                         plugin_props['member_of_device_group'] = True
                         # for linked_dev_id in dev_id_list:
@@ -1247,17 +1414,15 @@ class Plugin(indigo.PluginBase):
         try:
             self.sleep(10)
             while True:
-                # self.logger.warning(f"Starling runConcurrentThread looping every {self.globals[POLLING_SECONDS]} second(s).")
-                nest_device_list = list()
-                for starling_hub_dev_id in self.globals[HUBS]:
-                    if starling_hub_dev_id in self.globals[QUEUES]:
-                        for nest_id in self.globals[HUBS][starling_hub_dev_id][NEST_DEVICES_BY_NEST_ID]:
-                            nest_dev_id = self.globals[HUBS][starling_hub_dev_id][NEST_DEVICES_BY_NEST_ID][nest_id][INDIGO_DEV_ID]
-                            if nest_dev_id != 0:
-                                nest_device_list.append(nest_dev_id)
-                        if len(nest_device_list) > 0:
-                            self.globals[QUEUES][starling_hub_dev_id].put((QUEUE_PRIORITY_POLLING, API_COMMAND_POLL_DEVICE, nest_device_list, None))
-                self.sleep(self.globals[POLLING_SECONDS])
+                # Only poll the Nest devices whose (per-device, adaptive) polling interval has elapsed
+                for starling_hub_dev_id, nest_device_list in self.globals[POLL_SCHEDULER].due_devices().items():
+                    if starling_hub_dev_id in self.globals[QUEUES] and starling_hub_dev_id in self.globals[THREAD]:
+                        self.globals[THREAD][starling_hub_dev_id].enqueue_poll(nest_device_list)  # Coalesced with any poll still pending
+                # Nest Protects of Starling Hubs with an alert in progress are polled on their own, higher priority, queue lane
+                for starling_hub_dev_id, nest_device_list in self.globals[POLL_SCHEDULER].due_alert_devices().items():
+                    if starling_hub_dev_id in self.globals[QUEUES] and starling_hub_dev_id in self.globals[THREAD]:
+                        self.globals[THREAD][starling_hub_dev_id].enqueue_alert_poll(nest_device_list)
+                self.sleep(POLL_SCHEDULER_TICK_SECONDS)
 
         except self.StopThread:
             # if needed, you could do any cleanup here, or could exit via another flag
@@ -1277,8 +1442,26 @@ class Plugin(indigo.PluginBase):
 
     def startup(self):
         try:
+            if self.globals[HUB_IO_ENGINE] == HUB_IO_ENGINE_ASYNCIO:
+                # Start the single event loop that will service all Starling Hubs
+                self.globals[ASYNC_ENGINE] = Thread_Hub_Async_Engine(self.globals, threading.Event())
+                self.globals[ASYNC_ENGINE].start()
+                self.logger.info("Starling Hub I/O engine: asyncio")
+
+            # Restore any hot water jobs saved when the plugin was last stopped and start running deferred work
+            self.globals[JOB_SCHEDULER].load_jobs(self.globals[PLUGIN_INFO][PLUGIN_PREFS_FOLDER])
+            self.globals[JOB_SCHEDULER].start()
+
+            # The only full scan of the plugin's devices: from here on the device index is kept current by the device callbacks
+            self.globals[DEVICE_INDEX].build()
+
+            # Keep the debug override variables cached from Indigo's variable change notifications
+            indigo.variables.subscribeToChanges()
+            self.globals[DEBUG_OVERRIDES].load()
+
             self.logger.warning("Process Hubs ...")  # First list and process all Starling Hubs  TODO: REMOVE LOGGING
-            for dev in indigo.devices.iter("self"):
+            for dev_id in self.globals[DEVICE_INDEX].device_ids("starlingHub", enabled_only=True):
+                dev = indigo.devices[dev_id]
                 if dev.deviceTypeId == "starlingHub":
                     if dev.enabled:
                         # props = dev.pluginProps
@@ -1287,10 +1470,14 @@ class Plugin(indigo.PluginBase):
                         self.globals[HUBS][dev.id][NEST_DEVICES_BY_NEST_ID] = dict()
 
                         # Create Queues for handling Starling Hub API requests
-                        self.globals[QUEUES][dev.id] = queue.PriorityQueue()  # Used to queue API requests for specific Starling Hubs
+                        self.globals[QUEUES][dev.id] = Hub_Queue()  # Used to queue API requests for specific Starling Hubs
 
             self.logger.warning("Process Devices ...")  # Secondly, then process all Starling Nest devices  TODO: REMOVE LOGGING
-            for dev in indigo.devices.iter("self"):
+            nest_dev_ids = list()
+            for nest_device_type_id in ("nestProtect", "nestThermostat", "nestHomeAwayControl", "nestWeather"):  # TODO: More to be added - 30-Mar-2022
+                nest_dev_ids.extend(self.globals[DEVICE_INDEX].device_ids(nest_device_type_id, enabled_only=True))
+            for dev_id in nest_dev_ids:
+                dev = indigo.devices[dev_id]
                 if dev.deviceTypeId in ("nestProtect", "nestThermostat", "nestHomeAwayControl", "nestWeather"):  # TODO: More to be added - 30-Mar-2022
                     if dev.enabled:
                         props = dev.pluginProps
@@ -1335,6 +1522,9 @@ class Plugin(indigo.PluginBase):
             # self.logger.info("Starling plugin closing down")
             for starling_hub_dev_id in self.globals[HUBS]:
                 self.globals[QUEUES][starling_hub_dev_id].put((QUEUE_PRIORITY_STOP_THREAD, STOP_THREAD, None, None))
+            if self.globals[ASYNC_ENGINE] is not None:
+                self.globals[ASYNC_ENGINE].stop()
+            self.globals[JOB_SCHEDULER].stop()
             self.stopThread = True
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
@@ -1483,10 +1673,9 @@ class Plugin(indigo.PluginBase):
     def list_starling_hubs(self, filter="", valuesDict=None, typeId="", targetId=0):  # noqa [parameter value is not used]
         try:
             starling_hubs_list = list()
-            for dev in indigo.devices.iter("self"):
-                if dev.deviceTypeId == "starlingHub":
-                    starling_hubs_list.append((dev.id, dev.name))
-                    self.globals[LIST_STARLING_HUBS].add(dev.id)
+            for dev_id in self.globals[DEVICE_INDEX].device_ids("starlingHub"):
+                starling_hubs_list.append((dev_id, self.globals[DEVICE_INDEX].device_entry(dev_id)[INDEX_NAME]))
+                self.globals[LIST_STARLING_HUBS].add(dev_id)
 
             if len(starling_hubs_list) == 0:
                 starling_hubs_list = list()
@@ -1532,10 +1721,9 @@ class Plugin(indigo.PluginBase):
 
             # build list of Indigo devices already allocated to Starling Nest devices of the required type
             allocated_devices = dict()
-            for dev in indigo.devices.iter("self"):
-                if dev.id != targetId and dev.deviceTypeId == typeId:
-                    nest_id = dev.address
-                    allocated_devices[nest_id] = dev.id
+            for nest_id, dev_id in self.globals[DEVICE_INDEX].device_ids_by_nest_id(typeId).items():
+                if dev_id != targetId:
+                    allocated_devices[nest_id] = dev_id
 
             nest_devices_list = list()
             self.globals[LIST_NEST_DEVICES].clear()
@@ -1593,28 +1781,25 @@ class Plugin(indigo.PluginBase):
         try:
             # Connect to Starling Hub
 
-            props = starling_hub_dev.pluginProps
-            ip_address = props.get("starling_hub_ip", "127.0.0.1")  # Should be in format "nnn.nnn.nnn.nnn"
-            if props.get("starling_hub_ssl_tls", True):
-                https_ip = ip_address.split(".")
-                https_ip_1 = https_ip[0]
-                https_ip_2 = https_ip[1]
-                https_ip_3 = https_ip[2]
-                https_ip_4 = https_ip[3]
-                requests_prefix = (f"https://{https_ip_1}-{https_ip_2}-{https_ip_3}-{https_ip_4}.local.starling.direct:3443/api/connect/v1/")
+            if starling_hub_dev.id in self.globals[HUBS] and self.globals[HUBS][starling_hub_dev.id].get(HUB_ENDPOINT, None) is not None:
+                hub_endpoint = self.globals[HUBS][starling_hub_dev.id][HUB_ENDPOINT]
             else:
-                requests_prefix = f"http://{ip_address}:3443/api/connect/v1/"  # noqa [http links are not secure]
-            api_key = props.get("api_key", "not_set_in_plugin")
-            requests_suffix = f"?key={api_key}"
-            requests_string = f"{requests_prefix}{starling_command}{requests_suffix}"
+                hub_endpoint = derive_hub_endpoint(starling_hub_dev.pluginProps)
+            requests_string = f"{hub_endpoint[REQUESTS_PREFIX]}{starling_command}{hub_endpoint[REQUESTS_SUFFIX]}"
 
             print(f"access_starling_hub Request String: {requests_string}")
 
+            # Use the Starling Hub's persistent session if its Hub Handler is running
+            if starling_hub_dev.id in self.globals[THREAD]:
+                requests_session = self.globals[THREAD][starling_hub_dev.id].get_requests_session(hub_endpoint)
+            else:
+                requests_session = requests
+
             error_code = None
             error_message = None
 
             try:
-                reply = requests.get(requests_string, timeout=5)
+                reply = requests_session.get(requests_string, timeout=hub_endpoint[HUB_TIMEOUTS])
                 # print(f"Reply Status: {reply.status_code}, Text: {reply.text}")
                 status_code = reply.status_code
                 if status_code == 200:
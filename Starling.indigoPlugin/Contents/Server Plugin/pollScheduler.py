@@ -0,0 +1,213 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Starling - Poll Scheduler © Autolog 2022-2025
+#
+
+try:
+    # noinspection PyUnresolvedReferences
+    import indigo
+except ImportError:
+    pass
+
+import sys
+import threading
+import time
+import traceback
+
+from constants import *  # Also imports logging
+
+
+# noinspection PyPep8Naming
+class Poll_Scheduler(object):
+
+    # This class decides which Nest devices are due to be polled.
+    #   Each Nest device has its own next-due time and polling interval. The base interval comes from the device's own
+    #   'Polling Interval' setting, else the plugin's interval for that device type, else the plugin's 'Polling Interval'.
+    #   While a device's Starling Hub properties are unchanged its interval backs off (up to a limit) and it snaps back
+    #   to the base interval as soon as they change. Devices are picked up from the HUBS global as they are started.
+    #   Whilst a Starling Hub is in alert mode (see set_alert_mode), its Nest Protects are instead returned by
+    #   due_alert_devices every ALERT_POLLING_SECONDS, for the Hub Handler's alert queue lane.
+
+    def __init__(self, plugin_globals):
+        try:
+            self.globals = plugin_globals
+
+            self.pollSchedulerLogger = logging.getLogger("Plugin.POLL_SCHEDULER")
+
+            self.schedule_lock = threading.Lock()
+            self.schedule = dict()  # Indigo Nest device id -> schedule entry dict
+            self.last_properties = dict()  # Indigo Nest device id -> Nest properties returned by the previous poll
+            self.alert_hubs = set()  # Starling Hub device ids with a Nest Protect alert in progress
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def exception_handler(self, exception_error_message, log_failing_statement):
+        filename, line_number, method, statement = traceback.extract_tb(sys.exc_info()[2])[-1]  # noqa [Ignore duplicate code warning]
+        module = filename.split('/')
+        log_message = u"'{0}' in module '{1}', method '{2}'".format(exception_error_message, module[-1], method)
+        if log_failing_statement:
+            log_message = log_message + u"\n   Failing statement [line {0}]: '{1}'".format(line_number, statement)
+        else:
+            log_message = log_message + u" at line {0}".format(line_number)
+        self.pollSchedulerLogger.error(log_message)
+
+    def base_interval(self, nest_dev):
+        try:
+            # Device override, else device type interval, else the plugin polling interval
+            device_interval = int(nest_dev.pluginProps.get("polling_seconds_override", 0))
+            if device_interval > 0:
+                return device_interval
+            type_interval = self.globals[POLLING_INTERVALS].get(nest_dev.deviceTypeId, 0)
+            if type_interval > 0:
+                return type_interval
+            return self.globals[POLLING_SECONDS]
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+            return self.globals[POLLING_SECONDS]
+
+    def due_devices(self):
+        try:
+            # Return a dict of Starling Hub device id -> list of Nest device ids that are due to be polled now
+            now = time.time()
+            due = dict()
+            active_nest_dev_ids = set()
+            with self.schedule_lock:
+                for starling_hub_dev_id in list(self.globals[HUBS]):
+                    for nest_id, nest_device in list(self.globals[HUBS][starling_hub_dev_id][NEST_DEVICES_BY_NEST_ID].items()):
+                        nest_dev_id = nest_device.get(INDIGO_DEV_ID, 0)
+                        if nest_dev_id == 0:
+                            continue
+                        active_nest_dev_ids.add(nest_dev_id)
+                        schedule_entry = self.schedule.get(nest_dev_id, None)
+                        if schedule_entry is None or schedule_entry[POLL_HUB_ID] != starling_hub_dev_id:
+                            if nest_dev_id not in indigo.devices:
+                                continue
+                            nest_dev = indigo.devices[nest_dev_id]
+                            base_interval = self.base_interval(nest_dev)
+                            schedule_entry = dict()
+                            schedule_entry[POLL_HUB_ID] = starling_hub_dev_id
+                            schedule_entry[POLL_DEVICE_TYPE_ID] = nest_dev.deviceTypeId
+                            schedule_entry[POLL_BACKOFF_ENABLED] = nest_dev.deviceTypeId not in POLL_BACKOFF_EXCLUDED_DEVICE_TYPES
+                            schedule_entry[POLL_BASE_INTERVAL] = base_interval
+                            schedule_entry[POLL_INTERVAL] = base_interval
+                            schedule_entry[POLL_NEXT_DUE] = now  # Poll newly scheduled devices straight away
+                            self.schedule[nest_dev_id] = schedule_entry
+                        if self.alert_polled(schedule_entry):
+                            continue  # Polled by due_alert_devices
+                        if schedule_entry[POLL_NEXT_DUE] <= now:
+                            due.setdefault(starling_hub_dev_id, list()).append(nest_dev_id)
+                            schedule_entry[POLL_NEXT_DUE] = now + schedule_entry[POLL_INTERVAL]
+
+                # Drop devices that have been stopped or deleted
+                for nest_dev_id in [nest_dev_id for nest_dev_id in self.schedule if nest_dev_id not in active_nest_dev_ids]:
+                    del self.schedule[nest_dev_id]
+                    self.last_properties.pop(nest_dev_id, None)
+                self.alert_hubs.intersection_update(self.globals[HUBS])
+
+            return due
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+            return dict()
+
+    def due_alert_devices(self):
+        try:
+            # Return a dict of Starling Hub device id -> list of Nest Protect device ids due an alert mode poll now
+            now = time.time()
+            due = dict()
+            with self.schedule_lock:
+                if len(self.alert_hubs) == 0:
+                    return due
+                for nest_dev_id, schedule_entry in self.schedule.items():
+                    if self.alert_polled(schedule_entry) and schedule_entry[POLL_NEXT_DUE] <= now:
+                        due.setdefault(schedule_entry[POLL_HUB_ID], list()).append(nest_dev_id)
+                        schedule_entry[POLL_NEXT_DUE] = now + ALERT_POLLING_SECONDS
+            return due
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+            return dict()
+
+    def alert_polled(self, schedule_entry):
+        # True if the device is polled on the alert lane; must be called with the schedule lock held
+        return schedule_entry[POLL_HUB_ID] in self.alert_hubs and schedule_entry[POLL_DEVICE_TYPE_ID] in ALERT_POLLING_DEVICE_TYPES
+
+    def set_alert_mode(self, starling_hub_dev_id, alert_active):
+        try:
+            # Invoked by the Hub Handler as Nest Protect alerts start and clear. Returns True if the alert mode changed.
+            with self.schedule_lock:
+                if alert_active == (starling_hub_dev_id in self.alert_hubs):
+                    return False
+                now = time.time()
+                if alert_active:
+                    self.alert_hubs.add(starling_hub_dev_id)
+                else:
+                    self.alert_hubs.discard(starling_hub_dev_id)
+                for schedule_entry in self.schedule.values():
+                    if schedule_entry[POLL_HUB_ID] == starling_hub_dev_id and schedule_entry[POLL_DEVICE_TYPE_ID] in ALERT_POLLING_DEVICE_TYPES:
+                        # Entering alert mode: poll all the Nest Protects straight away; leaving: resume normal polling
+                        schedule_entry[POLL_NEXT_DUE] = now if alert_active else now + schedule_entry[POLL_INTERVAL]
+            return True
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+            return False
+
+    def report_properties(self, nest_dev_id, nest_properties):
+        try:
+            # Invoked by the Hub Handler with the Starling Hub properties of each successful poll, to adapt the device's interval
+            with self.schedule_lock:
+                previous_properties = self.last_properties.get(nest_dev_id, None)
+                self.last_properties[nest_dev_id] = dict(nest_properties)
+                schedule_entry = self.schedule.get(nest_dev_id, None)
+                if schedule_entry is None:
+                    return
+
+                previous_interval = schedule_entry[POLL_INTERVAL]
+                if previous_properties != nest_properties or not schedule_entry[POLL_BACKOFF_ENABLED]:
+                    schedule_entry[POLL_INTERVAL] = schedule_entry[POLL_BASE_INTERVAL]
+                else:
+                    maximum_interval = schedule_entry[POLL_BASE_INTERVAL] * POLL_BACKOFF_MAXIMUM_MULTIPLIER
+                    schedule_entry[POLL_INTERVAL] = min(previous_interval * POLL_BACKOFF_FACTOR, maximum_interval)
+
+                if schedule_entry[POLL_INTERVAL] < previous_interval:
+                    # Snap back: bring forward a next poll that was scheduled using the backed-off interval
+                    schedule_entry[POLL_NEXT_DUE] = min(schedule_entry[POLL_NEXT_DUE], time.time() + schedule_entry[POLL_INTERVAL])
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def defer(self, nest_dev_ids):
+        try:
+            # Invoked by the Hub Handler with the Nest devices a poll batch didn't get to (see record_batch_deadline):
+            #   due_devices moved them on by a full interval when the batch was queued, so make them due again now
+            now = time.time()
+            with self.schedule_lock:
+                for nest_dev_id in nest_dev_ids:
+                    schedule_entry = self.schedule.get(nest_dev_id, None)
+                    if schedule_entry is not None:
+                        schedule_entry[POLL_NEXT_DUE] = min(schedule_entry[POLL_NEXT_DUE], now)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def forget_device(self, nest_dev_id):
+        try:
+            # Reschedule a device from scratch (e.g. its polling interval setting has changed)
+            with self.schedule_lock:
+                self.schedule.pop(nest_dev_id, None)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def reset(self):
+        try:
+            # Reschedule all devices from scratch (e.g. the plugin polling intervals have changed)
+            with self.schedule_lock:
+                self.schedule = dict()
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
@@ -0,0 +1,127 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Starling - Shadow State Store © Autolog 2022-2025
+#
+
+try:
+    # noinspection PyUnresolvedReferences
+    import indigo
+except ImportError:
+    pass
+
+import sys
+import threading
+import traceback
+
+from constants import *  # Also imports logging
+
+
+# noinspection PyPep8Naming
+class Shadow_Device(object):
+
+    # Stands in for an Indigo device object in the Hub Handler. States and the state image are held in process and kept
+    #   up to date by the update methods below, so comparing new values against current ones needs no Indigo server
+    #   round trip. Anything not shadowed (name, pluginProps, ownerProps, ...) is read from the wrapped device object.
+
+    def __init__(self, dev):
+        self.dev = dev
+        self.id = dev.id
+        self.states = dict(dev.states)
+        self.displayStateImageSel = dev.displayStateImageSel
+
+    def __getattr__(self, name):
+        if name == "dev":
+            raise AttributeError(name)
+        return getattr(self.dev, name)
+
+    def updateStatesOnServer(self, keyValueList):
+        self.dev.updateStatesOnServer(keyValueList)
+        for key_value in keyValueList:
+            self.states[key_value["key"]] = key_value["value"]
+
+    def updateStateOnServer(self, key, value, **kwargs):
+        self.dev.updateStateOnServer(key, value, **kwargs)
+        self.states[key] = value
+
+    def updateStateImageOnServer(self, state_image_sel):
+        self.dev.updateStateImageOnServer(state_image_sel)
+        self.displayStateImageSel = state_image_sel
+
+    def replacePluginPropsOnServer(self, props):
+        self.dev.replacePluginPropsOnServer(props)
+        self.dev.refreshFromServer()  # Pick up the new plugin props in the wrapped working copy
+
+    def stateListOrDisplayStateIdChanged(self):
+        self.dev.stateListOrDisplayStateIdChanged()
+        self.dev.refreshFromServer()  # The state list may have changed, so re-shadow the states
+        self.states = dict(self.dev.states)
+
+
+# noinspection PyPep8Naming
+class Shadow_State_Store(object):
+
+    # Indigo device id -> Shadow_Device for the plugin's devices used by the Hub Handlers.
+    #   Filled on first use, written through by the Hub Handlers and reconciled from the plugin's device_updated callback.
+
+    def __init__(self, plugin_globals):
+        try:
+            self.globals = plugin_globals
+
+            self.shadowStateLogger = logging.getLogger("Plugin.SHADOW_STATES")
+
+            self.shadow_lock = threading.Lock()
+            self.shadow_devices = dict()
+            self.shadow_hits = 0  # Device lookups served from the store
+            self.shadow_misses = 0  # Device lookups that needed an Indigo server round trip
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def exception_handler(self, exception_error_message, log_failing_statement):
+        filename, line_number, method, statement = traceback.extract_tb(sys.exc_info()[2])[-1]  # noqa [Ignore duplicate code warning]
+        module = filename.split('/')
+        log_message = u"'{0}' in module '{1}', method '{2}'".format(exception_error_message, module[-1], method)
+        if log_failing_statement:
+            log_message = log_message + u"\n   Failing statement [line {0}]: '{1}'".format(line_number, statement)
+        else:
+            log_message = log_message + u" at line {0}".format(line_number)
+        self.shadowStateLogger.error(log_message)
+
+    def device(self, dev_id):
+        try:
+            # Return the Shadow_Device for an Indigo device id, or None if the device doesn't exist
+            with self.shadow_lock:
+                shadow_device = self.shadow_devices.get(dev_id, None)
+                if shadow_device is not None:
+                    self.shadow_hits += 1
+                    return shadow_device
+            if dev_id not in indigo.devices:
+                return None
+            shadow_device = Shadow_Device(indigo.devices[dev_id])
+            with self.shadow_lock:
+                self.shadow_misses += 1
+                self.shadow_devices[dev_id] = shadow_device
+            return shadow_device
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def reconcile(self, dev):
+        try:
+            # Invoked from device_updated with Indigo's new copy of the device, which reflects all changes including any
+            #   made outside the Hub Handlers (e.g. device edits or other plugins / scripts)
+            with self.shadow_lock:
+                if dev.id in self.shadow_devices:
+                    self.shadow_devices[dev.id] = Shadow_Device(dev)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def forget(self, dev_id):
+        try:
+            with self.shadow_lock:
+                self.shadow_devices.pop(dev_id, None)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
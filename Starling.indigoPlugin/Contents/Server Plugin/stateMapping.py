@@ -0,0 +1,170 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Starling - Nest Property to Indigo State Mapping © Autolog 2022-2025
+#
+
+import time
+
+from constants import *  # Also imports logging
+
+# Mapping targets: the primary Nest device or one of its secondary (grouped) devices
+MAPPING_TARGET_PRIMARY = "primary"
+MAPPING_TARGET_HUMIDITY = "humidity"
+MAPPING_TARGET_HUMIDIFIER = "humidifier"
+
+
+def convert_temperature(value, nest_dev_props, nest_properties):  # noqa [parameter nest_properties is not used]
+    # Starling Hub temperatures are always Centigrade
+    if nest_dev_props.get("temperature_units", "C") == "F":
+        return round((((float(value) * 9) / 5) + 32.0), 1)
+    return round(value, 1)
+
+
+def format_temperature(value, nest_dev_props, nest_properties):  # noqa [parameter nest_properties is not used]
+    return f"{value}°{nest_dev_props.get('temperature_units', 'C')}"
+
+
+def convert_display_temperature(value, nest_dev_props, nest_properties):  # noqa [parameter nest_dev_props is not used]
+    # Nest Thermostat temperatures are shown in the thermostat's own display units
+    if nest_properties.get("displayTemperatureUnits", "") == "F":
+        return round((((float(value) * 9) / 5) + 32.0), 1)
+    return round(value, 1)
+
+
+def format_display_temperature(value, nest_dev_props, nest_properties):  # noqa [parameter nest_dev_props is not used]
+    return f"{value}°{'F' if nest_properties.get('displayTemperatureUnits', '') == 'F' else 'C'}"
+
+
+def convert_humidity_percent(value, nest_dev_props, nest_properties):  # noqa [parameters nest_dev_props and nest_properties are not used]
+    # Fix 2023-11-21: See https://forums.indigodomo.com/viewtopic.php?f=369&t=27594
+    try:
+        return int(round(float(value)))
+    except ValueError:
+        return value
+
+
+def convert_int(value, nest_dev_props, nest_properties):  # noqa [parameters nest_dev_props and nest_properties are not used]
+    return int(value)
+
+
+def convert_battery_level(value, nest_dev_props, nest_properties):  # noqa [parameters nest_dev_props and nest_properties are not used]
+    return 100 if value == "normal" else 20
+
+
+def format_percent(value, nest_dev_props, nest_properties):  # noqa [parameters nest_dev_props and nest_properties are not used]
+    return f"{value}%"
+
+
+# noinspection PyPep8Naming
+class State_Mapping(object):
+
+    # One Nest property mapped to one or more Indigo states of the primary device or of a secondary device.
+    #   converter(value, nest_dev_props, nest_properties) -> Indigo state value; formatter(...) -> uiValue.
+    #   The first state listed is the one compared to decide if the states need updating. If the Nest property is
+    #   missing from the reply, the default_property is mapped instead (if there is one).
+
+    __slots__ = ("nest_property", "states", "converter", "formatter", "target", "device_types", "excluded_device_types", "default_property")
+
+    def __init__(self, nest_property, states, converter=None, formatter=None, target=MAPPING_TARGET_PRIMARY, device_types=None, excluded_device_types=(), default_property=None):
+        self.nest_property = nest_property
+        self.states = states
+        self.converter = converter
+        self.formatter = formatter
+        self.target = target
+        self.device_types = device_types  # None = all Nest device types
+        self.excluded_device_types = excluded_device_types
+        self.default_property = default_property
+
+
+# Simple Nest property mappings, applied by State_Mapper in a single diff pass.
+#   Properties with behaviour beyond a value conversion (alerts, triggers, HVAC modes, ...) stay in the per-type handlers.
+STATE_MAPPINGS = (
+    # Properties common across all devices
+    State_Mapping("where", ("where",), excluded_device_types=("nestHomeAwayControl",)),
+    State_Mapping("name", ("name",)),
+    State_Mapping("serialNumber", ("serial_number",), excluded_device_types=("nestHomeAwayControl",)),
+    State_Mapping("structureName", ("structure_name",)),
+
+    # Nest Thermostat
+    State_Mapping("canCool", ("can_cool",), device_types=("nestThermostat",)),
+    State_Mapping("canHeat", ("can_heat",), device_types=("nestThermostat",)),
+    State_Mapping("sensorSelected", ("sensor_selected",), device_types=("nestThermostat",)),
+    State_Mapping("presetSelected", ("preset_selected",), device_types=("nestThermostat",)),
+    State_Mapping("tempHoldMode", ("temp_hold_mode",), device_types=("nestThermostat",)),
+    State_Mapping("displayTemperatureUnits", ("display_temperature_units",), device_types=("nestThermostat",)),
+    State_Mapping("backplateTemperature", ("backplate_temperature",), convert_display_temperature, format_display_temperature,
+                  device_types=("nestThermostat",), default_property="currentTemperature"),
+    State_Mapping("currentTemperature", ("current_temperature", "temperatureInput1"), convert_display_temperature, format_display_temperature, device_types=("nestThermostat",)),
+    State_Mapping("humidityPercent", ("humidity_percent", "humidityInput1"), convert_humidity_percent, format_percent, device_types=("nestThermostat",)),
+
+    # Nest Thermostat: Humidifier secondary device
+    State_Mapping("humidifierActive", ("humidifier_active",), target=MAPPING_TARGET_HUMIDIFIER, device_types=("nestThermostat",)),
+    State_Mapping("currentHumidifierState", ("current_humidifier_state",), target=MAPPING_TARGET_HUMIDIFIER, device_types=("nestThermostat",)),
+    State_Mapping("targetHumidity", ("target_humidity",), target=MAPPING_TARGET_HUMIDIFIER, device_types=("nestThermostat",)),
+    State_Mapping("targetHumidity", ("brightnessLevel",), convert_int, target=MAPPING_TARGET_HUMIDIFIER, device_types=("nestThermostat",)),
+    State_Mapping("humidityPercent", ("humidity_percent",), convert_humidity_percent, target=MAPPING_TARGET_HUMIDIFIER, device_types=("nestThermostat",)),
+
+    # Nest Protect
+    State_Mapping("batteryStatus", ("batteryLevel",), convert_battery_level, device_types=("nestProtect",)),
+    State_Mapping("batteryStatus", ("batteryStatus",), device_types=("nestProtect",)),
+
+    # Nest Weather
+    State_Mapping("currentTemperature", ("current_temperature", "sensorValue"), convert_temperature, format_temperature, device_types=("nestWeather",)),
+    State_Mapping("humidityPercent", ("humidity_percent", "sensorValue"), None, format_percent, target=MAPPING_TARGET_HUMIDITY, device_types=("nestWeather",)),
+)
+
+
+# noinspection PyPep8Naming
+class State_Mapper(object):
+
+    # Compiles the mapping table per Indigo device type and diffs Nest properties against current Indigo states
+
+    def __init__(self, state_mappings):
+        self.state_mappings = state_mappings
+        self.compiled_mappings = dict()  # Indigo device type id -> tuple of State_Mapping applicable to that type
+
+        self.diff_count = 0
+        self.diff_seconds = 0.0
+
+    def compiled(self, device_type_id):
+        compiled_mappings = self.compiled_mappings.get(device_type_id, None)
+        if compiled_mappings is None:
+            compiled_mappings = tuple(state_mapping for state_mapping in self.state_mappings
+                                      if (state_mapping.device_types is None or device_type_id in state_mapping.device_types)
+                                      and device_type_id not in state_mapping.excluded_device_types)
+            self.compiled_mappings[device_type_id] = compiled_mappings
+        return compiled_mappings
+
+    def diff(self, command, device_type_id, nest_dev_props, nest_properties, target_states, target_key_value_lists):
+        # Append to target_key_value_lists[target] the minimal updates for each target's current states in target_states[target].
+        #   All mapped states are (re)sent when the device is starting.
+        diff_start_time = time.time()
+        force_update = command == API_COMMAND_START_DEVICE
+
+        for state_mapping in self.compiled(device_type_id):
+            nest_property = state_mapping.nest_property
+            if nest_property not in nest_properties:
+                nest_property = state_mapping.default_property
+                if nest_property is None or nest_property not in nest_properties:
+                    continue
+            current_states = target_states.get(state_mapping.target, None)
+            if current_states is None:
+                continue
+            value = nest_properties[nest_property]
+            if state_mapping.converter is not None:
+                value = state_mapping.converter(value, nest_dev_props, nest_properties)
+            if not force_update and current_states.get(state_mapping.states[0], None) == value:
+                continue
+            key_value_list = target_key_value_lists.setdefault(state_mapping.target, list())
+            if state_mapping.formatter is not None:
+                ui_value = state_mapping.formatter(value, nest_dev_props, nest_properties)
+                for state in state_mapping.states:
+                    key_value_list.append({"key": state, "value": value, "uiValue": ui_value})
+            else:
+                for state in state_mapping.states:
+                    key_value_list.append({"key": state, "value": value})
+
+        self.diff_count += 1
+        self.diff_seconds += time.time() - diff_start_time
+        return target_key_value_lists
@@ -0,0 +1,414 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Starling - Hub Simulator © Autolog 2022-2025
+#
+# Stand-alone local stand-in for a Starling Hub, for developing and load testing the plugin without a Starling Hub or
+#   Nest hardware. Serves the Starling Developer Connect API routes used by the Hub Handler:
+#
+#     GET  /api/connect/v1/status
+#     GET  /api/connect/v1/devices
+#     GET  /api/connect/v1/devices/{id}
+#     POST /api/connect/v1/devices/{id}
+#
+#   with a configurable fleet of Nest Thermostats, Protects, Weather and Home/Away Control devices, plus fault injection
+#   (latency, timeouts, 401 / 404 replies and flapping connectivity). Only the Python standard library is used.
+#
+#   Point a Starling Hub device at it with SSL/TLS off, IP Address 127.0.0.1 (or the machine's LAN address) and the
+#   simulator's API key, e.g.:
+#
+#     python3 tools/starling_hub_simulator.py --thermostats 4 --protects 6 --latency 50 --timeout-rate 0.02 --flap 120,10
+#
+#   With --tls the simulator listens on port 3443 using the supplied certificate and key; the plugin addresses it as
+#   "n-n-n-n.local.starling.direct", so the certificate must be valid for that hostname.
+#
+#   Whilst running, the simulator is controlled through its own routes (these are never subject to fault injection):
+#
+#     GET  /sim/state                 Fleet, fault settings and request counters
+#     POST /sim/faults                Change fault settings, e.g. {"latency_ms": 500, "unauthorized_rate": 0.1}
+#     POST /sim/devices/{id}          Set device properties directly, e.g. {"smokeDetected": true} to raise a Protect alert
+
+import argparse
+import json
+import random
+import re
+import signal
+import ssl
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+API_PREFIX = "/api/connect/v1/"
+API_VERSION = 1.2
+APP_NAME = "Starling Hub Simulator"
+
+WHERE_NAMES = ("Living Room", "Kitchen", "Hallway", "Bedroom", "Den", "Landing", "Office", "Garage", "Dining Room", "Study")
+
+# Device properties that may be written by POST /devices/{id}, by Nest device type
+WRITABLE_PROPERTIES = dict()
+WRITABLE_PROPERTIES["thermostat"] = ("hvacMode", "targetTemperature", "targetCoolingThresholdTemperature", "targetHeatingThresholdTemperature",
+                                     "ecoMode", "fanRunning", "hotWaterEnabled", "humidifierActive", "targetHumidity")
+WRITABLE_PROPERTIES["protect"] = ()
+WRITABLE_PROPERTIES["weather"] = ()
+WRITABLE_PROPERTIES["home_away_control"] = ("homeState",)
+
+
+# noinspection PyPep8Naming
+class Fault_Settings(object):
+
+    # Fault injection settings; changed at runtime through POST /sim/faults
+
+    FIELDS = ("latency_ms", "latency_jitter_ms", "timeout_rate", "timeout_seconds", "unauthorized_rate", "not_found_rate",
+              "flap_period_seconds", "flap_down_seconds")
+
+    def __init__(self, args):
+        self.latency_ms = args.latency
+        self.latency_jitter_ms = args.latency_jitter
+        self.timeout_rate = args.timeout_rate
+        self.timeout_seconds = args.timeout_seconds
+        self.unauthorized_rate = args.unauthorized_rate
+        self.not_found_rate = args.not_found_rate
+        self.flap_period_seconds, self.flap_down_seconds = args.flap
+        self.started_at = time.time()
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def update(self, settings):
+        for field, value in settings.items():
+            if field not in self.FIELDS:
+                raise ValueError(f"Unknown fault setting '{field}'")
+            setattr(self, field, float(value))
+
+    def hub_down(self):
+        # Flapping connectivity: the Starling Hub is unreachable for the last flap_down_seconds of every flap_period_seconds
+        if self.flap_period_seconds <= 0 or self.flap_down_seconds <= 0:
+            return False
+        return (time.time() - self.started_at) % self.flap_period_seconds >= self.flap_period_seconds - self.flap_down_seconds
+
+
+# noinspection PyPep8Naming
+class Nest_Fleet(object):
+
+    # The simulated Nest devices: Nest id -> {"type": Nest device type, "properties": Starling Hub properties}
+
+    def __init__(self, args):
+        self.fleet_lock = threading.Lock()
+        self.devices = dict()
+        self.random = random.Random(args.seed)
+
+        for index in range(args.thermostats):
+            self.add_device("thermostat", index, self.thermostat_properties(index))
+        for index in range(args.protects):
+            self.add_device("protect", index, self.protect_properties())
+        for index in range(args.weather):
+            self.add_device("weather", index, {"currentTemperature": 12.0, "humidityPercent": 70})
+        for index in range(args.home_away):
+            self.add_device("home_away_control", index, {"homeState": True})
+
+    def add_device(self, nest_type, index, properties):
+        nest_id = f"SIM{nest_type.upper().replace('_', '')}{index:04d}"
+        where = WHERE_NAMES[index % len(WHERE_NAMES)]
+        common_properties = {"id": nest_id,
+                             "type": nest_type,
+                             "name": f"Simulated {nest_type.replace('_', ' ').title()} {index + 1}",
+                             "where": where,
+                             "serialNumber": f"SN{self.random.randrange(10 ** 11, 10 ** 12)}",
+                             "structureName": "Home"}
+        common_properties.update(properties)
+        self.devices[nest_id] = {"type": nest_type, "properties": common_properties}
+
+    def thermostat_properties(self, index):
+        properties = {"hvacMode": "heat",
+                      "hvacState": "off",
+                      "canCool": index % 2 == 1,
+                      "canHeat": True,
+                      "currentTemperature": 20.5,
+                      "backplateTemperature": 20.5,
+                      "humidityPercent": 45,
+                      "targetTemperature": 20.0,
+                      "targetCoolingThresholdTemperature": 24.0,
+                      "targetHeatingThresholdTemperature": 19.0,
+                      "displayTemperatureUnits": "C",
+                      "ecoMode": False,
+                      "tempHoldMode": False}
+        if index % 2 == 1:
+            properties["fanRunning"] = False
+        if index % 3 == 0:
+            properties["hotWaterEnabled"] = False
+        if index % 4 == 3:
+            properties["humidifierActive"] = False
+            properties["currentHumidifierState"] = "idle"
+            properties["targetHumidity"] = 40
+        return properties
+
+    @staticmethod
+    def protect_properties():
+        return {"batteryStatus": "normal",
+                "coDetected": False,
+                "smokeDetected": False,
+                "manualTestActive": False,
+                "occupancyDetected": False}
+
+    def device_list(self):
+        with self.fleet_lock:
+            return [{key: device["properties"][key] for key in ("id", "type", "name", "where", "serialNumber", "structureName")} | {"supportsStreaming": False}
+                    for device in self.devices.values()]
+
+    def device_properties(self, nest_id):
+        with self.fleet_lock:
+            device = self.devices.get(nest_id, None)
+            return None if device is None else dict(device["properties"])
+
+    def write_properties(self, nest_id, properties):
+        # Returns the 'setStatus' object of the reply: Starling Hub property -> "OK" or a failure reason
+        set_status = dict()
+        with self.fleet_lock:
+            device = self.devices[nest_id]
+            for api_property, value in properties.items():
+                nest_property = api_property.strip()
+                if nest_property not in WRITABLE_PROPERTIES[device["type"]] or nest_property not in device["properties"]:
+                    set_status[api_property] = "PROPERTY_NOT_WRITABLE"
+                    continue
+                device["properties"][nest_property] = value
+                set_status[api_property] = "OK"
+            if device["type"] == "thermostat":
+                self.update_hvac_state(device["properties"])
+        return set_status
+
+    def set_properties(self, nest_id, properties):
+        # Control route: set any properties directly (e.g. raise a Protect smoke alert)
+        with self.fleet_lock:
+            self.devices[nest_id]["properties"].update(properties)
+
+    @staticmethod
+    def update_hvac_state(properties):
+        hvac_mode = properties["hvacMode"]
+        current_temperature = properties["currentTemperature"]
+        if hvac_mode == "heat" and current_temperature < properties["targetTemperature"]:
+            properties["hvacState"] = "heating"
+        elif hvac_mode == "cool" and current_temperature > properties["targetTemperature"]:
+            properties["hvacState"] = "cooling"
+        else:
+            properties["hvacState"] = "off"
+
+    def drift(self):
+        # Small temperature and humidity changes so that polls see changing replies as well as unchanged ones
+        with self.fleet_lock:
+            for device in self.devices.values():
+                properties = device["properties"]
+                if "currentTemperature" in properties and self.random.random() < 0.3:
+                    properties["currentTemperature"] = round(properties["currentTemperature"] + self.random.choice((-0.5, 0.5)), 1)
+                    if "backplateTemperature" in properties:
+                        properties["backplateTemperature"] = properties["currentTemperature"]
+                    if device["type"] == "thermostat":
+                        self.update_hvac_state(properties)
+                if "humidityPercent" in properties and self.random.random() < 0.1:
+                    properties["humidityPercent"] = max(0, min(100, properties["humidityPercent"] + self.random.choice((-1, 1))))
+
+
+# noinspection PyPep8Naming
+class Hub_Simulator_Request_Handler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"  # Keep-alive, as used by the plugin's requests session
+    server_version = "StarlingHubSimulator/1.0"
+
+    def log_message(self, message_format, *args):
+        if self.server.verbose:
+            BaseHTTPRequestHandler.log_message(self, message_format, *args)
+
+    def do_GET(self):
+        self.handle_request("GET")
+
+    def do_POST(self):
+        self.handle_request("POST")
+
+    def handle_request(self, method):
+        path, _, query = self.path.partition("?")
+        if path.startswith("/sim/"):
+            self.handle_control_request(method, path)
+            return
+
+        self.server.count("requests")
+        faults = self.server.faults
+        if faults.hub_down():
+            # Unreachable: drop the connection without a reply (the plugin sees a connection error)
+            self.server.count("connections_dropped")
+            self.close_connection = True
+            return
+        if faults.timeout_rate > 0 and self.server.random.random() < faults.timeout_rate:
+            self.server.count("timeouts")
+            time.sleep(faults.timeout_seconds)  # Longer than the plugin's read timeout
+            self.close_connection = True
+            return
+        latency_seconds = (faults.latency_ms + self.server.random.uniform(0, faults.latency_jitter_ms)) / 1000
+        if latency_seconds > 0:
+            time.sleep(latency_seconds)
+
+        api_key = dict(re.findall(r"([^&=]+)=([^&]*)", query)).get("key", "")
+        if api_key != self.server.api_key or (faults.unauthorized_rate > 0 and self.server.random.random() < faults.unauthorized_rate):
+            self.server.count("unauthorized")
+            self.send_json(401, {"status": "error", "code": "INVALID_API_KEY", "message": "API key is invalid, or does not have the right permissions for this request"})
+            return
+        if faults.not_found_rate > 0 and self.server.random.random() < faults.not_found_rate:
+            self.server.count("not_found")
+            self.send_json(404, {"status": "error", "code": "NOT_FOUND", "message": "Not found"})
+            return
+
+        if not path.startswith(API_PREFIX):
+            self.send_json(404, {"status": "error", "code": "NOT_FOUND", "message": "Unknown API"})
+            return
+        route = path[len(API_PREFIX):]
+
+        if method == "GET" and route == "status":
+            self.send_json(200, {"apiVersion": API_VERSION,
+                                 "apiReady": True,
+                                 "connectedToNest": True,
+                                 "appName": APP_NAME,
+                                 "permissions": {"read": True, "write": True, "camera": False}})
+        elif method == "GET" and route == "devices":
+            self.send_json(200, {"status": "OK", "devices": self.server.fleet.device_list()})
+        elif route.startswith("devices/"):
+            nest_id = route[len("devices/"):]
+            properties = self.server.fleet.device_properties(nest_id)
+            if properties is None:
+                self.send_json(404, {"status": "error", "code": "NOT_FOUND", "message": f"Device '{nest_id}' not found"})
+            elif method == "GET":
+                self.send_json(200, {"status": "OK", "properties": properties})
+            else:
+                try:
+                    write_properties = self.read_json()
+                except ValueError:
+                    self.send_json(400, {"status": "error", "code": "INVALID_JSON", "message": "Request body is not a JSON object"})
+                    return
+                self.server.count("writes")
+                self.send_json(200, {"status": "OK", "setStatus": self.server.fleet.write_properties(nest_id, write_properties)})
+        else:
+            self.send_json(404, {"status": "error", "code": "NOT_FOUND", "message": f"Unknown route '{route}'"})
+
+    def handle_control_request(self, method, path):
+        try:
+            if method == "GET" and path == "/sim/state":
+                with self.server.fleet.fleet_lock:
+                    fleet = {nest_id: device["properties"] for nest_id, device in self.server.fleet.devices.items()}
+                    self.send_json(200, {"faults": self.server.faults.as_dict(), "counters": self.server.counters_snapshot(), "devices": fleet})
+            elif method == "POST" and path == "/sim/faults":
+                self.server.faults.update(self.read_json())
+                self.send_json(200, {"faults": self.server.faults.as_dict()})
+            elif method == "POST" and path.startswith("/sim/devices/"):
+                nest_id = path[len("/sim/devices/"):]
+                if self.server.fleet.device_properties(nest_id) is None:
+                    self.send_json(404, {"status": "error", "message": f"Device '{nest_id}' not found"})
+                    return
+                self.server.fleet.set_properties(nest_id, self.read_json())
+                self.send_json(200, {"status": "OK", "properties": self.server.fleet.device_properties(nest_id)})
+            else:
+                self.send_json(404, {"status": "error", "message": "Unknown simulator route"})
+        except ValueError as error_message:
+            self.send_json(400, {"status": "error", "message": str(error_message)})
+
+    def read_json(self):
+        content_length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(content_length) or b"{}")
+        if not isinstance(body, dict):
+            raise ValueError("Request body is not a JSON object")
+        return body
+
+    def send_json(self, status_code, reply):
+        reply_bytes = json.dumps(reply).encode("utf-8")
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(reply_bytes)))
+        self.end_headers()
+        self.wfile.write(reply_bytes)
+
+
+# noinspection PyPep8Naming
+class Hub_Simulator_Server(ThreadingHTTPServer):
+
+    daemon_threads = True
+
+    def __init__(self, server_address, args):
+        ThreadingHTTPServer.__init__(self, server_address, Hub_Simulator_Request_Handler)
+        self.api_key = args.api_key
+        self.verbose = args.verbose
+        self.random = random.Random(args.seed)
+        self.faults = Fault_Settings(args)
+        self.fleet = Nest_Fleet(args)
+        self.counters_lock = threading.Lock()
+        self.counters = dict()
+
+    def count(self, counter):
+        with self.counters_lock:
+            self.counters[counter] = self.counters.get(counter, 0) + 1
+
+    def counters_snapshot(self):
+        with self.counters_lock:
+            return dict(self.counters)
+
+
+def parse_flap(value):
+    # "period,down" seconds e.g. "120,10": unreachable for 10 seconds in every 120
+    period, _, down = value.partition(",")
+    return float(period), float(down or 0)
+
+
+def stop_on_signal(signal_number, frame):
+    # SIGTERM stops the simulator as for Ctrl-C, so that its counters are printed
+    raise KeyboardInterrupt
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Starling Hub simulator with fault injection")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=None, help="Default 3080, or 3443 with --tls (as a Starling Hub)")
+    parser.add_argument("--tls", action="store_true", help="Serve HTTPS using --cert and --key")
+    parser.add_argument("--cert", help="TLS certificate file (PEM)")
+    parser.add_argument("--key", help="TLS private key file (PEM)")
+    parser.add_argument("--api-key", default="simulator", help="API key the plugin must send (default: simulator)")
+    parser.add_argument("--thermostats", type=int, default=2)
+    parser.add_argument("--protects", type=int, default=3)
+    parser.add_argument("--weather", type=int, default=1)
+    parser.add_argument("--home-away", type=int, default=1)
+    parser.add_argument("--drift-seconds", type=float, default=30.0, help="Interval between simulated temperature / humidity changes; 0 for none")
+    parser.add_argument("--latency", type=float, default=0.0, help="Added reply latency (ms)")
+    parser.add_argument("--latency-jitter", type=float, default=0.0, help="Random extra latency of up to this many ms")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="Fraction of requests that never get a reply")
+    parser.add_argument("--timeout-seconds", type=float, default=30.0, help="How long a timed out request is held before its connection is closed")
+    parser.add_argument("--unauthorized-rate", type=float, default=0.0, help="Fraction of requests answered with 401")
+    parser.add_argument("--not-found-rate", type=float, default=0.0, help="Fraction of requests answered with 404")
+    parser.add_argument("--flap", type=parse_flap, default=(0.0, 0.0), metavar="PERIOD,DOWN", help="Unreachable for DOWN seconds in every PERIOD seconds")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for repeatable fleets and faults")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    port = args.port if args.port is not None else (3443 if args.tls else 3080)
+    server = Hub_Simulator_Server((args.host, port), args)
+    if args.tls:
+        if args.cert is None or args.key is None:
+            parser.error("--tls needs --cert and --key")
+        ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        ssl_context.load_cert_chain(args.cert, args.key)
+        server.socket = ssl_context.wrap_socket(server.socket, server_side=True)
+
+    signal.signal(signal.SIGTERM, stop_on_signal)
+    stop_event = threading.Event()
+    if args.drift_seconds > 0:
+        def drift_fleet():
+            while not stop_event.wait(args.drift_seconds):
+                server.fleet.drift()
+        threading.Thread(target=drift_fleet, daemon=True).start()
+
+    print(f"{APP_NAME}: {len(server.fleet.devices)} Nest devices on {'https' if args.tls else 'http'}://{args.host}:{port}{API_PREFIX} (API key '{args.api_key}')")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_event.set()
+        server.server_close()
+        print(f"{APP_NAME}: requests {server.counters_snapshot()}")
+
+
+if __name__ == "__main__":
+    main()